@@ -0,0 +1,118 @@
+"""
+Benchmark for the parsed Channel model.
+
+Builds the Channel records of 200 synthetic channel assets and compares it
+ with the raw dict processing the listing used to repeat at every call site.
+ Also reports the memory footprint of the built records.
+
+Usage: python benchmarks/bench_channel_model.py
+"""
+
+import os
+import sys
+import tracemalloc
+from random import Random
+from timeit import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "plugin.video.vodkatv"))
+sys.path.insert(0, os.path.join(BENCH_DIR, "stubs"))
+
+from resources.lib.vodka import models, static  # noqa: E402
+
+
+def generate_assets(count: int = 200, seed: int = 1) -> list:
+    rnd = Random(seed)
+    assets = []
+    for idx in range(count):
+        metas = {
+            f"meta {n}": {"objectType": "StringValue", "value": str(n)}
+            for n in range(10)
+        }
+        metas["Channel number"] = {"objectType": "DoubleValue", "value": count - idx}
+        metas["EPG_GUID_ID"] = {"objectType": "StringValue", "value": 1000 + idx}
+        assets.append(
+            {
+                "id": 500000 + idx,
+                "name": f"Channel {idx}",
+                "metas": metas,
+                "images": [
+                    {"ratio": ratio, "url": f"https://img.example/{idx}/{ratio}"}
+                    for ratio in ("4:3", "16:9", "16:10", "1:1")
+                ],
+                "mediaFiles": [
+                    {"id": 800000 + idx * 10 + n, "type": file_type}
+                    for n, file_type in enumerate(
+                        rnd.sample(
+                            static.media_file_ids + ["STB_Main_HD", "Mobile_SD"], 4
+                        )
+                    )
+                ],
+            }
+        )
+    return assets
+
+
+def legacy_processing(assets: list) -> list:
+    """The raw dict processing that was repeated at every call site."""
+    assets = list(assets)
+    assets.sort(
+        key=lambda x: int(
+            next(
+                (
+                    value.get("value", 0)
+                    for key, value in x.get("metas", {}).items()
+                    if key == "Channel number"
+                ),
+                0,
+            )
+        )
+    )
+    parsed = []
+    for channel in assets:
+        epg_id = next(
+            (
+                value.get("value")
+                for key, value in channel.get("metas", {}).items()
+                if key == "EPG_GUID_ID"
+            ),
+            channel.get("id"),
+        )
+        media_files = [
+            media_file
+            for media_file in channel.get("mediaFiles")
+            if media_file.get("type") in static.media_file_ids
+        ]
+        media_files.sort(key=lambda x: x.get("type").lower().find("hd"), reverse=True)
+        images = channel.get("images")
+        image = None
+        if images:
+            image = next(
+                (image for image in images if image.get("ratio") == "16:10"),
+                images[0],
+            )["url"]
+        parsed.append((epg_id, media_files[0]["id"] if media_files else None, image))
+    return parsed
+
+
+def main() -> None:
+    assets = generate_assets()
+    rounds = 200
+    # the listing and the exports used to run this processing 2-4 times
+    legacy = timeit(lambda: legacy_processing(assets), number=rounds) / rounds
+    built = timeit(lambda: models.build_channels(assets), number=rounds) / rounds
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    channels = models.build_channels(assets)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    footprint = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    print(f"{len(assets)} channels, averaged over {rounds} rounds")
+    print(f"legacy dict processing (one call site): {legacy * 1000:.3f} ms")
+    print(f"build_channels:                         {built * 1000:.3f} ms")
+    print(f"Channel instance size: {sys.getsizeof(channels[0])} bytes")
+    print(f"records footprint:     {footprint / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
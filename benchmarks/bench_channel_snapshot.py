@@ -0,0 +1,92 @@
+"""
+Benchmark for rendering the live channel list from the snapshot kept by
+ the background service.
+
+Stores a synthetic snapshot of 200 channels with two days of programmes,
+ then measures how long channel_list takes to load it and emit the
+ listing, against stub Kodi modules.
+
+Usage: python benchmarks/bench_channel_snapshot.py [--channels 200]
+"""
+
+import os
+import sys
+from argparse import ArgumentParser
+from time import perf_counter, time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "plugin.video.vodkatv"))
+sys.path.insert(0, os.path.join(BENCH_DIR, "stubs"))
+
+import xbmcplugin  # noqa: E402
+
+import default  # noqa: E402
+
+
+def generate_snapshot(channels: int, programmes: int) -> dict:
+    """
+    Generates a snapshot in the format of build_channel_snapshot,
+     with 45 minute programmes starting an hour ago.
+    """
+    start = int(time()) - 3600
+    snapshot = {"channels": [], "epg": {}}
+    for number in range(channels):
+        snapshot["channels"].append(
+            {
+                "id": 100000 + number,
+                "name": f"Channel {number}",
+                "logo": f"https://example.com/logos/{number}.png",
+                "file_id": 200000 + number,
+                "epg_id": str(300000 + number),
+            }
+        )
+        starts = [start + i * 2700 for i in range(programmes)]
+        snapshot["epg"][str(300000 + number)] = (
+            starts,
+            [programme_start + 2700 for programme_start in starts],
+            [
+                {
+                    "NAME": f"Programme {i}",
+                    "DESCRIPTION": "Lorem ipsum dolor sit amet. " * 10,
+                }
+                for i in range(programmes)
+            ],
+        )
+    return snapshot
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--programmes", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    # default.py reads the plugin URL and handle from sys.argv
+    sys.argv[:] = ["plugin://plugin.video.vodkatv/", "1", ""]
+    default.addon.setSetting("channelsnapshot", "true")
+    snapshot = generate_snapshot(args.channels, args.programmes)
+    default.write_channel_snapshot(default.addon, snapshot)
+    size = os.path.getsize(
+        default.get_profile_path(default.addon, default.SNAPSHOT_CACHE_NAME)
+    )
+    print(
+        f"{args.channels} channels, {args.programmes} programmes each, "
+        f"snapshot size {size / 1024:.0f} KiB"
+    )
+    for epg_mode in range(5):
+        default.addon.setSetting("epgonchannels", str(epg_mode))
+        # the snapshot key depends on whether the EPG is enabled
+        default.write_channel_snapshot(default.addon, snapshot)
+        elapsed = 0.0
+        for _ in range(args.rounds):
+            xbmcplugin.items.clear()
+            start = perf_counter()
+            # no session, rendering from the snapshot must not call the API
+            default.channel_list(None)
+            elapsed += perf_counter() - start
+        assert len(xbmcplugin.items) == args.channels
+        print(f"epgonchannels={epg_mode}: {elapsed / args.rounds * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark for the XMLTV export of the EPG service.
+
+Runs export_data.export_epg end to end, first without any EPG shards
+ and then incrementally, against stub Kodi modules, with the
+ API calls answered from pre-generated synthetic data, so only parsing
+ and rendering is measured. The SHA-256 of the output is printed, so
+ refactorings can be checked for byte-identical output.
+
+Usage: python benchmarks/bench_epg_export.py [--channels 200] [--days 14]
+       [--latency-ms 0] [--latency-per-day-ms 0] [--workers 4]
+       [--queue-depth 8] [--compress-level 0] [--adaptive-target 0]
+       [--low-memory]
+"""
+
+import gzip
+import hashlib
+import os
+import sys
+import tempfile
+from argparse import ArgumentParser
+from time import perf_counter, time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "plugin.video.vodkatv"))
+sys.path.insert(0, os.path.join(BENCH_DIR, "stubs"))
+
+import xbmcaddon  # noqa: E402
+
+import export_data  # noqa: E402
+from fake_api import FakeApi  # noqa: E402
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    # simulated time the API takes to answer a request
+    parser.add_argument("--latency-ms", type=float, default=0)
+    # simulated time the API takes per requested channel day
+    parser.add_argument("--latency-per-day-ms", type=float, default=0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-depth", type=int, default=8)
+    # 0 writes plain XML
+    parser.add_argument("--compress-level", type=int, default=0)
+    # target response time in seconds of the adaptive chunk size, 0 disables it
+    parser.add_argument("--adaptive-target", type=int, default=0)
+    parser.add_argument("--low-memory", action="store_true")
+    args = parser.parse_args()
+    api = FakeApi(
+        args.channels,
+        args.days,
+        args.seed,
+        latency=args.latency_ms / 1000,
+        latency_per_day=args.latency_per_day_ms / 1000,
+    )
+    api.install()
+    addon = xbmcaddon.Addon()
+    output_dir = tempfile.mkdtemp(prefix="vodkatv-epg-")
+    for key, value in {
+        "username": "bench",
+        "password": "bench",
+        "ksexpiry": str(int(time()) + 86400),
+        "channelexportpath": output_dir,
+        "epgexportname": "epg.xml",
+        "epgnotifoncompletion": "false",
+        "epgexportworkers": str(args.workers),
+        "epgexportqueuedepth": str(args.queue_depth),
+        "epgcompress": "true" if args.compress_level else "false",
+        "epgcompresslevel": str(args.compress_level),
+        "epgadaptivechunk": "true" if args.adaptive_target else "false",
+        "epgchunktarget": str(args.adaptive_target),
+        "epglowmemory": "true" if args.low_memory else "false",
+    }.items():
+        addon.setSetting(key, value)
+    path = os.path.join(output_dir, "epg.xml.gz" if args.compress_level else "epg.xml")
+    programmes = api.total_programmes()
+    print(
+        f"{args.channels} channels x {args.days} days, {programmes} programmes, "
+        f"{args.rounds} rounds"
+    )
+    # the first round starts without shards, the others only refresh
+    # the days set in 'epgrefreshdays'
+    for round_number in range(args.rounds):
+        api.reset()
+        start = perf_counter()
+        export_data.export_epg(addon, None, api.from_offset, api.to_offset, 0)
+        elapsed = perf_counter() - start
+        # the hash is of the XML, so it's the same with compression
+        with (gzip.open if args.compress_level else open)(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        print(
+            f"{'cold' if round_number == 0 else 'warm'}: {elapsed:6.2f} s, "
+            f"{len(api.requests)} requests for {sum(api.requests)} channel days"
+        )
+    if args.adaptive_target:
+        print(f"learned:     {addon.getSetting('epgchunklearned')} channel days")
+    print(f"output:      {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+    print(f"sha256:      {digest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Microbenchmark for decoding EPG responses.
+
+Compares decoding a whole GetEPGMultiChannelProgram response with
+ json.loads (like response.json()) with the incremental decoder used by
+ media_list.iter_epg_by_channel_ids, which yields one channel at a time.
+Peak memory is measured with tracemalloc, the encoded response itself
+ is not counted.
+
+Usage: python benchmarks/bench_json_stream.py [--channels 30] [--days 14]
+"""
+
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from time import perf_counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "plugin.video.vodkatv"))
+sys.path.insert(0, os.path.join(BENCH_DIR, "stubs"))
+sys.path.insert(0, BENCH_DIR)
+
+from resources.lib.utils.jsonstream import iter_json_array  # noqa: E402
+from resources.lib.vodka.media_list import STREAM_CHUNK_SIZE  # noqa: E402
+from synthetic import generate_epg  # noqa: E402
+
+
+def measure(decode) -> tuple:
+    """
+    Times the decoding, then runs it again with tracemalloc, as tracing
+     slows down the allocations a lot.
+
+    :return: (seconds, peak bytes, decoded channels)
+    """
+    gc.collect()
+    start = perf_counter()
+    channels = decode()
+    elapsed = perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    decode()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, channels
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--channels", type=int, default=30)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    epg = generate_epg(
+        [300000 + number for number in range(1, args.channels + 1)],
+        0,
+        args.days - 1,
+        seed=args.seed,
+    )
+    body = json.dumps(epg).encode("utf-8")
+    del epg
+    chunks = [
+        body[i : i + STREAM_CHUNK_SIZE] for i in range(0, len(body), STREAM_CHUNK_SIZE)
+    ]
+
+    def decode_whole() -> int:
+        return len(json.loads(body))
+
+    def decode_stream() -> int:
+        decoded = 0
+        for channel in iter_json_array(chunks):
+            decoded += bool(channel)
+        return decoded
+
+    whole = measure(decode_whole)
+    stream = measure(decode_stream)
+    assert whole[2] == stream[2] == args.channels
+    assert json.loads(body) == list(iter_json_array(chunks))
+    print(
+        f"{args.channels} channels x {args.days} days, "
+        f"{len(body) / 1024 / 1024:.1f} MiB response"
+    )
+    for name, (elapsed, peak, _) in (("json.loads", whole), ("streamed", stream)):
+        print(f"{name:11} {elapsed:6.3f} s, peak {peak / 1024 / 1024:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark for building the live channel listing.
+
+Compares adding items one by one (add_item, one addDirectoryItem call per
+ item) with building them first and emitting them with a single
+ addDirectoryItems call, against stub Kodi modules. The stubs don't cross
+ the Python/Kodi boundary, pass --call-overhead-us to simulate the cost of
+ a call into Kodi.
+
+Usage: python benchmarks/bench_listing.py [--items 300] [--call-overhead-us 0]
+"""
+
+import os
+import sys
+from argparse import ArgumentParser
+from time import perf_counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "plugin.video.vodkatv"))
+sys.path.insert(0, os.path.join(BENCH_DIR, "stubs"))
+
+import xbmcplugin  # noqa: E402
+
+import default  # noqa: E402
+
+PLUGIN_PREFIX = "plugin://plugin.video.vodkatv/"
+HANDLE = "1"
+
+
+def generate_items(count: int) -> list:
+    """
+    Generates the keyword arguments of channel_list items.
+    """
+    return [
+        {
+            "name": f"{number}. Channel {number}",
+            "action": "play_channel",
+            "is_directory": False,
+            "id": 100000 + number,
+            "icon": f"https://example.com/logos/{number}.png",
+            "extra": "HD Main",
+            "is_livestream": True,
+            "refresh": True,
+            "description": f"Programme {number}\nNext: Programme {number + 1}",
+            "ctx_menu": [("Refresh channels", "RunPlugin(...)")],
+        }
+        for number in range(1, count + 1)
+    ]
+
+
+def simulate_overhead(overhead: float) -> None:
+    if overhead:
+        deadline = perf_counter() + overhead
+        while perf_counter() < deadline:
+            pass
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--items", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--call-overhead-us", type=float, default=0)
+    args = parser.parse_args()
+    overhead = args.call_overhead_us / 1e6
+    add_directory_item = xbmcplugin.addDirectoryItem
+    add_directory_items = xbmcplugin.addDirectoryItems
+
+    def slow_add_directory_item(*a, **kw):
+        simulate_overhead(overhead)
+        return add_directory_item(*a, **kw)
+
+    def slow_add_directory_items(*a, **kw):
+        simulate_overhead(overhead)
+        return add_directory_items(*a, **kw)
+
+    xbmcplugin.addDirectoryItem = slow_add_directory_item
+    xbmcplugin.addDirectoryItems = slow_add_directory_items
+    items = generate_items(args.items)
+
+    def one_by_one() -> None:
+        for item in items:
+            default.add_item(PLUGIN_PREFIX, HANDLE, **item)
+
+    def bulk() -> None:
+        default.add_items(
+            HANDLE, [default.build_item(PLUGIN_PREFIX, **item) for item in items]
+        )
+
+    print(f"{args.items} items, {args.rounds} rounds")
+    for name, func in (("add_item", one_by_one), ("build_item+add_items", bulk)):
+        xbmcplugin.calls.update(addDirectoryItem=0, addDirectoryItems=0)
+        xbmcplugin.items.clear()
+        start = perf_counter()
+        for _ in range(args.rounds):
+            func()
+        elapsed = perf_counter() - start
+        assert len(xbmcplugin.items) == args.items * args.rounds
+        calls = sum(xbmcplugin.calls.values()) // args.rounds
+        print(
+            f"{name:<22} {elapsed / args.rounds / args.items * 1e6:8.2f} us/item, "
+            f"{calls} Kodi call(s) per listing"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Microbenchmark for the EPG tag lookups of a programme.
+
+Compares the old per-key scans (one list comprehension per tag and one
+ linear search per meta value) with indexing the tags once, on the
+ synthetic programmes of the EPG export benchmark.
+
+Usage: python benchmarks/bench_tag_index.py [--channels 200] [--seed 1]
+"""
+
+import os
+import sys
+from argparse import ArgumentParser
+from timeit import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "plugin.video.vodkatv"))
+sys.path.insert(0, BENCH_DIR)
+
+from resources.lib.utils import first_tag, index_tags  # noqa: E402
+from synthetic import generate_channels, generate_epg  # noqa: E402
+
+TAG_KEYS = ("contentTags", "genre", "country of production", "actors", "director")
+META_KEYS = ("episode num", "season number", "year", "episode name")
+
+
+def scan_lookups(programme: dict) -> tuple:
+    """
+    The lookups as they were done before the tags were indexed.
+    """
+    epg_meta = programme.get("EPG_Meta", {})
+    epg_tags = programme.get("EPG_TAGS")
+    return tuple(
+        [tag.get("Value") for tag in epg_tags if tag.get("Key") == key]
+        for key in TAG_KEYS
+    ) + tuple(
+        next((tag["Value"] for tag in epg_meta if tag["Key"] == key), None)
+        for key in META_KEYS
+    )
+
+
+def index_lookups(programme: dict) -> tuple:
+    epg_meta = index_tags(programme.get("EPG_Meta"))
+    epg_tags = index_tags(programme.get("EPG_TAGS"))
+    return tuple(epg_tags.get(key, []) for key in TAG_KEYS) + tuple(
+        first_tag(epg_meta, key) for key in META_KEYS
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    channels = generate_channels(args.channels, seed=args.seed)
+    epg_ids = [
+        channel["metas"]["EPG_GUID_ID"]["value"]
+        for channel in channels
+        if "EPG_GUID_ID" in channel["metas"]
+    ]
+    programmes = [
+        programme
+        for channel in generate_epg(epg_ids, 0, 0, seed=args.seed)
+        for programme in channel["EPGChannelProgrammeObject"]
+    ]
+    assert [scan_lookups(p) for p in programmes] == [
+        index_lookups(p) for p in programmes
+    ]
+    tags = sum(len(p["EPG_TAGS"]) + len(p["EPG_Meta"]) for p in programmes)
+    rounds = 5
+
+    def per_programme(seconds: float) -> float:
+        return seconds / rounds / len(programmes) * 1e6
+
+    scan_time = timeit(lambda: [scan_lookups(p) for p in programmes], number=rounds)
+    index_time = timeit(lambda: [index_lookups(p) for p in programmes], number=rounds)
+    print(
+        f"{len(programmes)} programmes, {tags / len(programmes):.1f} tags each, "
+        f"averaged over {rounds} rounds"
+    )
+    print(f"per-key scans: {per_programme(scan_time):.2f} us/programme")
+    print(
+        f"single pass:   {per_programme(index_time):.2f} us/programme "
+        f"({scan_time / index_time:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
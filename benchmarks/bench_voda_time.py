@@ -0,0 +1,74 @@
+"""
+Microbenchmark for the Voda timestamp parser.
+
+Compares the strptime based conversion with the fixed-format parser and the
+ batch API on a synthetic day of programmes for 200 channels.
+
+Usage: python benchmarks/bench_voda_time.py
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+from timeit import timeit
+
+ADDON_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "plugin.video.vodkatv"
+)
+sys.path.insert(0, ADDON_DIR)
+
+from resources.lib.utils import (  # noqa: E402
+    _voda_to_epg_time_strptime,
+    convert_programme_times,
+    voda_to_epg_time,
+)
+
+
+def generate_programmes(channels: int = 200, per_channel: int = 30) -> list:
+    """
+    Generates back to back programmes, so the end of one programme
+     is the start of the next one like in the real API responses.
+    """
+    programmes = []
+    for channel in range(channels):
+        start = datetime(2023, 8, 14) + timedelta(minutes=channel % 15)
+        for _ in range(per_channel):
+            end = start + timedelta(minutes=45)
+            programmes.append(
+                {
+                    "START_DATE": start.strftime("%d/%m/%Y %H:%M:%S"),
+                    "END_DATE": end.strftime("%d/%m/%Y %H:%M:%S"),
+                }
+            )
+            start = end
+    return programmes
+
+
+def main() -> None:
+    programmes = generate_programmes()
+    dates = [p["START_DATE"] for p in programmes] + [p["END_DATE"] for p in programmes]
+    assert all(voda_to_epg_time(d) == _voda_to_epg_time_strptime(d) for d in dates)
+    rounds = 5
+
+    def per_call(seconds: float) -> float:
+        return seconds / rounds / len(dates) * 1e6
+
+    strptime_time = timeit(
+        lambda: [_voda_to_epg_time_strptime(d) for d in dates], number=rounds
+    )
+    fast_time = timeit(lambda: [voda_to_epg_time(d) for d in dates], number=rounds)
+    batch_time = timeit(lambda: convert_programme_times(programmes), number=rounds)
+    print(f"{len(dates)} timestamps, averaged over {rounds} rounds")
+    print(f"strptime:      {per_call(strptime_time):.2f} us/timestamp")
+    print(
+        f"fixed-format:  {per_call(fast_time):.2f} us/timestamp "
+        f"({strptime_time / fast_time:.1f}x)"
+    )
+    print(
+        f"batch + memo:  {per_call(batch_time):.2f} us/timestamp "
+        f"({strptime_time / batch_time:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Answers the API calls of the exports from synthetic data, so the exports
+ can be run end to end without an account.
+
+Only the functions export_data calls are replaced, everything after them
+ (parsing, rendering, the EPG store and the writing of the files) is the
+ code of the addon.
+"""
+
+from datetime import datetime, timedelta
+from time import sleep
+from typing import Dict, List
+
+import export_data
+import synthetic
+from resources.lib.vodka import media_list
+
+
+class FakeApi:
+    """
+    Synthetic channels and their programmes, with the number of
+     requested channel days and returned programmes.
+    """
+
+    def __init__(
+        self,
+        channels: int = 200,
+        days: int = 14,
+        seed: int = 1,
+        max_actors: int = 5,
+        pictures: int = 2,
+        latency: float = 0,
+        latency_per_day: float = 0,
+    ):
+        """
+        Generates the channels and the programmes of a window of 'days'
+         days around today.
+
+        :param channels: The number of channels.
+        :param days: The number of days of the window.
+        :param seed: The random seed.
+        :param max_actors: The maximum number of actor tags of a programme.
+        :param pictures: The number of pictures of a programme.
+        :param latency: Simulated time of a request in seconds.
+        :param latency_per_day: Simulated time of a requested channel day.
+        """
+        self.channels = synthetic.generate_channels(channels, seed)
+        self.from_offset = -(days // 2)
+        self.to_offset = days - days // 2 - 1
+        self.latency = latency
+        self.latency_per_day = latency_per_day
+        self.requests: List[int] = []
+        self.programmes = 0
+        # programmes of every channel and day (DD/MM/YYYY)
+        self.epg: Dict[str, Dict[str, List[dict]]] = {}
+        for channel in synthetic.generate_epg(
+            [
+                channel["metas"].get("EPG_GUID_ID", {}).get("value") or channel["id"]
+                for channel in self.channels
+            ],
+            self.from_offset,
+            self.to_offset,
+            seed=seed,
+            max_actors=max_actors,
+            pictures=pictures,
+        ):
+            days = self.epg.setdefault(channel["EPG_CHANNEL_ID"], {})
+            for programme in channel["EPGChannelProgrammeObject"]:
+                days.setdefault(programme["START_DATE"][:10], []).append(programme)
+
+    def total_programmes(self) -> int:
+        """
+        :return: The number of programmes in the window.
+        """
+        return sum(len(day) for days in self.epg.values() for day in days.values())
+
+    def reset(self) -> None:
+        """
+        Clears the counters.
+
+        :return: None
+        """
+        self.requests.clear()
+        self.programmes = 0
+
+    def iter_epg_by_channel_ids(
+        self, _session, json_post_gw, channel_ids, from_offset, to_offset, *_, **__
+    ):
+        today = datetime.now()
+        days = [
+            (today + timedelta(days=offset)).strftime("%d/%m/%Y")
+            for offset in range(from_offset, to_offset + 1)
+        ]
+        self.requests.append(len(channel_ids) * len(days))
+        # the response is waited for in the call, like the real one
+        sleep(self.latency + self.latency_per_day * len(channel_ids) * len(days))
+        return self._iter_channels(channel_ids, days)
+
+    def _iter_channels(self, channel_ids, days):
+        for channel_id in channel_ids:
+            programmes = [
+                programme
+                for day in days
+                for programme in self.epg[str(channel_id)].get(day, [])
+            ]
+            self.programmes += len(programmes)
+            yield {
+                "EPG_CHANNEL_ID": str(channel_id),
+                "EPGChannelProgrammeObject": programmes,
+            }
+
+    def install(self) -> None:
+        """
+        Replaces the API calls of the exports.
+
+        :return: None
+        """
+        export_data.get_channels = lambda *_, **__: self.channels
+        export_data.get_available_files = lambda _session, file_ids, *_: {
+            int(file_id) for file_id in file_ids
+        }
+        media_list.iter_epg_by_channel_ids = self.iter_epg_by_channel_ids
@@ -0,0 +1,265 @@
+"""
+Runs the channel list and EPG exports end to end and writes the results
+ as JSON, so runs (ie. before and after a change) can be compared.
+
+The exports run against stub Kodi modules, with the API calls answered
+ from seeded synthetic data (see fake_api.py). Every scenario starts in
+ a new profile and output directory, except the warm EPG export, which
+ follows an untimed cold one.
+
+For every scenario the wall time, the throughput (programmes or channels
+ per second), the bytes written (by write calls, where /proc/self/io is
+ available), the size of the exported file and the peak memory are
+ reported. The peak memory is measured with tracemalloc in a separate
+ run, as tracing slows down the allocations a lot.
+
+Usage: python benchmarks/run_exports.py [--channels 200] [--days 14]
+       [--max-actors 5] [--pictures 2] [--repeat 3] [--seed 1]
+       [--output export-results.json] [--compare previous.json]
+"""
+
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from argparse import ArgumentParser
+from datetime import datetime
+from time import perf_counter, time
+from typing import Callable, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "plugin.video.vodkatv"))
+sys.path.insert(0, os.path.join(BENCH_DIR, "stubs"))
+
+import xbmcaddon  # noqa: E402
+import xbmcvfs  # noqa: E402
+
+import export_data  # noqa: E402
+from fake_api import FakeApi  # noqa: E402
+
+RESULTS_VERSION = 1
+
+
+def written_bytes() -> Optional[int]:
+    """
+    :return: The bytes written by the process so far, None if unknown.
+    """
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class Workspace:
+    """
+    A profile and an output directory of the exports.
+    """
+
+    def __init__(self, addon: xbmcaddon.Addon):
+        self.home = tempfile.mkdtemp(prefix="vodkatv-home-")
+        self.output = tempfile.mkdtemp(prefix="vodkatv-output-")
+        # the stub maps special:// paths to its home
+        xbmcvfs._home = self.home
+        addon.setSetting("channelexportpath", self.output)
+
+    def remove(self) -> None:
+        shutil.rmtree(self.home, ignore_errors=True)
+        shutil.rmtree(self.output, ignore_errors=True)
+
+
+def measure(
+    addon: xbmcaddon.Addon,
+    api: FakeApi,
+    export: Callable[[], str],
+    warm: bool,
+    trace: bool,
+) -> dict:
+    """
+    Runs an export in a new workspace.
+
+    :param export: Runs the export and returns the path of the exported file.
+    :param warm: Whether to run the export once before measuring it.
+    :param trace: Whether to measure the peak memory instead of the time.
+    :return: The measurements.
+    """
+    workspace = Workspace(addon)
+    try:
+        if warm:
+            export()
+        api.reset()
+        gc.collect()
+        if trace:
+            tracemalloc.start()
+        written = written_bytes()
+        start = perf_counter()
+        path = export()
+        elapsed = perf_counter() - start
+        if written is not None:
+            written = written_bytes() - written
+        result = {
+            "wall_time": elapsed,
+            "bytes_written": written,
+            "output_bytes": os.path.getsize(path),
+            "programmes": api.programmes,
+            "requests": len(api.requests),
+        }
+        if trace:
+            result["peak_memory"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return result
+    finally:
+        workspace.remove()
+
+
+def run_scenario(
+    addon: xbmcaddon.Addon,
+    api: FakeApi,
+    name: str,
+    export: Callable[[], str],
+    repeat: int,
+    warm: bool = False,
+    channels: int = 0,
+) -> dict:
+    """
+    Measures an export 'repeat' times and once more with tracemalloc.
+    The fastest run is reported, the others are only slower because of
+     other processes.
+
+    :return: The result of the scenario.
+    """
+    runs = [measure(addon, api, export, warm, False) for _ in range(repeat)]
+    best = min(runs, key=lambda run: run["wall_time"])
+    traced = measure(addon, api, export, warm, True)
+    result = {
+        "name": name,
+        "wall_time": best["wall_time"],
+        "wall_times": [run["wall_time"] for run in runs],
+        "bytes_written": best["bytes_written"],
+        "output_bytes": best["output_bytes"],
+        "peak_memory": traced["peak_memory"],
+        "requests": best["requests"],
+    }
+    if channels:
+        result["channels"] = channels
+        result["channels_per_second"] = channels / best["wall_time"]
+    else:
+        result["programmes"] = best["programmes"]
+        result["programmes_per_second"] = best["programmes"] / best["wall_time"]
+    return result
+
+
+def compare(results: list, path: str) -> None:
+    """
+    Prints the change of the wall times and the peak memory compared to
+     the results of a previous run.
+
+    :param results: The current results.
+    :param path: The path of the previous results.
+    :return: None
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        previous = {result["name"]: result for result in json.load(f)["results"]}
+    print(f"compared to {path}:")
+    for result in results:
+        old = previous.get(result["name"])
+        if not old:
+            continue
+        print(
+            f"  {result['name']:13} time {result['wall_time'] / old['wall_time']:5.2f}x, "
+            f"peak memory {result['peak_memory'] / old['peak_memory']:5.2f}x"
+        )
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--max-actors", type=int, default=5)
+    parser.add_argument("--pictures", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    # timed runs of every scenario, the fastest is reported
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="export-results.json")
+    # results of a previous run to compare with
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+    api = FakeApi(args.channels, args.days, args.seed, args.max_actors, args.pictures)
+    api.install()
+    addon = xbmcaddon.Addon()
+    for key, value in {
+        "username": "bench",
+        "password": "bench",
+        "ksexpiry": str(int(time()) + 86400),
+        "channelexportname": "channels.m3u",
+        "epgexportname": "epg.xml",
+        "epgnotifoncompletion": "false",
+    }.items():
+        addon.setSetting(key, value)
+
+    def export_channel_list() -> str:
+        export_data.export_channel_list(addon, None)
+        return export_data.get_path(addon)
+
+    def export_epg() -> str:
+        export_data.export_epg(addon, None, api.from_offset, api.to_offset, 0)
+        return export_data.get_path(addon, is_epg=True)
+
+    print(
+        f"{args.channels} channels x {args.days} days, "
+        f"{api.total_programmes()} programmes"
+    )
+    results = [
+        run_scenario(
+            addon,
+            api,
+            "channel_list",
+            export_channel_list,
+            args.repeat,
+            channels=len(api.channels),
+        ),
+        run_scenario(addon, api, "epg_cold", export_epg, args.repeat),
+        run_scenario(addon, api, "epg_warm", export_epg, args.repeat, warm=True),
+    ]
+    for result in results:
+        throughput = (
+            f"{result['channels_per_second']:9.0f} channels/s"
+            if "channels" in result
+            else f"{result['programmes_per_second']:9.0f} programmes/s"
+        )
+        written = (
+            f"{result['bytes_written'] / 1024 / 1024:6.1f} MiB written, "
+            if result["bytes_written"] is not None
+            else ""
+        )
+        print(
+            f"{result['name']:13} {result['wall_time']:6.2f} s, {throughput}, "
+            f"{written}peak {result['peak_memory'] / 1024 / 1024:6.1f} MiB"
+        )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": RESULTS_VERSION,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "parameters": vars(args),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
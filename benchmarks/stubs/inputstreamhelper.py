@@ -0,0 +1,15 @@
+"""
+Minimal stand-in for script.module.inputstreamhelper, only for running
+ benchmarks outside of Kodi.
+"""
+
+
+class Helper:
+    inputstream_addon = "inputstream.adaptive"
+
+    def __init__(self, protocol, drm=None):
+        self.protocol = protocol
+        self.drm = drm
+
+    def check_inputstream(self) -> bool:
+        return True
@@ -0,0 +1,44 @@
+"""
+Minimal stand-in for Kodi's xbmc module, only for running benchmarks
+ outside of Kodi. Set VODKATV_BENCH_LOG=1 to print the addon log.
+"""
+
+import os
+import time
+
+LOGDEBUG = 0
+LOGINFO = 1
+LOGWARNING = 2
+LOGERROR = 3
+LOGFATAL = 4
+
+
+def log(msg: str, level: int = LOGDEBUG) -> None:
+    if os.environ.get("VODKATV_BENCH_LOG"):
+        print(f"[xbmc:{level}] {msg}")
+
+
+def sleep(milliseconds: int) -> None:
+    time.sleep(milliseconds / 1000)
+
+
+def executebuiltin(function: str, wait: bool = False) -> None:
+    pass
+
+
+def getCondVisibility(condition: str) -> bool:
+    return False
+
+
+class Monitor:
+    def abortRequested(self) -> bool:
+        return False
+
+    def waitForAbort(self, timeout: float = 0) -> bool:
+        time.sleep(timeout)
+        return False
+
+
+class Player:
+    def isPlayingVideo(self) -> bool:
+        return False
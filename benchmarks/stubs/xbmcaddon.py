@@ -0,0 +1,62 @@
+"""
+Minimal stand-in for Kodi's xbmcaddon module, only for running benchmarks
+ outside of Kodi. Setting defaults are read from the addon's settings.xml.
+"""
+
+import os
+import xml.etree.ElementTree as ET
+
+ADDON_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "plugin.video.vodkatv"
+)
+
+
+def _load_defaults() -> dict:
+    tree = ET.parse(os.path.join(ADDON_DIR, "resources", "settings.xml"))
+    return {
+        setting.get("id"): (setting.findtext("default") or "")
+        for setting in tree.iter("setting")
+    }
+
+
+class Addon:
+    # shared between instances, like the settings of a real addon
+    _settings = None
+
+    def __init__(self, addon_id: str = "plugin.video.vodkatv"):
+        if Addon._settings is None:
+            Addon._settings = _load_defaults()
+        self._info = {
+            "id": addon_id,
+            "name": "VodkaTV",
+            "version": "0.0.0-bench",
+            "profile": "special://profile/addon_data/plugin.video.vodkatv/",
+            "path": ADDON_DIR,
+        }
+
+    def getAddonInfo(self, key: str) -> str:
+        return self._info.get(key, "")
+
+    def getLocalizedString(self, string_id: int) -> str:
+        return f"#{string_id}"
+
+    def getSetting(self, key: str) -> str:
+        return self._settings.get(key, "")
+
+    def getSettingBool(self, key: str) -> bool:
+        return self.getSetting(key) == "true"
+
+    def getSettingInt(self, key: str) -> int:
+        return int(self.getSetting(key) or 0)
+
+    def setSetting(self, key: str, value: str) -> None:
+        self._settings[key] = str(value)
+
+    def setSettingBool(self, key: str, value: bool) -> None:
+        self._settings[key] = "true" if value else "false"
+
+    def setSettingInt(self, key: str, value: int) -> None:
+        self._settings[key] = str(value)
+
+    def openSettings(self) -> None:
+        pass
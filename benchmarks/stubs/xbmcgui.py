@@ -0,0 +1,82 @@
+"""
+Minimal stand-in for Kodi's xbmcgui module, only for running benchmarks
+ outside of Kodi.
+"""
+
+
+class Window:
+    _properties = {}
+
+    def __init__(self, window_id: int = 0):
+        self.window_id = window_id
+
+    def getProperty(self, key: str) -> str:
+        return self._properties.get(key, "")
+
+    def setProperty(self, key: str, value: str) -> None:
+        self._properties[key] = value
+
+    def clearProperty(self, key: str) -> None:
+        self._properties.pop(key, None)
+
+
+NOTIFICATION_INFO = "info"
+NOTIFICATION_WARNING = "warning"
+NOTIFICATION_ERROR = "error"
+INPUT_TYPE_TEXT = 0
+
+
+def getCurrentWindowId() -> int:
+    return 10000
+
+
+class ListItem:
+    __slots__ = ("label", "path", "properties", "art", "info", "context_menu")
+
+    def __init__(self, label: str = "", path: str = ""):
+        self.label = label
+        self.path = path
+        self.properties = {}
+        self.art = {}
+        self.info = {}
+        self.context_menu = []
+
+    def setProperty(self, key: str, value: str) -> None:
+        self.properties[key] = value
+
+    def setArt(self, art: dict) -> None:
+        self.art.update(art)
+
+    def setInfo(self, type: str, infoLabels: dict) -> None:
+        self.info.update(infoLabels)
+
+    def setContentLookup(self, enable: bool) -> None:
+        pass
+
+    def setMimeType(self, mime_type: str) -> None:
+        pass
+
+    def addContextMenuItems(self, items: list) -> None:
+        self.context_menu.extend(items)
+
+
+class Dialog:
+    def notification(self, heading, message, icon=None, time=0, sound=True):
+        pass
+
+    def ok(self, heading, message) -> bool:
+        return True
+
+    def yesno(self, heading, message, **kwargs) -> bool:
+        return False
+
+
+class DialogProgress:
+    def create(self, heading, message=""):
+        pass
+
+    def update(self, percent, message=""):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,31 @@
+"""
+Minimal stand-in for Kodi's xbmcplugin module, only for running benchmarks
+ outside of Kodi. Counts the calls into the directory API.
+"""
+
+calls = {"addDirectoryItem": 0, "addDirectoryItems": 0}
+items = []
+
+
+def addDirectoryItem(handle, url, listitem, isFolder=False, totalItems=0) -> bool:
+    calls["addDirectoryItem"] += 1
+    items.append((url, listitem, isFolder))
+    return True
+
+
+def addDirectoryItems(handle, items_to_add, totalItems=0) -> bool:
+    calls["addDirectoryItems"] += 1
+    items.extend(items_to_add)
+    return True
+
+
+def endOfDirectory(handle, succeeded=True, updateListing=False, cacheToDisc=True):
+    pass
+
+
+def setContent(handle, content) -> None:
+    pass
+
+
+def setResolvedUrl(handle, succeeded, listitem) -> None:
+    pass
@@ -0,0 +1,39 @@
+"""
+Minimal stand-in for Kodi's xbmcvfs module, only for running benchmarks
+ outside of Kodi. special:// paths are mapped to VODKATV_BENCH_HOME or a
+ temporary directory.
+"""
+
+import os
+import shutil
+import tempfile
+
+_home = os.environ.get("VODKATV_BENCH_HOME") or tempfile.mkdtemp(prefix="vodkatv-")
+
+
+def translatePath(path: str) -> str:
+    if path.startswith("special://"):
+        return os.path.join(_home, path[len("special://") :])
+    return path
+
+
+def exists(path: str) -> bool:
+    return os.path.exists(translatePath(path))
+
+
+def mkdirs(path: str) -> bool:
+    os.makedirs(translatePath(path), exist_ok=True)
+    return True
+
+
+def rename(source: str, destination: str) -> bool:
+    shutil.move(translatePath(source), translatePath(destination))
+    return True
+
+
+def delete(path: str) -> bool:
+    try:
+        os.remove(translatePath(path))
+    except FileNotFoundError:
+        return False
+    return True
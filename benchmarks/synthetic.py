@@ -0,0 +1,201 @@
+"""
+Seeded generator of synthetic API responses for the benchmarks.
+
+The objects have the shape of the real responses the addon parses
+ (channel assets of the Phoenix asset list and the channel objects of
+ GetEPGMultiChannelProgram), including characters that need escaping.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+GENRES = ["film", "sorozat", "hírek", "sport", "dokumentum", "gyerek", "zene"]
+COUNTRIES = ["Magyarország", "USA", "Egyesült Királyság", "Németország"]
+ACTORS = [f"Színész {i}" for i in range(300)]
+DIRECTORS = [f"Rendező {i}" for i in range(60)]
+CONTENT_TAGS = ["w_npvr=1", "w_restart=1", "w_startover=1"]
+# (width, ratio) of the programme pictures, the first ones are used
+PICTURE_SIZES = [(1280, "bg"), (640, "16:9"), (1920, "16:9"), (320, "4:3"), (960, "bg")]
+
+
+def generate_channels(count: int = 200, seed: int = 1) -> List[dict]:
+    """
+    Generates channel assets. Every seventh channel has no EPG ID.
+    EPG IDs are numbers like in the real metas.
+
+    :param count: The number of channels.
+    :param seed: The random seed.
+    :return: The list of channel assets.
+    """
+    rng = random.Random(seed)
+    channels = []
+    for number in range(1, count + 1):
+        metas = {"Channel number": {"value": str(number)}}
+        if number % 7:
+            metas["EPG_GUID_ID"] = {"value": 300000 + number}
+        media_files = [
+            {"id": 200000 + number * 2, "type": "Web_Secondary_HD"},
+            {"id": 200001 + number * 2, "type": "Web_Secondary_SD"},
+        ]
+        rng.shuffle(media_files)
+        channels.append(
+            {
+                "id": 100000 + number,
+                "name": (
+                    f"Channel {number} & Friends"
+                    if number % 11 == 0
+                    else f"Channel {number}"
+                ),
+                "metas": metas,
+                "mediaFiles": media_files,
+                "images": [
+                    {
+                        "ratio": "4:3",
+                        "url": f"https://img.example.com/{number}/4x3.png",
+                    },
+                    {
+                        "ratio": "16:10",
+                        "url": f"https://img.example.com/{number}/16x10.png",
+                    },
+                ],
+            }
+        )
+    return channels
+
+
+def generate_programmes(
+    epg_channel_id: str,
+    start: datetime,
+    end: datetime,
+    seed: int = 1,
+    max_actors: int = 5,
+    pictures: int = 2,
+) -> List[dict]:
+    """
+    Generates back to back programmes of a channel between two times.
+    The programmes of a channel are the same for every call with the
+     same seed, so any part of the window can be requested separately.
+
+    :param epg_channel_id: The EPG channel ID.
+    :param start: The start of the window.
+    :param end: The end of the window.
+    :param seed: The random seed.
+    :param max_actors: The maximum number of actor tags of a programme.
+    :param pictures: The number of pictures of a programme (at most 5).
+    :return: The list of programmes (EPGChannelProgrammeObject).
+    """
+    programmes = []
+    # programmes are laid out from a fixed origin, so the schedule
+    # doesn't depend on the requested window
+    day = datetime(start.year, start.month, start.day)
+    while day < end:
+        rng = random.Random(f"{seed}-{epg_channel_id}-{day:%Y%m%d}")
+        programme_start = day
+        next_day = day + timedelta(days=1)
+        while programme_start < next_day:
+            length = timedelta(minutes=rng.choice([15, 30, 45, 60, 90, 120]))
+            programme_end = min(programme_start + length, next_day)
+            if programme_end > start and programme_start < end:
+                programmes.append(
+                    _generate_programme(
+                        rng,
+                        epg_channel_id,
+                        programme_start,
+                        programme_end,
+                        max_actors,
+                        pictures,
+                    )
+                )
+            programme_start = programme_end
+        day = next_day
+    return programmes
+
+
+def _generate_programme(
+    rng: random.Random,
+    epg_channel_id: str,
+    start: datetime,
+    end: datetime,
+    max_actors: int,
+    pictures: int,
+) -> dict:
+    tags = [{"Key": "genre", "Value": rng.choice(GENRES)}]
+    if rng.random() < 0.5:
+        tags.append({"Key": "country of production", "Value": rng.choice(COUNTRIES)})
+    for actor in rng.sample(ACTORS, rng.randint(0, max_actors)):
+        tags.append({"Key": "actors", "Value": actor})
+    if rng.random() < 0.3:
+        tags.append({"Key": "director", "Value": rng.choice(DIRECTORS)})
+    for content_tag in CONTENT_TAGS:
+        if rng.random() < 0.6:
+            tags.append({"Key": "contentTags", "Value": content_tag})
+    metas = []
+    if rng.random() < 0.4:
+        metas.append({"Key": "year", "Value": str(rng.randint(1960, 2023))})
+    if rng.random() < 0.3:
+        metas.extend(
+            [
+                {"Key": "season number", "Value": str(rng.randint(1, 10))},
+                {"Key": "episode num", "Value": str(rng.randint(1, 24))},
+                {"Key": "episode name", "Value": f"Rész <{rng.randint(1, 99)}>"},
+            ]
+        )
+    programme_id = f"{epg_channel_id}{start:%Y%m%d%H%M}"
+    return {
+        "EPG_ID": programme_id,
+        "EPG_CHANNEL_ID": epg_channel_id,
+        "NAME": f'Műsor {programme_id} "{rng.choice(GENRES)}"',
+        "DESCRIPTION": " ".join(rng.choice(GENRES + COUNTRIES) for _ in range(40))
+        + " & more",
+        "START_DATE": start.strftime("%d/%m/%Y %H:%M:%S"),
+        "END_DATE": end.strftime("%d/%m/%Y %H:%M:%S"),
+        "EPG_Meta": metas,
+        "EPG_TAGS": tags,
+        "EPG_PICTURES": [
+            {
+                "Url": f"https://img.example.com/epg/{programme_id}/{width}.jpg",
+                "PicWidth": width,
+                "PicHeight": width * 9 // 16,
+                "Ratio": ratio,
+            }
+            for width, ratio in PICTURE_SIZES[:pictures]
+        ],
+    }
+
+
+def generate_epg(
+    epg_channel_ids: list,
+    from_offset: int,
+    to_offset: int,
+    anchor: datetime = None,
+    seed: int = 1,
+    max_actors: int = 5,
+    pictures: int = 2,
+) -> List[dict]:
+    """
+    Generates a GetEPGMultiChannelProgram response.
+
+    :param epg_channel_ids: The EPG channel IDs.
+    :param from_offset: The start of the window in days relative to the anchor.
+    :param to_offset: The end of the window in days relative to the anchor.
+    :param anchor: The day the offsets are relative to (default: today).
+    :param seed: The random seed.
+    :param max_actors: The maximum number of actor tags of a programme.
+    :param pictures: The number of pictures of a programme (at most 5).
+    :return: The list of EPG channel objects.
+    """
+    if anchor is None:
+        anchor = datetime.now()
+    anchor = datetime(anchor.year, anchor.month, anchor.day)
+    start = anchor + timedelta(days=from_offset)
+    end = anchor + timedelta(days=to_offset + 1)
+    return [
+        {
+            "EPG_CHANNEL_ID": str(epg_channel_id),
+            "EPGChannelProgrammeObject": generate_programmes(
+                str(epg_channel_id), start, end, seed, max_actors, pictures
+            ),
+        }
+        for epg_channel_id in epg_channel_ids
+    ]
@@ -1,8 +1,13 @@
+import sqlite3
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
 from json import dumps, loads
 from random import choice
 from socket import gaierror
-from sys import argv
-from time import time
+from sys import argv, version_info
+from time import monotonic, sleep, time
+from typing import Optional, Tuple
 from urllib.parse import parse_qsl, quote, urlencode, urlparse
 
 import inputstreamhelper  # type: ignore
@@ -10,18 +15,25 @@ import xbmc
 import xbmcaddon
 import xbmcgui
 import xbmcplugin
-from requests import ConnectionError, HTTPError, Session
+import xbmcvfs
+from requests import ConnectionError, HTTPError, RequestException, Session, Timeout
+from requests.exceptions import ChunkedEncodingError
 from resources.lib.myvodka import login as myvodka_login
 from resources.lib.myvodka import vtv
+from resources.lib.utils import cache
 from resources.lib.utils import static as utils_static
-from resources.lib.utils import unix_to_date, voda_to_epg_time
+from resources.lib.utils import first_tag, index_tags, unix_to_date
 from resources.lib.utils.dns_resolver import get_vtv_ip_from_mapi, resolve_domain
+from resources.lib.utils.image_hosts import ImageHosts
 from resources.lib.vodka import (
     devices,
     enums,
+    epg,
+    epg_store,
     login,
     media_list,
     misc,
+    models,
     recording,
     static,
 )
@@ -34,47 +46,72 @@ from resources.lib.vodka.playback import (
 addon = xbmcaddon.Addon()
 addon_name = addon.getAddonInfo("name")
 HOME_ID = 10000  # https://kodi.wiki/view/Window_IDs
+CHANNEL_CACHE_NAME = "channels.json"
+CHANNEL_CACHE_VERSION = 1
+ENTITLEMENT_CACHE_NAME = "entitlements.json"
+ENTITLEMENT_CACHE_VERSION = 1
+SNAPSHOT_CACHE_NAME = "channel_snapshot.json"
+SNAPSHOT_CACHE_VERSION = 1
+EPG_STORE_NAME = "epg.db"
+IMAGE_HOSTS_NAME = "image_hosts.json"
+# add_item keyword arguments and the info labels they are mapped to
+INFO_LABELS = (
+    ("description", "plot"),
+    ("type", "mediatype"),
+    ("year", "year"),
+    ("episode", "episode"),
+    ("season", "season"),
+    ("show_name", "tvshowtitle"),
+    ("genre", "genre"),
+    ("country", "country"),
+    ("director", "director"),
+    ("cast", "cast"),
+    ("mpaa", "mpaa"),
+    ("duration", "duration"),
+)
+AVAILABLE_PURCHASE_STATUSES = {
+    "subscription_purchased",
+    "free",
+    "ppv_purchased",
+    "collection_purchased",
+    "pre_paid_purchased",
+    "subscription_purchased_wrong_currency",
+}
+
+
+@lru_cache(maxsize=None)
+def localize(string_id: int) -> str:
+    """
+    Returns a localized string. Resolved only once per invocation, as
+     large listings would ask for the same strings for every item.
 
+    :param string_id: The string ID.
+    :return: The localized string.
+    """
+    return addon.getLocalizedString(string_id)
 
-def add_item(plugin_prefix, handle, name, action, is_directory, **kwargs) -> None:
+
+def build_item(
+    plugin_prefix, name, action, is_directory, **kwargs
+) -> Tuple[str, xbmcgui.ListItem, bool]:
     """
-    Adds an item to the Kodi listing
+    Builds an item for the Kodi listing
+
+    :return: An (url, ListItem, isFolder) tuple
     """
     url = f"{plugin_prefix}?action={action}"
     item = xbmcgui.ListItem(label=name)
-    info_labels = {}
-    if kwargs.get("description"):
-        info_labels.update({"plot": kwargs["description"]})
+    info_labels = {
+        label: kwargs[kwarg] for kwarg, label in INFO_LABELS if kwargs.get(kwarg)
+    }
     arts = {}
     if kwargs.get("icon"):
         arts.update({"thumb": kwargs["icon"], "icon": kwargs["icon"]})
     if kwargs.get("fanart"):
         arts.update({"fanart": kwargs["fanart"]})
         item.setProperty("Fanart_Image", kwargs["fanart"])
-    if kwargs.get("type"):
-        info_labels.update({"mediatype": kwargs["type"]})
     if kwargs.get("id"):
         url += "&id=%s" % (kwargs["id"])
-    if kwargs.get("year"):
-        info_labels.update({"year": kwargs["year"]})
-    if kwargs.get("episode"):
-        info_labels.update({"episode": kwargs["episode"]})
-    if kwargs.get("season"):
-        info_labels.update({"season": kwargs["season"]})
-    if kwargs.get("show_name"):
-        info_labels.update({"tvshowtitle": kwargs["show_name"]})
-    if kwargs.get("genre"):
-        info_labels.update({"genre": kwargs["genre"]})
-    if kwargs.get("country"):
-        info_labels.update({"country": kwargs["country"]})
-    if kwargs.get("director"):
-        info_labels.update({"director": kwargs["director"]})
-    if kwargs.get("cast"):
-        info_labels.update({"cast": kwargs["cast"]})
-    if kwargs.get("mpaa"):
-        info_labels.update({"mpaa": kwargs["mpaa"]})
-    if kwargs.get("duration"):
-        info_labels.update({"duration": kwargs["duration"]})
     if kwargs.get("extra"):
         url += "&extra=%s" % (kwargs["extra"])
     if kwargs.get("is_livestream"):
@@ -92,13 +129,34 @@ def add_item(plugin_prefix, handle, name, action, is_directory, **kwargs) -> Non
         pass  # if it's a local dir, no need for it
     ctx_menu = []
     if kwargs.get("refresh"):
-        ctx_menu.append((addon.getLocalizedString(30036), "Container.Refresh"))
+        ctx_menu.append((localize(30036), "Container.Refresh"))
     if kwargs.get("ctx_menu"):
         ctx_menu.extend(kwargs["ctx_menu"])
     item.addContextMenuItems(ctx_menu)
+    return url, item, is_directory
+
+
+def add_item(plugin_prefix, handle, name, action, is_directory, **kwargs) -> None:
+    """
+    Adds an item to the Kodi listing
+    """
+    url, item, is_directory = build_item(
+        plugin_prefix, name, action, is_directory, **kwargs
+    )
     xbmcplugin.addDirectoryItem(int(handle), url, item, is_directory)
 
 
+def add_items(handle, items: list) -> None:
+    """
+    Adds items built with build_item to the Kodi listing in one call
+
+    :param handle: The plugin handle
+    :param items: The list of (url, ListItem, isFolder) tuples
+    :return: None
+    """
+    xbmcplugin.addDirectoryItems(int(handle), items, len(items))
+
+
 def prepare_session() -> Session:
     """
     Prepare a requests session for use within the addon. Also sets
@@ -361,45 +419,225 @@ def main_menu() -> None:
     xbmcplugin.endOfDirectory(int(argv[1]))
 
 
-def get_available_files(session: Session, file_ids: list) -> list:
+def get_profile_path(addon_local: xbmcaddon.Addon, name: str) -> str:
+    """
+    Returns the path of a file in the addon profile directory.
+    Creates the directory if it doesn't exist yet.
+
+    :param addon_local: The addon instance.
+    :param name: The file name.
+    :return: The translated path.
+    """
+    profile = xbmcvfs.translatePath(addon_local.getAddonInfo("profile"))
+    if not xbmcvfs.exists(profile):
+        xbmcvfs.mkdirs(profile)
+    return f"{profile.rstrip('/')}/{name}"
+
+
+def get_household_key(addon_local: xbmcaddon.Addon) -> str:
+    """
+    Returns a cache key that's unique to the household the KS token
+     was issued for, so cached data is never shared between accounts.
+
+    :param addon_local: The addon instance.
+    :return: The cache key.
     """
-    Get the list of available file IDs.
+    return cache.make_key(
+        addon_local.getSetting("domainid"), addon_local.getSetting("phoenixgw")
+    )
+
+
+def get_channels(
+    session: Session, addon_from_thread: xbmcaddon.Addon = None, refresh: bool = False
+) -> list:
+    """
+    Returns the live channel catalog. The catalog rarely changes, so it's
+     cached in the addon profile for 'channelcachettl' hours.
+
+    :param session: The requests session.
+    :param addon_from_thread: The addon instance when called from a thread.
+    :param refresh: Whether to bypass the cache.
+    :return: The list of channels.
+    """
+    addon_local = addon_from_thread or addon
+    path = get_profile_path(addon_local, CHANNEL_CACHE_NAME)
+    key = get_household_key(addon_local)
+    ttl = addon_local.getSettingInt("channelcachettl") * 3600
+    if not refresh and ttl > 0:
+        channels = cache.read_cache(path, key, ttl, CHANNEL_CACHE_VERSION)
+        if channels is not None:
+            return channels
+    channels = media_list.get_channel_list(
+        session,
+        addon_local.getSetting("phoenixgw"),
+        addon_local.getSetting("kstoken"),
+        concurrency=addon_local.getSettingInt("fetchconcurrency"),
+    )
+    try:
+        cache.write_cache(path, key, channels, CHANNEL_CACHE_VERSION)
+    except OSError as e:
+        xbmc.log(f"[{addon_name}] Failed to write channel cache: {e}", xbmc.LOGWARNING)
+    return channels
+
+
+def refresh_channels() -> None:
+    """
+    Drops the cached channel catalog, subscriptions and listing snapshot
+     and refreshes the listing.
+
+    :return: None
+    """
+    cache.invalidate_cache(get_profile_path(addon, CHANNEL_CACHE_NAME))
+    cache.invalidate_cache(get_profile_path(addon, ENTITLEMENT_CACHE_NAME))
+    cache.invalidate_cache(get_profile_path(addon, SNAPSHOT_CACHE_NAME))
+    # derived channel data of the recordings list
+    xbmcgui.Window(HOME_ID).clearProperty("kodi.vodka.channels")
+    xbmc.executebuiltin("Container.Refresh")
+
+
+def is_transient_error(error: RequestException) -> bool:
+    """
+    Whether a failed request may succeed if it's retried: connection errors,
+     timeouts and server errors (5xx). Client errors (ie. an expired token
+     or a bad request) would fail again.
+
+    :param error: The exception of the request.
+    :return: Whether the request should be retried.
+    """
+    if isinstance(error, (ConnectionError, Timeout, ChunkedEncodingError)):
+        return True
+    if isinstance(error, HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+
+def get_product_prices(
+    session: Session,
+    file_ids: list,
+    tries: int = 3,
+    addon_from_thread: xbmcaddon.Addon = None,
+) -> list:
+    """
+    Get the product prices of a chunk of file IDs, retrying on transient
+     failures.
 
     :param session: The requests session.
     :param file_ids: The list of file IDs.
-    :return: The list of available file IDs.
-    """
-    # split the list of channels into chunks of 100 in the for loop
-    # to avoid sending too many requests at once
-    available_channels = []
-    for i in range(0, len(file_ids), 100):
-        # NOTE: original app does this in chunks of 10
-        # but that seems to be too slow, so we do it in chunks of 100
-        chunk = file_ids[i : min(i + 100, len(file_ids))]
-        response = media_list.product_price_list(
-            session,
-            addon.getSetting("phoenixgw"),
-            chunk,
-            addon.getSetting("kstoken"),
-        )
-        for product in response:
-            # NOTE: values here are only guesses
-            if product.get("purchaseStatus") in [
-                "subscription_purchased",
-                "free",
-                "ppv_purchased",
-                "collection_purchased",
-                "pre_paid_purchased",
-                "subscription_purchased_wrong_currency",
-            ]:
-                available_channels.append(product.get("fileId"))
-    return available_channels
+    :param tries: How many times to try before giving up.
+    :param addon_from_thread: The addon instance when called from a thread.
+    :return: The list of product prices.
+    """
+    addon_local = addon_from_thread or addon
+    for attempt in range(tries):
+        try:
+            return media_list.product_price_list(
+                session,
+                addon_local.getSetting("phoenixgw"),
+                file_ids,
+                addon_local.getSetting("kstoken"),
+            )
+        except RequestException as e:
+            if attempt == tries - 1 or not is_transient_error(e):
+                raise e
+            xbmc.log(
+                f"[{addon_name}] Product price request failed, retrying: {e}",
+                xbmc.LOGWARNING,
+            )
+            sleep(attempt + 1)
+
+
+def get_available_files(
+    session: Session, file_ids: list, addon_from_thread: xbmcaddon.Addon = None
+) -> set:
+    """
+    Get the set of available file IDs. Purchase statuses are cached per
+     household in the addon profile for 'entitlementcachettl' hours, so
+     only the stale IDs are queried.
+
+    :param session: The requests session.
+    :param file_ids: The list of file IDs.
+    :param addon_from_thread: The addon instance when called from a thread.
+    :return: The set of available file IDs.
+    """
+    addon_local = addon_from_thread or addon
+    path = get_profile_path(addon_local, ENTITLEMENT_CACHE_NAME)
+    key = get_household_key(addon_local)
+    ttl = addon_local.getSettingInt("entitlementcachettl") * 3600
+    now = int(time())
+    entitlements = {}
+    if ttl > 0:
+        cached = cache.read_cache(path, key, ttl, ENTITLEMENT_CACHE_VERSION) or {}
+        # file ID -> [purchase status, time of the check]
+        entitlements = {
+            file_id: entry
+            for file_id, entry in cached.items()
+            if 0 <= now - entry[1] < ttl
+        }
+    stale_file_ids = [
+        str(file_id) for file_id in file_ids if str(file_id) not in entitlements
+    ]
+    # split the list of channels into chunks of 100
+    # to avoid sending too many IDs in one request
+    # NOTE: original app does this in chunks of 10
+    # but that seems to be too slow, so we do it in chunks of 100
+    chunks = [stale_file_ids[i : i + 100] for i in range(0, len(stale_file_ids), 100)]
+    if chunks:
+        with ThreadPoolExecutor(
+            max_workers=min(
+                addon_local.getSettingInt("fetchconcurrency") or 1, len(chunks)
+            )
+        ) as executor:
+            for response in executor.map(
+                lambda chunk: get_product_prices(
+                    session, chunk, addon_from_thread=addon_local
+                ),
+                chunks,
+            ):
+                for product in response:
+                    entitlements[str(product.get("fileId"))] = [
+                        product.get("purchaseStatus") or "",
+                        now,
+                    ]
+        # files without a product price are stored as negative entries too
+        for file_id in stale_file_ids:
+            entitlements.setdefault(file_id, ["", now])
+        if ttl > 0:
+            try:
+                cache.write_cache(path, key, entitlements, ENTITLEMENT_CACHE_VERSION)
+            except OSError as e:
+                xbmc.log(
+                    f"[{addon_name}] Failed to write entitlement cache: {e}",
+                    xbmc.LOGWARNING,
+                )
+    # NOTE: values here are only guesses
+    return {
+        int(file_id)
+        for file_id in map(str, file_ids)
+        if entitlements[file_id][0] in AVAILABLE_PURCHASE_STATUSES
+    }
+
+
+@lru_cache(maxsize=None)
+def get_image_hosts() -> ImageHosts:
+    """
+    :return: The hosts of the images rewritten by replace_image.
+    """
+    return ImageHosts(get_profile_path(addon, IMAGE_HOSTS_NAME))
 
 
 def replace_image(image_url: str) -> str:
+    """
+    Rewrites an image URL to the web service and records its host, the
+     service only fetches images from the recorded hosts.
+
+    :param image_url: The URL of the image.
+    :return: The URL of the image on the web service.
+    """
     image_url = urlparse(image_url)
     hostname = image_url.hostname
     scheme = image_url.scheme
+    if hostname:
+        get_image_hosts().add(hostname)
     image_url = image_url._replace(scheme="http")._replace(
         netloc=f"127.0.0.1:{addon.getSetting('webport')}"
     )
@@ -410,235 +648,346 @@ def replace_image(image_url: str) -> str:
     return image_url.geturl() + "?" + urlencode(params)
 
 
-def channel_list(session: Session) -> None:
+def get_live_epg(
+    session: Session, epg_channel_ids: list, addon_from_thread: xbmcaddon.Addon = None
+) -> list:
     """
-    Renders the list of live channels.
+    Fetches today's EPG of the given channels for the live channel list.
+    Chunks are requested concurrently and the ones that fail or don't
+     finish within 'epgfetchtimeout' seconds are left out, so the list
+     can be rendered without their EPG. The downloads of the left out
+     chunks are abandoned at the same deadline.
 
     :param session: The requests session.
-    :return: None
+    :param epg_channel_ids: The list of EPG channel IDs.
+    :param addon_from_thread: The addon instance when called from a thread.
+    :return: The list of EPG channel objects in chunk order.
     """
-    channels = media_list.get_channel_list(
-        session, addon.getSetting("phoenixgw"), addon.getSetting("kstoken")
+    addon_local = addon_from_thread or addon
+    chunk_size = addon_local.getSettingInt("epgfetchinonereq")
+    chunks = [
+        epg_channel_ids[i : i + chunk_size]
+        for i in range(0, len(epg_channel_ids), chunk_size)
+    ]
+    if not chunks:
+        return []
+    timeout = addon_local.getSettingInt("epgfetchtimeout") or None
+    deadline = monotonic() + timeout if timeout else None
+    executor = ThreadPoolExecutor(
+        max_workers=min(addon_local.getSettingInt("fetchconcurrency") or 1, len(chunks))
     )
-    # sort channels by channel number
-    channels.sort(
-        key=lambda x: int(
-            next(
-                (
-                    value.get("value", 0)
-                    for key, value in x.get("metas", {}).items()
-                    if key == "Channel number"
-                ),
-                0,
-            )
+    futures = [
+        executor.submit(
+            media_list.get_epg_by_channel_ids,
+            session,
+            addon_local.getSetting("jsonpostgw"),
+            chunk,
+            0,
+            1,
+            2,
+            api_user=addon_local.getSetting("apiuser"),
+            api_pass=addon_local.getSetting("apipass"),
+            domain_id=addon_local.getSetting("domainid"),
+            site_guid=addon_local.getSetting("siteguid"),
+            platform=addon_local.getSetting("platform"),
+            ud_id=addon_local.getSetting("devicekey"),
+            # so the abandoned requests end too, the interpreter waits
+            # for the worker threads at exit
+            deadline=deadline,
         )
+        for chunk in chunks
+    ]
+    done, not_done = wait(futures, timeout=timeout)
+    # don't wait for the slow chunks, drop the ones that haven't started yet
+    if version_info >= (3, 9):
+        executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        for future in not_done:
+            future.cancel()
+        executor.shutdown(wait=False)
+    if not_done:
+        xbmc.log(
+            f"[{addon_name}] {len(not_done)} EPG chunk(s) timed out, rendering without them",
+            xbmc.LOGWARNING,
+        )
+    epgs = []
+    for future in futures:
+        if future not in done:
+            continue
+        try:
+            epgs.extend(future.result())
+        except (RequestException, ValueError) as e:
+            xbmc.log(f"[{addon_name}] Failed to fetch EPG chunk: {e}", xbmc.LOGWARNING)
+    return epgs
+
+
+def get_epg_description(
+    name: str, channel_epg: epg.ChannelEPG, epg_mode: int, now: float
+) -> Tuple[str, str]:
+    """
+    Builds the channel name and description shown on the live channel list
+     based on the 'epgonchannels' setting.
+
+    :param name: The channel name.
+    :param channel_epg: The channel entry of the EPG index.
+    :param epg_mode: The value of the 'epgonchannels' setting.
+    :param now: Unix timestamp.
+    :return: The channel name and the description.
+    """
+    current_program = None
+    if epg_mode in [0, 1, 2]:
+        current_program = epg.get_current_programme(channel_epg, now)
+        if current_program:
+            name += f"[CR][COLOR gray]{current_program.get('NAME')}[/COLOR]"
+    next_programs = []
+    if epg_mode in [0, 1, 3]:
+        # add start time in bold and title
+        next_programs = [
+            f"[B]{unix_to_date(start)}[/B] {program.get('NAME')}\n"
+            for start, program in epg.get_next_programmes(channel_epg, now)
+        ]
+    description = []
+    if epg_mode == 0:
+        # current program description and
+        # all next programs with start time and title
+        if current_program:
+            description.append(current_program.get("DESCRIPTION") + "\n\n")
+        description.extend(next_programs)
+    elif epg_mode == 1:  # next programs first, then current
+        description.extend(next_programs)
+        description.append("\n")
+        if current_program:
+            description.append(current_program.get("DESCRIPTION") + "\n")
+    elif epg_mode == 2 and current_program:  # only current program
+        description.append(current_program.get("DESCRIPTION"))
+    elif epg_mode == 3:  # only next programs
+        description.extend(next_programs)
+    return name, "".join(description)
+
+
+def get_snapshot_key(addon_local: xbmcaddon.Addon) -> str:
+    """
+    Returns the key of the channel list snapshot. Besides the household,
+     it depends on the settings that change what the snapshot contains.
+
+    :param addon_local: The addon instance.
+    :return: The cache key.
+    """
+    return cache.make_key(
+        get_household_key(addon_local),
+        addon_local.getSettingBool("showallchannels"),
+        addon_local.getSettingInt("epgonchannels") != 4,
     )
+
+
+def read_epg_store(
+    epg_channel_ids: list, now: int, addon_from_thread: xbmcaddon.Addon = None
+) -> Optional[dict]:
+    """
+    Reads the EPG of the next two days from the EPG store filled by the
+     EPG export service, if the service keeps it up to date.
+
+    :param epg_channel_ids: The list of EPG channel IDs.
+    :param now: Unix timestamp.
+    :param addon_from_thread: The addon instance when called from a thread.
+    :return: The EPG index (see epg.build_epg_index) or None if the
+     store is missing or outdated.
+    """
+    addon_local = addon_from_thread or addon
+    path = get_profile_path(addon_local, EPG_STORE_NAME)
+    if not addon_local.getSettingBool("autoupdateepg") or not xbmcvfs.exists(path):
+        return None
+    try:
+        with epg_store.EPGStore(path) as store:
+            updated = int(store.get_meta("updated") or 0)
+            # missed more than one scheduled update
+            if now - updated > 2 * addon_local.getSettingInt("epgupdatefrequency"):
+                return None
+            return store.get_epg_index(epg_channel_ids, now, now + 2 * 86400)
+    except sqlite3.Error as e:
+        xbmc.log(f"[{addon_name}] Failed to read the EPG store: {e}", xbmc.LOGWARNING)
+        return None
+
+
+def build_channel_snapshot(
+    session: Session, addon_from_thread: xbmcaddon.Addon = None
+) -> dict:
+    """
+    Fetches everything the live channel list needs: the channels that
+     should be listed, their playable file IDs and the EPG of today.
+    Only the programmes that can still be on air are kept, so the
+     snapshot stays small enough to be loaded quickly.
+
+    :param session: The requests session.
+    :param addon_from_thread: The addon instance when called from a thread.
+    :return: The snapshot, a JSON serializable dict.
+    """
+    addon_local = addon_from_thread or addon
+    channels = models.build_channels(get_channels(session, addon_local))
     potential_file_ids = {}
     no_epg_list = []
     for channel in channels:
-        media_files = [
-            media_file
-            for media_file in channel.get("mediaFiles")
-            if media_file.get("type") in static.media_file_ids
-        ]
-        # sort media files that contain 'HD' earlier
-        media_files.sort(key=lambda x: x.get("type").lower().find("hd"), reverse=True)
-        if not media_files:
+        if not channel.media_file:
             continue
-        media_file = media_files[0]["id"]
-        epg_id = channel.get("metas", {}).get("EPG_GUID_ID", {}).get("value")
-        if not epg_id:
+        media_file = channel.media_file[0]
+        if not channel.epg_id:
             no_epg_list.append(str(media_file))
         else:
-            potential_file_ids[epg_id] = str(media_file)
+            potential_file_ids[channel.epg_id] = str(media_file)
     # check which channels are available also from non-EPG sources
     available_file_ids = get_available_files(
-        session, list(potential_file_ids.values()) + no_epg_list
+        session, list(potential_file_ids.values()) + no_epg_list, addon_local
     )
-    epgs = []
-    if addon.getSettingInt("epgonchannels") != 4:  # EPG is enabled
-        if not addon.getSettingBool("showallchannels"):
+    show_all_channels = addon_local.getSettingBool("showallchannels")
+    epg_index = {}
+    now = int(time())
+    if addon_local.getSettingInt("epgonchannels") != 4:  # EPG is enabled
+        if not show_all_channels:
             # drop channels that are not available
             for channel_id, media_file_id in list(potential_file_ids.items()):
                 if int(media_file_id) not in available_file_ids:
                     potential_file_ids.pop(channel_id)
-        # get EPG data in bulk
-        chunk_size = addon.getSettingInt("epgfetchinonereq")
-        for i in range(0, len(potential_file_ids), chunk_size):
-            chunk = list(potential_file_ids.keys())[i : i + chunk_size]
-            channel_programs = media_list.get_epg_by_channel_ids(
-                session,
-                addon.getSetting("jsonpostgw"),
-                chunk,
-                0,
-                1,
-                2,
-                api_user=addon.getSetting("apiuser"),
-                api_pass=addon.getSetting("apipass"),
-                domain_id=addon.getSetting("domainid"),
-                site_guid=addon.getSetting("siteguid"),
-                platform=addon.getSetting("platform"),
-                ud_id=addon.getSetting("devicekey"),
-            )
-            # append the programs to the EPG list
-            epgs.extend(channel_programs)
+        # the EPG store kept up to date by the export service, if there's one
+        epg_index = read_epg_store(list(potential_file_ids.keys()), now, addon_local)
+        if epg_index is None:
+            # get EPG data in bulk
+            epgs = get_live_epg(session, list(potential_file_ids.keys()), addon_local)
+            # parse the programme times once and index them by EPG channel ID
+            epg_index = epg.build_epg_index(epgs)
+    snapshot = {"channels": [], "epg": {}}
     # TODO: get API version
     for channel in channels:
-        channel_id = channel.get("id")
-        if not channel_id:
+        if not channel.id:
             continue
-        name = channel.get("name")
-        images = channel.get("images")
-        image = None
-        if images:
-            image = next(
-                (image for image in images if image.get("ratio") == "16:10"),
-                images[0],
-            )["url"]
-            if addon.getSettingBool("webenabled"):
-                image = replace_image(image)
         # get media file id
-        media_files = [
-            media_file
-            for media_file in channel.get("mediaFiles")
-            if media_file.get("type") in static.media_file_ids
-            and media_file.get("id") in available_file_ids
-        ]
-        # sort media files that contain 'HD' earlier
-        media_files.sort(key=lambda x: x.get("type").lower().find("hd"), reverse=True)
-        playable = False
-        if not media_files and not addon.getSettingBool("showallchannels"):
+        media_file = channel.get_playable_media_file(available_file_ids)
+        if not media_file and not show_all_channels:
+            continue
+        snapshot["channels"].append(
+            {
+                "id": channel.id,
+                "name": channel.name,
+                "logo": channel.logo,
+                "file_id": media_file[0] if media_file else None,
+                "epg_id": channel.epg_id,
+            }
+        )
+        channel_epg = epg_index.get(str(channel.epg_id))
+        if not channel_epg or str(channel.epg_id) in snapshot["epg"]:
             continue
-        elif not media_files and addon.getSettingBool("showallchannels"):
+        starts, ends, programmes = channel_epg
+        # programmes before the current one can't be on air later either
+        first = max(bisect_left(starts, now) - 1, 0)
+        snapshot["epg"][str(channel.epg_id)] = (
+            starts[first:],
+            ends[first:],
+            [
+                {
+                    "NAME": programme.get("NAME"),
+                    "DESCRIPTION": programme.get("DESCRIPTION"),
+                }
+                for programme in programmes[first:]
+            ],
+        )
+    return snapshot
+
+
+def read_channel_snapshot(addon_local: xbmcaddon.Addon) -> dict:
+    """
+    Reads the channel list snapshot if it's younger than 'snapshotmaxage' minutes.
+
+    :param addon_local: The addon instance.
+    :return: The snapshot or None if it's missing or too old.
+    """
+    return cache.read_cache(
+        get_profile_path(addon_local, SNAPSHOT_CACHE_NAME),
+        get_snapshot_key(addon_local),
+        addon_local.getSettingInt("snapshotmaxage") * 60,
+        SNAPSHOT_CACHE_VERSION,
+    )
+
+
+def write_channel_snapshot(addon_local: xbmcaddon.Addon, snapshot: dict) -> None:
+    """
+    Stores the channel list snapshot in the addon profile.
+
+    :param addon_local: The addon instance.
+    :param snapshot: The snapshot returned by build_channel_snapshot.
+    :return: None
+    """
+    try:
+        cache.write_cache(
+            get_profile_path(addon_local, SNAPSHOT_CACHE_NAME),
+            get_snapshot_key(addon_local),
+            snapshot,
+            SNAPSHOT_CACHE_VERSION,
+        )
+    except OSError as e:
+        xbmc.log(
+            f"[{addon_name}] Failed to write channel list snapshot: {e}",
+            xbmc.LOGWARNING,
+        )
+
+
+def channel_list(session: Session) -> None:
+    """
+    Renders the list of live channels. The snapshot kept up to date by
+     the background service is used when it's fresh enough, otherwise
+     the data is fetched live.
+
+    :param session: The requests session.
+    :return: None
+    """
+    snapshot = None
+    use_snapshot = addon.getSettingBool("channelsnapshot")
+    if use_snapshot:
+        snapshot = read_channel_snapshot(addon)
+    if snapshot is None:
+        snapshot = build_channel_snapshot(session)
+        if use_snapshot:
+            write_channel_snapshot(addon, snapshot)
+    epg_mode = addon.getSettingInt("epgonchannels")
+    now = time()
+    web_enabled = addon.getSettingBool("webenabled")
+    ctx_menu = [
+        (
+            localize(30150),
+            f"RunPlugin({argv[0]}?action=refresh_channels)",
+        )
+    ]
+    items = []
+    for channel in snapshot["channels"]:
+        name = channel["name"]
+        image = channel["logo"]
+        if image and web_enabled:
+            image = replace_image(image)
+        media_file = channel["file_id"]
+        playable = media_file is not None
+        if not playable:
             name = f"[COLOR red]{name}[/COLOR]"  # channel not subscribed
-        else:
-            playable = True
-            media_file = media_files[0]["id"]
-        epg_id = channel.get("metas", {}).get("EPG_GUID_ID", {}).get("value")
         description = ""
-        if addon.getSettingInt("epgonchannels") != 4:  # EPG is enabled
-            epg = next(
-                (
-                    epg.get("EPGChannelProgrammeObject", {})
-                    for epg in epgs
-                    if epg.get("EPG_CHANNEL_ID") == str(epg_id)
-                ),
-                None,
-            )
-            if epg and addon.getSettingInt("epgonchannels") == 0:
-                # current program description and
-                # all next programs with start time and title
-
-                # find current program
-                current_program = next(
-                    (
-                        program
-                        for program in epg
-                        if voda_to_epg_time(program.get("START_DATE"))[1]
-                        < time()
-                        < voda_to_epg_time(program.get("END_DATE"))[1]
-                    ),
-                    None,
+        if epg_mode != 4:  # EPG is enabled
+            channel_epg = snapshot["epg"].get(str(channel["epg_id"]))
+            if channel_epg and channel_epg[2]:
+                name, description = get_epg_description(
+                    name, channel_epg, epg_mode, now
                 )
-                if current_program:
-                    name += f"[CR][COLOR gray]{current_program.get('NAME')}[/COLOR]"
-                    description += current_program.get("DESCRIPTION") + "\n\n"
-                # find next programs
-                next_programs = [
-                    program
-                    for program in epg
-                    if voda_to_epg_time(program.get("START_DATE"))[1] > time()
-                ]
-                for program in next_programs:
-                    # add start time in bold and title
-                    description += (
-                        "[B]"
-                        + unix_to_date(voda_to_epg_time(program.get("START_DATE"))[1])
-                        + "[/B] "
-                        + program.get("NAME")
-                        + "\n"
-                    )
-            elif (
-                epg and addon.getSettingInt("epgonchannels") == 1
-            ):  # next programs first, then current
-                # find next programs
-                next_programs = [
-                    program
-                    for program in epg
-                    if voda_to_epg_time(program.get("START_DATE"))[1] > time()
-                ]
-                for program in next_programs:
-                    # add start time in bold and title
-                    description += (
-                        "[B]"
-                        + unix_to_date(voda_to_epg_time(program.get("START_DATE"))[1])
-                        + "[/B] "
-                        + program.get("NAME")
-                        + "\n"
-                    )
-                description += "\n"
-                # find current program
-                current_program = next(
-                    (
-                        program
-                        for program in epg
-                        if voda_to_epg_time(program.get("START_DATE"))[1]
-                        < time()
-                        < voda_to_epg_time(program.get("END_DATE"))[1]
-                    ),
-                    None,
-                )
-                if current_program:
-                    name += f"[CR][COLOR gray]{current_program.get('NAME')}[/COLOR]"
-                    description += current_program.get("DESCRIPTION") + "\n"
-            elif (
-                epg and addon.getSettingInt("epgonchannels") == 2
-            ):  # only current program
-                # find current program
-                current_program = next(
-                    (
-                        program
-                        for program in epg
-                        if voda_to_epg_time(program.get("START_DATE"))[1]
-                        < time()
-                        < voda_to_epg_time(program.get("END_DATE"))[1]
-                    ),
-                    None,
-                )
-                if current_program:
-                    name += f"[CR][COLOR gray]{current_program.get('NAME')}[/COLOR]"
-                    description += current_program.get("DESCRIPTION")
-            elif (
-                epg and addon.getSettingInt("epgonchannels") == 3
-            ):  # only next programs
-                # find next programs
-                next_programs = [
-                    program
-                    for program in epg
-                    if voda_to_epg_time(program.get("START_DATE"))[1] > time()
-                ]
-                for program in next_programs:
-                    # add start time in bold and title
-                    description += (
-                        "[B]"
-                        + unix_to_date(voda_to_epg_time(program.get("START_DATE"))[1])
-                        + "[/B] "
-                        + program.get("NAME")
-                        + "\n"
-                    )
-        add_item(
-            plugin_prefix=argv[0],
-            handle=argv[1],
-            name=name,
-            action="play_channel" if playable else "dummy",
-            is_directory=False,
-            id=channel_id,
-            icon=image,
-            is_livestream=True,
-            refresh=True,
-            extra=media_file if playable else None,
-            description=description,
+        items.append(
+            build_item(
+                plugin_prefix=argv[0],
+                name=name,
+                action="play_channel" if playable else "dummy",
+                is_directory=False,
+                id=channel["id"],
+                icon=image,
+                is_livestream=True,
+                refresh=True,
+                extra=media_file if playable else None,
+                description=description,
+                ctx_menu=ctx_menu,
+            )
         )
+    add_items(argv[1], items)
     xbmcplugin.endOfDirectory(int(argv[1]))
     xbmcplugin.setContent(int(argv[1]), "videos")
 
@@ -692,21 +1041,6 @@ def _gen_mgr_params(playback_obj: list, asset_type: str) -> str:
     return urlencode(params)
 
 
-def get_tag(tags: list, key: str) -> str:
-    """
-    Gets the tag value from the list of tags.
-
-    :param tags: The list of tags.
-    :param key: The tag key.
-    :return: The tag value.
-    """
-    tag = next(
-        (tag["Value"] for tag in tags if tag["Key"] == key),
-        None,
-    )
-    return tag
-
-
 def play(
     session: Session,
     media_id: int,
@@ -1025,36 +1359,12 @@ def get_recordings(session: Session, page_num: int) -> None:
     else:
         # upon first run, fetch the channel list into a dict where the key
         # is the epg id and the value is a list with the media file id and pvr type
-        channels = media_list.get_channel_list(
-            session, addon.getSetting("phoenixgw"), addon.getSetting("kstoken")
-        )
-        for channel in channels:
-            epg_id = str(
-                next(
-                    (
-                        value.get("value")
-                        for key, value in channel.get("metas", {}).items()
-                        if key == "EPG_GUID_ID"
-                    ),
-                    channel.get("id"),
-                )
-            )
-            if not epg_id:
-                continue
-                # get media file id
-            media_files = [
-                media_file
-                for media_file in channel.get("mediaFiles")
-                if media_file.get("type") in static.media_file_ids
-            ]
-            # sort media files that contain 'HD' earlier
-            media_files.sort(
-                key=lambda x: x.get("type").lower().find("hd"), reverse=True
-            )
-            if not media_files:
+        for channel in models.build_channels(get_channels(session)):
+            epg_id = str(channel.epg_id or channel.id)
+            if not channel.media_file:
                 continue
-            media_file = media_files[0]
-            epg_ids[epg_id] = [str(media_file["id"]), media_file["type"]]
+            media_file_id, media_file_type = channel.media_file
+            epg_ids[epg_id] = [str(media_file_id), media_file_type]
 
         xbmcgui.Window(HOME_ID).setProperty("kodi.vodka.channels", dumps(epg_ids))
     page_num = int(page_num)
@@ -1074,6 +1384,7 @@ def get_recordings(session: Session, page_num: int) -> None:
         dialog = xbmcgui.Dialog()
         dialog.ok(addon_name, addon.getLocalizedString(30103))
         return
+    items = []
     for recording in recordings:
         recording_id = recording.get("RecordingID")
         if not recording_id:
@@ -1101,71 +1412,77 @@ def get_recordings(session: Session, page_num: int) -> None:
                 cover_image = replace_image(cover_image)
         if isinstance(image, str) and addon.getSettingBool("webenabled"):
             image = replace_image(image)
-        epg_tags = recording.get("EPG_TAGS")
-        start_time = get_tag(epg_tags, "startTime")
-        end_time = get_tag(epg_tags, "endTime")
-        booking_time = get_tag(epg_tags, "bookingTime")
-        delete_time = get_tag(epg_tags, "deleteTime")
-        duration = get_tag(epg_tags, "duration")
-        year = get_tag(epg_tags, "year")
-        series_name = get_tag(epg_tags, "seriesName")
-        season_number = get_tag(epg_tags, "seasonNumber")
-        episode_number = get_tag(epg_tags, "episode")
-        content_tags = next(
-            (tag["Value"] for tag in epg_tags if tag["Key"] == "contentTags"),
-            "",
-        ).split(" ")
+        epg_tags = index_tags(recording.get("EPG_TAGS"))
+        start_time = first_tag(epg_tags, "startTime")
+        end_time = first_tag(epg_tags, "endTime")
+        booking_time = first_tag(epg_tags, "bookingTime")
+        delete_time = first_tag(epg_tags, "deleteTime")
+        duration = first_tag(epg_tags, "duration")
+        year = first_tag(epg_tags, "year")
+        series_name = first_tag(epg_tags, "seriesName")
+        season_number = first_tag(epg_tags, "seasonNumber")
+        episode_number = first_tag(epg_tags, "episode")
+        content_tags = (first_tag(epg_tags, "contentTags") or "").split(" ")
         is_recordable = False
         if static.recordable in content_tags:
             is_recordable = True
         else:
             name = f"[COLOR red]{name}[/COLOR]"
         # construct description
-        description += f"\n\n{addon.getLocalizedString(30097)}: {channel_name}"
+        description += f"\n\n{localize(30097)}: {channel_name}"
         if start_time:
-            description += f"\n{addon.getLocalizedString(30099)}: {unix_to_date(int(start_time) // 1000)}"
+            description += (
+                f"\n{localize(30099)}: {unix_to_date(int(start_time) // 1000)}"
+            )
         if end_time:
-            description += f"\n{addon.getLocalizedString(30100)}: {unix_to_date(int(end_time) // 1000)}"
+            description += f"\n{localize(30100)}: {unix_to_date(int(end_time) // 1000)}"
         if booking_time:
-            description += f"\n{addon.getLocalizedString(30101)}: {unix_to_date(int(booking_time) // 1000)}"
+            description += (
+                f"\n{localize(30101)}: {unix_to_date(int(booking_time) // 1000)}"
+            )
         if delete_time:
-            description += f"\n{addon.getLocalizedString(30102)}: {unix_to_date(int(delete_time) // 1000)}"
+            description += (
+                f"\n{localize(30102)}: {unix_to_date(int(delete_time) // 1000)}"
+            )
         ctx_menu = [
             (
-                addon.getLocalizedString(30104),
+                localize(30104),
                 f"RunPlugin({argv[0]}?action=del_recording&recording_id={recording_id})",
             )
         ]
         # add item
-        add_item(
-            plugin_prefix=argv[0],
-            handle=argv[1],
-            name=name,
-            description=description,
-            action="play_recording" if is_recordable else "dummy",
-            is_directory=False,
-            id=recording_id,
-            icon=image,
-            is_livestream=False,
-            refresh=True,
-            year=year,
-            episode=episode_number,
-            season=season_number,
-            show_name=series_name,
-            duration=duration,
-            extra=str(epg_ids.get(epg_channel_id)),
-            ctx_menu=ctx_menu,
-            fanart=cover_image,
+        items.append(
+            build_item(
+                plugin_prefix=argv[0],
+                name=name,
+                description=description,
+                action="play_recording" if is_recordable else "dummy",
+                is_directory=False,
+                id=recording_id,
+                icon=image,
+                is_livestream=False,
+                refresh=True,
+                year=year,
+                episode=episode_number,
+                season=season_number,
+                show_name=series_name,
+                duration=duration,
+                extra=str(epg_ids.get(epg_channel_id)),
+                ctx_menu=ctx_menu,
+                fanart=cover_image,
+            )
         )
     # add pagination
-    add_item(
-        plugin_prefix=argv[0],
-        handle=argv[1],
-        name=addon.getLocalizedString(30098) + " >",
-        action="recordings",
-        is_directory=True,
-        extra=str(page_num + 1),
+    items.append(
+        build_item(
+            plugin_prefix=argv[0],
+            name=localize(30098) + " >",
+            action="recordings",
+            is_directory=True,
+            extra=str(page_num + 1),
+        )
     )
+    add_items(argv[1], items)
     xbmcplugin.setContent(int(argv[1]), "episodes")
     xbmcplugin.endOfDirectory(int(argv[1]))
 
@@ -1861,6 +2178,8 @@ if __name__ == "__main__":
         )
     elif action == "del_recording":
         delete_recording(session, params["recording_id"])
+    elif action == "refresh_channels":
+        refresh_channels()
     elif action == "settings":
         addon.openSettings()
     elif action == "about":
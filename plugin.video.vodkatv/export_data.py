@@ -1,6 +1,10 @@
 import threading
-from datetime import datetime
-from time import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from time import monotonic, time
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
 from urllib.parse import urlencode
 
 import xbmc
@@ -8,15 +12,42 @@ import xbmcaddon
 import xbmcgui
 import xbmcvfs
 from default import (
+    EPG_STORE_NAME,
     authenticate,
     get_available_files,
-    get_tag,
+    get_channels,
+    get_profile_path,
     prepare_session,
     replace_image,
 )
 from requests import Session
-from resources.lib.utils import voda_to_epg_time
-from resources.lib.vodka import media_list, static
+from resources.lib.utils import (
+    cache,
+    convert_programme_times,
+    epg_day_to_unix,
+    first_tag,
+    index_tags,
+)
+from resources.lib.utils.checkpoint import ExportCheckpoint
+from resources.lib.utils.chunking import AdaptiveChunkSizer
+from resources.lib.utils.digests import ChannelDigests, digest
+from resources.lib.utils.m3u import render_playlist, write_playlist
+from resources.lib.utils.prefetch import PrefetchBuffer
+from resources.lib.utils.scheduler import ExportScheduler
+from resources.lib.utils.shards import ShardStore
+from resources.lib.utils.xmltv import XMLTVWriter, render_programme
+from resources.lib.vodka import media_list, models, static
+from resources.lib.vodka.epg_store import EPGStore, programme_row
+
+EPG_SHARD_DIR = "epg_shards"
+EPG_CHECKPOINT_NAME = "epg_export_checkpoint.json"
+EPG_DIGESTS_NAME = "epg_digests.json"
+CHANNEL_LIST_DIGESTS_NAME = "channel_list_digests.json"
+# the updater waits in steps of this many seconds, so it notices when the
+# wall clock jumps (ie. the device was suspended)
+UPDATER_WAIT_STEP = 60
+# channels a worker decodes ahead of the rendering of its chunk
+PREFETCH_CHANNELS = 2
 
 
 def get_path(addon: xbmcaddon.Addon, is_epg: bool = False) -> str:
@@ -50,6 +81,7 @@ def export_channel_list(addon: xbmcaddon.Addon, _session: Session) -> None:
     :param _session: requests.Session object
     :return: None
     """
+    handle = f"[{addon.getAddonInfo('name')}]"
     dialog = xbmcgui.Dialog()
     try:
         path = get_path(addon)
@@ -68,75 +100,32 @@ def export_channel_list(addon: xbmcaddon.Addon, _session: Session) -> None:
         )
         return
     authenticate(_session, addon)
-    # print m3u header
-    output = "#EXTM3U\n\n"
-    channels = media_list.get_channel_list(
-        _session, addon.getSetting("phoenixgw"), addon.getSetting("kstoken")
-    )
-    # sort channels by channel number
-    channels.sort(
-        key=lambda x: int(
-            next(
-                (
-                    value.get("value", 0)
-                    for key, value in x.get("metas", {}).items()
-                    if key == "Channel number"
-                ),
-                0,
-            )
-        )
-    )
-    available_file_ids = []
-    for channel in channels:
-        media_files = [
-            media_file
-            for media_file in channel.get("mediaFiles")
-            if media_file.get("type") in static.media_file_ids
-        ]
-        # sort media files that contain 'HD' earlier
-        media_files.sort(key=lambda x: x.get("type").lower().find("hd"), reverse=True)
-        if not media_files:
-            continue
-        media_file = media_files[0]["id"]
-        available_file_ids.append(str(media_file))
+    channels = models.build_channels(get_channels(_session, addon))
+    available_file_ids = [
+        str(channel.media_file[0]) for channel in channels if channel.media_file
+    ]
     # check which channels are available
-    available_file_ids = get_available_files(_session, available_file_ids)
+    available_file_ids = get_available_files(_session, available_file_ids, addon)
+    digests = ChannelDigests(
+        get_profile_path(addon, CHANNEL_LIST_DIGESTS_NAME), cache.make_key(path)
+    )
+    web_enabled = addon.getSetting("webenabled")
+    plugin_url = f"plugin://{addon.getAddonInfo('id')}/"
+    entries = []
     for channel in channels:
-        channel_id = channel.get("id")
+        channel_id = channel.id
         if not channel_id:
             continue
-        epg_id = next(
-            (
-                value.get("value", channel_id)
-                for key, value in channel.get("metas", {}).items()
-                if key == "EPG_GUID_ID"
-            ),
-            channel_id,
-        )
-        name = channel.get("name").strip()
-        images = channel.get("images")
-        image = None
-        if images:
-            image = next(
-                (image for image in images if image.get("ratio") == "16:10"),
-                images[0],
-            )["url"]
-            if addon.getSetting("webenabled"):
-                image = replace_image(image)
+        epg_id = channel.epg_id or channel_id
+        name = channel.name.strip()
+        image = channel.logo
+        if image and web_enabled:
+            image = replace_image(image)
         # get media file id
-        media_files = [
-            media_file
-            for media_file in channel.get("mediaFiles")
-            if media_file.get("type") in static.media_file_ids
-            and media_file.get("id") in available_file_ids
-        ]
-        # sort media files that contain 'HD' earlier
-        media_files.sort(key=lambda x: x.get("type").lower().find("hd"), reverse=True)
-        if not media_files:
+        media_file = channel.get_playable_media_file(available_file_ids)
+        if not media_file:
             continue
-        media_file = media_files[0]["id"]
-        # print channel data to m3u
-        output += f'#EXTINF:-1 tvg-id="{epg_id}" tvg-name="{name}" tvg-logo="{image}" group-title="vodkatv" catchup="vod",{name}\n'
+        media_file = media_file[0]
         query = {
             "action": "play_channel",
             "name": name,
@@ -145,11 +134,17 @@ def export_channel_list(addon: xbmcaddon.Addon, _session: Session) -> None:
             "extra": media_file,
             "pvr": ".pvr",  # hack to make Kodi recognize the stream as a PVR stream
         }
-        url = f"plugin://{addon.getAddonInfo('id')}/?{urlencode(query)}"
-        output += f"{url}\n\n"
+        entry = (str(epg_id), name, image, f"{plugin_url}?{urlencode(query)}")
+        entries.append(entry)
+        digests.add(str(channel_id), digest(str(part) for part in entry))
+    changed, unchanged, removed = digests.changes()
+    xbmc.log(
+        f"{handle} Channel list export: {changed} channels changed, {unchanged} unchanged, {removed} removed",
+        xbmc.LOGINFO,
+    )
+    # the file isn't touched if it's the same, so the clients don't reload it
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(output)
+        written = write_playlist(path, render_playlist(entries))
     except IOError:
         dialog.notification(
             addon.getAddonInfo("name"),
@@ -157,6 +152,10 @@ def export_channel_list(addon: xbmcaddon.Addon, _session: Session) -> None:
             xbmcgui.NOTIFICATION_ERROR,
         )
         return
+    if not written:
+        xbmc.log(f"{handle} Channel list export: {path} is up to date", xbmc.LOGINFO)
+    if not digests.is_unchanged():
+        digests.save()
     dialog.notification(
         addon.getAddonInfo("name"),
         addon.getLocalizedString(30056),
@@ -165,278 +164,754 @@ def export_channel_list(addon: xbmcaddon.Addon, _session: Session) -> None:
     )
 
 
-def enc_xml(text) -> str:
+def render_programmes(
+    addon: xbmcaddon.Addon,
+    channel_programmes: dict,
+    file_id: int,
+    time_memo: dict,
+    low_memory: bool = False,
+) -> List[Tuple[str, str]]:
     """
-    Method to encode an XML string
+    Renders the programmes of an EPG channel object to XMLTV.
 
-    :param text: string to encode
-    :return: encoded string
+    :param channel_programmes: The EPG channel object (GetEPGMultiChannelProgram)
+    :param file_id: The media file ID of the channel, used for catchup
+    :param time_memo: Memo of converted programme times
+    :param low_memory: Whether to drop the other images of the programmes
+    :return: A list of (start day (YYYYMMDD), programme element) tuples
     """
-    to_replace = {
-        "&": "&amp;",
-        "'": "&apos;",
-        '"': "&quot;",
-        ">": "&gt;",
-        "<": "&lt;",
-    }
-    translation_table = str.maketrans(to_replace)
-    return text.translate(translation_table)
+    epg_channel_id = channel_programmes.get("EPG_CHANNEL_ID")
+    programme_object = channel_programmes.get("EPGChannelProgrammeObject")
+    programme_times = convert_programme_times(programme_object, time_memo)
+    rendered = []
+    for programme, times in zip(programme_object, programme_times):
+        epg_programme_id = programme.get("EPG_ID")
+        if not times:
+            continue
+        start_date, start_date_unix, end_date, end_date_unix = times
+        epg_meta = index_tags(programme.get("EPG_Meta"))
+        images = programme.get("EPG_PICTURES")
+        image = None
+        if images:
+            # sort images by PicWidth and PicHeight, prefer Ratio = bg
+            images.sort(
+                key=lambda x: (
+                    x.get("PicWidth", 0),
+                    x.get("PicHeight", 0),
+                    x.get("Ratio", "") == "bg",
+                ),
+                reverse=True,
+            )
+            if low_memory:
+                # only the chosen one is used (by programme_row too)
+                del images[1:]
+            image = images[0].get("Url")
+            if isinstance(image, str) and addon.getSetting("webenabled"):
+                # i have encountered a case where image was bytes
+                image = replace_image(image)
+        episode = first_tag(epg_meta, "episode num")
+        season = first_tag(epg_meta, "season number")
+        epg_tags = index_tags(programme.get("EPG_TAGS"))
+        content_tags = epg_tags.get("contentTags", ())
+        catchup_url = f"plugin://{addon.getAddonInfo('id')}/?action=catchup&id={epg_programme_id}&cid={file_id}&start={start_date_unix}&end={end_date_unix}"
+        to_catchup = False
+        if static.recordable in content_tags:
+            catchup_url += "&rec=1"
+            to_catchup = True
+        else:
+            catchup_url += "&rec=0"
+        if static.restartable in content_tags:
+            catchup_url += "&res=1"
+            to_catchup = True
+        else:
+            catchup_url += "&res=0"
+        element = render_programme(
+            start_date,
+            end_date,
+            epg_channel_id,
+            programme.get("NAME"),
+            programme.get("DESCRIPTION"),
+            catchup_id=catchup_url if to_catchup else None,
+            date=first_tag(epg_meta, "year"),
+            categories=epg_tags.get("genre", ()),
+            countries=epg_tags.get("country of production", ()),
+            # TODO: only the roles are written yet, see render_programme
+            actors=epg_tags.get("actors", ()),
+            directors=epg_tags.get("director", ()),
+            icon=image,
+            episode_num=(
+                f"{int(season) - 1}.{int(episode) - 1}."
+                if all([episode, season])
+                else None
+            ),
+            sub_title=first_tag(epg_meta, "episode name"),
+        )
+        # EPG times start with YYYYMMDD
+        rendered.append((start_date[:8], element))
+    return rendered
 
 
-def export_epg(
+def fetch_epg_chunk(
     addon: xbmcaddon.Addon,
     _session: Session,
-    from_time: int,
-    to_time: int,
+    first: int,
+    last: int,
+    chunk: list,
     utc_offset: int,
-    kill_event: threading.Event = None,
-) -> None:
+) -> media_list.StreamedArray:
     """
-    Exports all EPG data between two timestamps to an XMLTV file.
+    Fetches the EPG of a chunk of channels, used by the export workers.
+    The request is sent here, the response is downloaded and decoded one
+     channel at a time while the returned iterable is consumed.
 
     :param _session: requests.Session object
-    :param from_time: Unix timestamp of the start time
-    :param to_time: Unix timestamp of the end time
+    :param first: First day offset
+    :param last: Last day offset
+    :param chunk: The list of EPG channel IDs
     :param utc_offset: UTC offset
-    :param kill_event: threading.Event object to kill the thread (optional)
-    :return: None
+    :return: An iterable of the EPG channel objects
     """
-    handle = f"[{addon.getAddonInfo('name')}]"
-    xbmc.log(
-        f"{handle} Exporting EPG data from {from_time} days to +{to_time} days started",
-        xbmc.LOGINFO,
+    return media_list.iter_epg_by_channel_ids(
+        _session,
+        addon.getSetting("jsonpostgw"),
+        chunk,
+        first,
+        last,
+        utc_offset,
+        api_user=addon.getSetting("apiuser"),
+        api_pass=addon.getSetting("apipass"),
+        domain_id=addon.getSetting("domainid"),
+        site_guid=addon.getSetting("siteguid"),
+        platform=addon.getSetting("platform"),
+        ud_id=addon.getSetting("devicekey"),
     )
-    dialog = xbmcgui.Dialog()
-    try:
-        path = get_path(addon, is_epg=True)
-    except IOError:
-        dialog.notification(
-            addon.getAddonInfo("name"),
-            addon.getLocalizedString(30054),
-            xbmcgui.NOTIFICATION_ERROR,
+
+
+def get_day_runs(offsets: List[int]) -> List[Tuple[int, int]]:
+    """
+    Splits sorted day offsets into runs of consecutive days,
+     so each run can be fetched with a single request.
+
+    :param offsets: Sorted day offsets
+    :return: A list of (first offset, last offset) tuples
+    """
+    runs = []
+    for offset in offsets:
+        if runs and runs[-1][1] == offset - 1:
+            runs[-1] = (runs[-1][0], offset)
+        else:
+            runs.append((offset, offset))
+    return runs
+
+
+class RenderedChunk:
+    """
+    The rendered programmes of a chunk (the channels of a run of days
+     fetched by one request), until they are stored.
+    """
+
+    def __init__(self, task: Tuple[int, int, list], days: List[str]):
+        """
+        :param task: The first day offset, the last day offset and the EPG IDs.
+        :param days: The days (YYYYMMDD) of the offsets.
+        """
+        self.epg_ids = task[2]
+        self.days = days
+        self.start = epg_day_to_unix(days[0])
+        self.end = epg_day_to_unix(days[-1]) + 86400
+        # programme elements by day and rows of the EPG store, of the
+        # channels that aren't stored yet
+        self.fragments: Dict[int, Dict[str, List[str]]] = {
+            epg_id: {day: [] for day in days} for epg_id in self.epg_ids
+        }
+        self.rows: Dict[int, list] = {epg_id: [] for epg_id in self.epg_ids}
+        # the stored days by shard name, days without programmes (ie. of
+        # channels missing from the response) aren't stored, so they are
+        # requested again
+        self.completed: Dict[str, Set[str]] = {}
+        # channels already stored in low memory mode
+        self.stored: Set[int] = set()
+        self.programmes = 0
+
+    @property
+    def channel_days(self) -> int:
+        """The size of the request in channel days"""
+        return len(self.epg_ids) * len(self.days)
+
+
+class EPGExport:
+    """
+    An export of the EPG window to an XMLTV file, see export_epg.
+    It's run in stages:
+     - plan: the channel days to fetch, grouped into runs of consecutive days
+     - fetch: the runs are split into chunks, which are fetched by a pool of
+        workers and rendered in the order they were submitted in
+     - store: the rendered days are written to the shards of the channels,
+        the programmes to the EPG store, and the chunk is checkpointed
+     - merge: the shards of the window are merged into the XMLTV file
+    """
+
+    def __init__(
+        self,
+        addon: xbmcaddon.Addon,
+        _session: Session,
+        from_time: int,
+        to_time: int,
+        utc_offset: int,
+        kill_event: threading.Event = None,
+    ):
+        """
+        :param _session: requests.Session object
+        :param from_time: Start of the window in days relative to today (ie. -1)
+        :param to_time: End of the window in days relative to today
+        :param utc_offset: UTC offset
+        :param kill_event: threading.Event object to kill the export (optional)
+        """
+        self.addon = addon
+        self._session = _session
+        self.from_time = int(from_time)
+        self.to_time = int(to_time)
+        self.utc_offset = utc_offset
+        self.kill_event = kill_event
+        self.handle = f"[{addon.getAddonInfo('name')}]"
+        self.low_memory = addon.getSettingBool("epglowmemory")
+        # day offsets of the window and the days they refer to
+        today = date.today()
+        self.window = {
+            offset: (today + timedelta(days=offset)).strftime("%Y%m%d")
+            for offset in range(self.from_time, self.to_time + 1)
+        }
+        # shards have to be rendered again if any of these change
+        self.render_key = cache.make_key(
+            addon.getAddonInfo("id"),
+            addon.getSetting("webenabled"),
+            addon.getSetting("webport"),
         )
-        return
-    if not all([addon.getSetting("username"), addon.getSetting("password")]):
-        dialog.notification(
-            addon.getAddonInfo("name"),
-            addon.getLocalizedString(30055),
-            xbmcgui.NOTIFICATION_ERROR,
+        # (EPG ID, name, logo) of the exported channels, in file order
+        self.channel_elements: List[Tuple[str, str, Optional[str]]] = []
+        # media file IDs and shard names of the channels by EPG ID
+        self.epg_ids: Dict[int, int] = {}
+        self.shard_names: Dict[int, str] = {}
+        self.shard_store: Optional[ShardStore] = None
+        self.checkpoint: Optional[ExportCheckpoint] = None
+        self.epg_store: Optional[EPGStore] = None
+        self.sizer: Optional[AdaptiveChunkSizer] = None
+        # converted programme times, shared between the chunks
+        self.time_memo = {}
+        self.fetched = 0
+        self.chunks = 0
+        # (first day offset, last day offset, EPG IDs) still to be requested,
+        # and the submitted chunks with their buffers and futures
+        self._remaining_runs: Deque[Tuple[int, int, list]] = deque()
+        self._pending = deque()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._chunk_size = 1
+        self._workers = 1
+
+    @property
+    def killed(self) -> bool:
+        """Whether the export has to be aborted"""
+        return bool(self.kill_event and self.kill_event.is_set())
+
+    def run(self) -> None:
+        """
+        Runs the stages of the export.
+
+        :return: None
+        """
+        addon = self.addon
+        handle = self.handle
+        xbmc.log(
+            f"{handle} Exporting EPG data from {self.from_time} days to +{self.to_time} days started",
+            xbmc.LOGINFO,
         )
-        return
-    authenticate(_session, addon)
-    temp_path = path + ".tmp"
-    chunk_size = addon.getSettingInt("epgfetchinonereq")
-    channels = media_list.get_channel_list(
-        _session, addon.getSetting("phoenixgw"), addon.getSetting("kstoken")
-    )
-    with open(temp_path, "w", encoding="utf-8") as f:
-        # print XML header
-        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        f.write('<!DOCTYPE tv SYSTEM "xmltv.dtd">\n')
-        # print addont info
-        f.write(
-            f"<tv generator-info-name=\"{enc_xml(addon.getAddonInfo('name'))}\" generator-info-url=\"plugin://{addon.getAddonInfo('id')}/\">"
+        export_started = time()
+        dialog = xbmcgui.Dialog()
+        try:
+            path = get_path(addon, is_epg=True)
+        except IOError:
+            dialog.notification(
+                addon.getAddonInfo("name"),
+                addon.getLocalizedString(30054),
+                xbmcgui.NOTIFICATION_ERROR,
+            )
+            return
+        if not all([addon.getSetting("username"), addon.getSetting("password")]):
+            dialog.notification(
+                addon.getAddonInfo("name"),
+                addon.getLocalizedString(30055),
+                xbmcgui.NOTIFICATION_ERROR,
+            )
+            return
+        authenticate(self._session, addon)
+        compress_level = 0
+        if addon.getSettingBool("epgcompress"):
+            compress_level = addon.getSettingInt("epgcompresslevel")
+            if not path.endswith(".gz"):
+                path += ".gz"
+        temp_path = path + ".tmp"
+        channels = models.build_channels(get_channels(self._session, addon))
+        self.shard_store = ShardStore(
+            get_profile_path(addon, EPG_SHARD_DIR), self.render_key
+        )
+        self.checkpoint = ExportCheckpoint(
+            get_profile_path(addon, EPG_CHECKPOINT_NAME),
+            cache.make_key(*self.window.values(), self.render_key),
+        )
+        if self.checkpoint.stale and xbmcvfs.exists(temp_path):
+            # left behind by an export of another window
+            xbmcvfs.delete(temp_path)
+        if self.checkpoint.completed:
+            xbmc.log(
+                f"{handle} EPG export: resuming, {sum(len(days) for days in self.checkpoint.completed.values())} channel days were fetched by an earlier run",
+                xbmc.LOGINFO,
+            )
+        if not self.add_channels(channels):
+            return
+        removed = self.shard_store.prune(
+            self.shard_names.values(), self.window.values()
+        )
+        # programmes are also stored in the database read by the plugin
+        self.epg_store = EPGStore(get_profile_path(addon, EPG_STORE_NAME))
+        try:
+            if not self.fetch(self.plan()):
+                return
+        finally:
+            self.epg_store.close()
+        # the digests of the channels are compared with the previous export,
+        # so the file isn't replaced (and reloaded by the clients) in vain
+        digests = ChannelDigests(
+            get_profile_path(addon, EPG_DIGESTS_NAME),
+            cache.make_key(
+                path,
+                compress_level,
+                addon.getAddonInfo("name"),
+                addon.getAddonInfo("id"),
+            ),
+        )
+        if not self.merge(temp_path, compress_level, digests):
+            return
+        xbmc.log(
+            f"{handle} EPG export: fetched {self.fetched} of {len(self.shard_names) * len(self.window)} channel days, removed {removed} expired shards, took {time() - export_started:.2f} seconds",
+            xbmc.LOGINFO,
+        )
+        changed, unchanged, removed_channels = digests.changes()
+        xbmc.log(
+            f"{handle} EPG export: {changed} channels changed, {unchanged} unchanged, {removed_channels} removed",
+            xbmc.LOGINFO,
         )
-        epg_ids = {}
+        if digests.is_unchanged() and xbmcvfs.exists(path):
+            # keep the file and its modification time
+            xbmcvfs.delete(temp_path)
+            xbmc.log(f"{handle} EPG export: {path} is up to date", xbmc.LOGINFO)
+        else:
+            # move temp file to final file
+            xbmcvfs.rename(temp_path, path)
+        digests.save()
+        self.checkpoint.discard()
+        if addon.getSettingBool("epgnotifoncompletion"):
+            dialog.notification(
+                addon.getAddonInfo("name"),
+                addon.getLocalizedString(30082),
+                xbmcgui.NOTIFICATION_INFO,
+            )
+        addon.setSetting("lastepgupdate", str(int(time())))
+
+    def add_channels(self, channels: List[models.Channel]) -> bool:
+        """
+        Collects the channels to export, the ones without an EPG ID or
+         a media file are skipped.
+
+        :param channels: The channels of the account.
+        :return: False if the export was killed.
+        """
         for channel in channels:
             # check if we need to abort
-            if kill_event and kill_event.is_set():
-                return
-            epg_id = next(
+            if self.killed:
+                return False
+            epg_id = channel.epg_id or channel.id
+            if not epg_id or not channel.media_file:
+                continue
+            image = channel.logo
+            if image and isinstance(image, str) and self.addon.getSetting("webenabled"):
+                # i have encountered a case where image was bytes
+                image = replace_image(image)
+            self.channel_elements.append((str(epg_id), channel.name, image))
+            self.epg_ids[epg_id] = channel.media_file[0]
+            # the catchup URLs contain the file ID too
+            self.shard_names[epg_id] = ShardStore.channel_name(
+                epg_id, channel.media_file[0]
+            )
+        return True
+
+    def plan(self) -> Deque[Tuple[int, int, list]]:
+        """
+        Plan stage: collects the channel days to fetch, the ones missing
+         from the shards and the ones that may still change ('epgrefreshdays'
+         days from today), except the ones fetched by an interrupted export.
+        The channels are grouped by the days they need, so they can share
+         requests.
+
+        :return: The (first day offset, last day offset, EPG IDs) runs, they
+         are split into chunks as they are submitted.
+        """
+        # if the EPG store is new, the days of the shards are missing from it
+        epg_store_is_new = self.epg_store.get_meta("updated") is None
+        refresh_days = self.addon.getSettingInt("epgrefreshdays")
+        runs = {}
+        for epg_id, shard_name in self.shard_names.items():
+            stored_days = (
+                set() if epg_store_is_new else self.shard_store.days(shard_name)
+            )
+            offsets = [
+                offset
+                for offset, day in self.window.items()
+                if (0 <= offset < refresh_days or day not in stored_days)
+                and not self.checkpoint.is_completed(shard_name, day)
+            ]
+            for run in get_day_runs(offsets):
+                runs.setdefault(run, []).append(epg_id)
+        return deque(
+            (first, last, run_epg_ids) for (first, last), run_epg_ids in runs.items()
+        )
+
+    def fetch(self, runs: Deque[Tuple[int, int, list]]) -> bool:
+        """
+        Fetch stage: the runs are split into chunks, which are fetched by a
+         pool of workers, while they are rendered and stored here in the order
+         they were submitted in. At most 'epgexportqueuedepth' responses are
+         requested ahead, and their workers decode at most PREFETCH_CHANNELS
+         channels ahead, which bounds the memory use.
+
+        :param runs: The runs returned by plan.
+        :return: False if the export was killed.
+        """
+        addon = self.addon
+        handle = self.handle
+        self._remaining_runs = runs
+        self._chunk_size = addon.getSettingInt("epgfetchinonereq")
+        # in adaptive mode the chunk size follows the response time of the
+        # gateway, starting from the size learned by the previous export
+        if addon.getSettingBool("epgadaptivechunk"):
+            learned = addon.getSetting("epgchunklearned")
+            self.sizer = AdaptiveChunkSizer(
                 (
-                    value.get("value")
-                    for key, value in channel.get("metas", {}).items()
-                    if key == "EPG_GUID_ID"
+                    int(learned)
+                    if learned.isdigit()
+                    else self._chunk_size * len(self.window)
                 ),
-                channel.get("id"),
+                addon.getSettingInt("epgchunktarget"),
+            )
+            xbmc.log(
+                f"{handle} EPG export: adaptive chunk size, starting with {self.sizer.size} channel days per request",
+                xbmc.LOGINFO,
+            )
+        started = time()
+        queue_depth = max(addon.getSettingInt("epgexportqueuedepth"), 1)
+        self._workers = max(
+            min(addon.getSettingInt("epgexportworkers"), len(self.shard_names)), 1
+        )
+        self._executor = ThreadPoolExecutor(max_workers=self._workers)
+        buffer = None
+        try:
+            self.epg_store.delete_before(epg_day_to_unix(self.window[self.from_time]))
+            for _ in range(queue_depth):
+                self._submit_next()
+            while self._pending:
+                # check if we need to abort
+                if self.killed:
+                    return False
+                task, buffer, future = self._pending.popleft()
+                # the next chunk is requested while this one is streamed
+                self._submit_next()
+                chunk = self.render_chunk(task, buffer)
+                try:
+                    latency = future.result()
+                except Exception as e:
+                    # the request failed, the body was truncated or it's not
+                    # valid JSON, the channels stored so far are stored again
+                    # by the retry
+                    self._retry_smaller(task, e)
+                    continue
+                self.store_chunk(chunk, latency)
+            self.epg_store.set_meta("updated", str(int(time())))
+        finally:
+            # don't start the requests that are not needed anymore
+            # and release the responses that won't be rendered
+            if buffer is not None:
+                buffer.close()
+            for _, pending_buffer, future in self._pending:
+                future.cancel()
+                pending_buffer.close()
+            self._executor.shutdown(wait=False)
+            if self.sizer and self.sizer.requests:
+                addon.setSetting("epgchunklearned", str(self.sizer.size))
+        xbmc.log(
+            f"{handle} EPG export: fetched and rendered {self.chunks} chunks in {time() - started:.2f} seconds",
+            xbmc.LOGINFO,
+        )
+        if self.sizer:
+            xbmc.log(
+                f"{handle} EPG export: chunk size {self.sizer.size} channel days, {self.sizer.requests} requests ({self.sizer.failures} failed), {self.sizer.throughput():.1f} channel days/s, {self.sizer.programmes / max(time() - started, 0.001):.0f} programmes/s",
+                xbmc.LOGINFO,
+            )
+        return True
+
+    def _next_task(self) -> Optional[Tuple[int, int, list]]:
+        if not self._remaining_runs:
+            return None
+        first, last, run_epg_ids = self._remaining_runs.popleft()
+        if self.sizer:
+            # large chunks are faster, but every worker should get one
+            size = min(
+                self.sizer.channels_per_request(last - first + 1),
+                -(-len(self.shard_names) // self._workers),
+            )
+        else:
+            size = self._chunk_size
+        if len(run_epg_ids) > size:
+            self._remaining_runs.appendleft((first, last, run_epg_ids[size:]))
+        return first, last, run_epg_ids[:size]
+
+    def _submit_next(self) -> None:
+        task = self._next_task()
+        if task:
+            buffer = PrefetchBuffer(PREFETCH_CHANNELS)
+            self._pending.append(
+                (task, buffer, self._executor.submit(self._fetch, task, buffer))
+            )
+
+    def _fetch(self, task: Tuple[int, int, list], buffer: PrefetchBuffer) -> float:
+        # runs on a worker, returns the time of the request including the
+        # transfer of the body, but not the time spent waiting for the rendering
+        try:
+            fetch_started = time()
+            channel_programs = fetch_epg_chunk(
+                self.addon, self._session, *task, self.utc_offset
             )
-            if not epg_id:
+            try:
+                return time() - fetch_started + buffer.fill(channel_programs)
+            finally:
+                channel_programs.close()
+        finally:
+            buffer.finish()
+
+    def _retry_smaller(self, task: Tuple[int, int, list], e: Exception) -> None:
+        first, last, chunk = task
+        # a smaller request may still succeed
+        if (
+            not self.sizer
+            or len(chunk) == 1
+            or self.sizer.failures >= self.addon.getSettingInt("epgfetchtries")
+        ):
+            raise e
+        self.sizer.record_failure(len(chunk) * (last - first + 1))
+        xbmc.log(
+            f"{self.handle} EPG export: request of {len(chunk)} channels failed ({e}), retrying with {self.sizer.size} channel days per request",
+            xbmc.LOGWARNING,
+        )
+        self._remaining_runs.appendleft(task)
+        if not self._pending:
+            self._submit_next()
+
+    def render_chunk(
+        self, task: Tuple[int, int, list], channels: Iterable[dict]
+    ) -> RenderedChunk:
+        """
+        Render stage of a chunk: renders the EPG channel objects as they are
+         decoded. In low memory mode every channel is stored and released
+         right away, otherwise they are stored by store_chunk, once the
+         whole response has arrived.
+
+        :param task: The first day offset, the last day offset and the EPG IDs.
+        :param channels: The EPG channel objects of the response.
+        :return: The rendered chunk.
+        """
+        first, last, _ = task
+        chunk = RenderedChunk(
+            task, [self.window[offset] for offset in range(first, last + 1)]
+        )
+        for channel in channels:
+            epg_channel_id = channel.get("EPG_CHANNEL_ID")
+            if not epg_channel_id:
                 continue
-            name = channel.get("name")
-            images = channel.get("images")
-            image = None
-            if images:
-                image = next(
-                    (image for image in images if image.get("ratio") == "16:10"),
-                    images[0],
-                )["url"]
-            # get media file id
-            media_files = [
-                media_file
-                for media_file in channel.get("mediaFiles")
-                if media_file.get("type") in static.media_file_ids
+            epg_id = int(epg_channel_id)
+            if epg_id in chunk.stored and epg_id not in chunk.fragments:
+                chunk.fragments[epg_id] = {day: [] for day in chunk.days}
+                chunk.rows[epg_id] = []
+            fragments = chunk.fragments[epg_id]
+            for day, element in render_programmes(
+                self.addon,
+                channel,
+                self.epg_ids[epg_id],
+                self.time_memo,
+                self.low_memory,
+            ):
+                # programmes that start outside of the requested days
+                # belong to the shard of another day
+                if day in fragments:
+                    fragments[day].append(element)
+            programme_object = channel.get("EPGChannelProgrammeObject")
+            chunk.programmes += len(programme_object)
+            chunk.rows[epg_id].extend(
+                programme_row(programme, times)
+                for programme, times in zip(
+                    programme_object,
+                    convert_programme_times(programme_object, self.time_memo),
+                )
+                if times
+            )
+            if self.low_memory:
+                # release the channel before the next one is rendered
+                del channel, programme_object, fragments
+                self.store_channel(chunk, epg_id)
+        return chunk
+
+    def store_channel(self, chunk: RenderedChunk, epg_id: int) -> None:
+        """
+        Store stage of a channel: writes its rendered days to its shards and
+         its programmes to the EPG store. A channel that was repeated in the
+         response is added to what was stored for it.
+
+        :param chunk: The rendered chunk.
+        :param epg_id: The EPG ID of the channel.
+        :return: None
+        """
+        shard_name = self.shard_names[epg_id]
+        days = chunk.fragments.pop(epg_id)
+        rows = chunk.rows.pop(epg_id)
+        if epg_id in chunk.stored:
+            days = {
+                day: [self.shard_store.read(shard_name, day) or ""] + elements
+                for day, elements in days.items()
+            }
+            self.epg_store.add_programmes(epg_id, chunk.start, chunk.end, rows)
+        else:
+            self.epg_store.replace_programmes(epg_id, chunk.start, chunk.end, rows)
+        chunk.stored.add(epg_id)
+        chunk.completed.setdefault(shard_name, set()).update(
+            [
+                day
+                for day, elements in days.items()
+                if self.shard_store.write(shard_name, day, "".join(elements))
             ]
-            # sort media files that contain 'HD' earlier
-            media_files.sort(
-                key=lambda x: x.get("type").lower().find("hd"), reverse=True
+        )
+
+    def store_chunk(self, chunk: RenderedChunk, latency: float) -> None:
+        """
+        Store stage of a chunk, once its response has arrived: stores the
+         channels that aren't stored yet, adapts the chunk size to the
+         response time and checkpoints the chunk.
+
+        :param chunk: The rendered chunk.
+        :param latency: The response time in seconds.
+        :return: None
+        """
+        for epg_id in list(chunk.fragments):
+            self.store_channel(chunk, epg_id)
+        self.epg_store.commit()
+        if self.sizer:
+            previous_size = self.sizer.size
+            self.sizer.record(chunk.channel_days, latency, chunk.programmes)
+            if self.sizer.size != previous_size:
+                xbmc.log(
+                    f"{self.handle} EPG export: {len(chunk.epg_ids)} channels x {len(chunk.days)} days took {latency:.2f} seconds, chunk size {previous_size} -> {self.sizer.size} channel days",
+                    xbmc.LOGDEBUG,
+                )
+        self.checkpoint.add(chunk.completed)
+        self.fetched += chunk.channel_days
+        self.chunks += 1
+
+    def merge(
+        self, temp_path: str, compress_level: int, digests: ChannelDigests
+    ) -> bool:
+        """
+        Merge stage: writes the channels and their shards of the window to
+         the XMLTV file, and adds the digests of the channels.
+
+        :param temp_path: The path of the file.
+        :param compress_level: The gzip compression level, 0 to not compress.
+        :param digests: The digests of the export.
+        :return: False if the export was killed.
+        """
+        addon = self.addon
+        channel_elements_by_id = {}
+        for channel_element in self.channel_elements:
+            channel_elements_by_id.setdefault(channel_element[0], []).append(
+                channel_element
             )
-            if not media_files:
-                continue
-            media_file = media_files[0]["id"]
-            # print channel data to XML
-            f.write(f'<channel id="{enc_xml(str(epg_id))}">')
-            f.write(f'<display-name lang="hu">{enc_xml(name)}</display-name>')
-            if image:
-                if isinstance(image, str) and addon.getSetting("webenabled"):
-                    # i have encountered a case where image was bytes
-                    image = replace_image(image)
-                f.write(f'<icon src="{enc_xml(image)}" />')
-            f.write("</channel>")
-            epg_ids[epg_id] = media_file
-        # fetch EPG data in chunks
-        for i in range(0, len(epg_ids.keys()), chunk_size):
-            # check if we need to abort
-            if kill_event and kill_event.is_set():
-                return
-            chunk = list(epg_ids.keys())[i : i + chunk_size]
-            channel_programs = media_list.get_epg_by_channel_ids(
-                _session,
-                addon.getSetting("jsonpostgw"),
-                chunk,
-                from_time,
-                to_time,
-                utc_offset,
-                api_user=addon.getSetting("apiuser"),
-                api_pass=addon.getSetting("apipass"),
-                domain_id=addon.getSetting("domainid"),
-                site_guid=addon.getSetting("siteguid"),
-                platform=addon.getSetting("platform"),
-                ud_id=addon.getSetting("devicekey"),
+        with XMLTVWriter(temp_path, compress_level=compress_level) as writer:
+            writer.write_header(
+                addon.getAddonInfo("name"), f"plugin://{addon.getAddonInfo('id')}/"
             )
-            for channel in channel_programs:
-                epg_channel_id = channel.get("EPG_CHANNEL_ID")
-                if not epg_channel_id:
-                    continue
-                programme_object = channel.get("EPGChannelProgrammeObject")
-                for programme in programme_object:
-                    start_date = programme.get("START_DATE")
-                    end_date = programme.get("END_DATE")
-                    epg_programme_id = programme.get("EPG_ID")
-                    if not all([start_date, end_date]):
-                        continue
-                    start_date, start_date_unix = voda_to_epg_time(start_date.strip())
-                    end_date, end_date_unix = voda_to_epg_time(end_date.strip())
-                    name = programme.get("NAME")
-                    description = programme.get("DESCRIPTION")
-                    epg_meta = programme.get("EPG_Meta", {})
-                    images = programme.get("EPG_PICTURES")
-                    image = None
-                    if images:
-                        # sort images by PicWidth and PicHeight, prefer Ratio = bg
-                        images.sort(
-                            key=lambda x: (
-                                x.get("PicWidth", 0),
-                                x.get("PicHeight", 0),
-                                x.get("Ratio", "") == "bg",
-                            ),
-                            reverse=True,
-                        )
-                        image = images[0].get("Url")
-                        if isinstance(image, str) and addon.getSetting("webenabled"):
-                            # i have encountered a case where image was bytes
-                            image = replace_image(image)
-                    year = get_tag(epg_meta, "year")
-                    episode = get_tag(epg_meta, "episode num")
-                    season = get_tag(epg_meta, "season number")
-                    episode_name = get_tag(epg_meta, "episode name")
-                    epg_tags = programme.get("EPG_TAGS")
-                    genres = [
-                        tag.get("Value")
-                        for tag in epg_tags
-                        if tag.get("Key") == "genre"
-                    ]
-                    countries = [
-                        tag.get("Value")
-                        for tag in epg_tags
-                        if tag.get("Key") == "country of production"
-                    ]
-                    actors = [
-                        tag.get("Value")
-                        for tag in epg_tags
-                        if tag.get("Key") == "actors"
-                    ]
-                    directors = [
-                        tag.get("Value")
-                        for tag in epg_tags
-                        if tag.get("Key") == "director"
-                    ]
-                    content_tags = [
-                        tag.get("Value")
-                        for tag in epg_tags
-                        if tag.get("Key") == "contentTags"
-                    ]
-                    catchup_url = f"plugin://{addon.getAddonInfo('id')}/?action=catchup&id={epg_programme_id}&cid={epg_ids[int(epg_channel_id)]}&start={start_date_unix}&end={end_date_unix}"
-                    to_catchup = False
-                    if static.recordable in content_tags:
-                        catchup_url += "&rec=1"
-                        to_catchup = True
-                    else:
-                        catchup_url += "&rec=0"
-                    if static.restartable in content_tags:
-                        catchup_url += "&res=1"
-                        to_catchup = True
-                    else:
-                        catchup_url += "&res=0"
-                    f.write(
-                        f'<programme start="{enc_xml(start_date)}" stop="{enc_xml(end_date)}" channel="{enc_xml(epg_channel_id)}"'
-                    )
-                    if to_catchup:
-                        f.write(f' catchup-id="{enc_xml(catchup_url)}"')
-                    f.write(">")
-                    f.write(f'<title lang="hu">{enc_xml(name)}</title>')
-                    f.write(f'<desc lang="hu">{enc_xml(description)}</desc>')
-                    if year:
-                        f.write(f"<date>{enc_xml(year)}</date>")
-                    # Prepare categories
-                    categories = [
-                        f'<category lang="hu">{enc_xml(genre)}</category>'
-                        for genre in genres
-                    ]
-                    if categories:
-                        f.write("".join(categories))
-                    # Prepare countries
-                    countries = [
-                        f'<country lang="hu">{enc_xml(country)}</country>'
-                        for country in countries
-                    ]
-                    if countries:
-                        f.write("".join(countries))
-                    # Prepare credits
-                    credits = {}
-                    actor_elements = [
-                        f"<actor>{enc_xml(actor)}</actor>" for actor in actors
-                    ]
-                    if actor_elements:
-                        credits["actor"] = actor_elements
-                    director_elements = [
-                        f"<director>{enc_xml(director)}</director>"
-                        for director in directors
-                    ]
-                    if director_elements:
-                        credits["director"] = director_elements
-                    if credits:
-                        f.write("".join(credits))
-                    if image:
-                        f.write(f'<icon src="{enc_xml(image)}" />')
-                    if all([episode, season]):
-                        f.write(
-                            f'<episode-num system="xmltv_ns">{enc_xml(str(int(season) - 1))}.{enc_xml(str(int(episode) - 1))}.</episode-num>'
-                        )
-                    if episode_name:
-                        f.write(
-                            f'<sub-title lang="hu">{enc_xml(episode_name)}</sub-title>'
-                        )
-                    f.write("</programme>")
-        f.write("</tv>")
-    # move temp file to final file
-    xbmcvfs.rename(temp_path, path)
-    if addon.getSettingBool("epgnotifoncompletion"):
-        dialog.notification(
-            addon.getAddonInfo("name"),
-            addon.getLocalizedString(30082),
-            xbmcgui.NOTIFICATION_INFO,
+            for channel_element in self.channel_elements:
+                writer.write_channel(*channel_element)
+            for epg_id, shard_name in self.shard_names.items():
+                # check if we need to abort
+                if self.killed:
+                    return False
+                fragments = [
+                    self.shard_store.read(shard_name, day)
+                    for day in self.window.values()
+                ]
+                for fragment in fragments:
+                    if fragment:
+                        writer.write_fragment(fragment)
+                digests.add(
+                    shard_name,
+                    digest(
+                        [repr(channel_elements_by_id.get(str(epg_id)))]
+                        + [fragment or "" for fragment in fragments]
+                    ),
+                )
+            writer.write_footer()
+        return True
+
+
+def export_epg(
+    addon: xbmcaddon.Addon,
+    _session: Session,
+    from_time: int,
+    to_time: int,
+    utc_offset: int,
+    kill_event: threading.Event = None,
+) -> None:
+    """
+    Exports all EPG data between two days to an XMLTV file.
+    Rendered programmes are kept in per-channel, per-day shards in the
+     addon profile, so only the days that are missing or may still
+     change ('epgrefreshdays' days from today) are fetched again.
+    The fetched channel days are checkpointed after every chunk, an
+     interrupted export is resumed by the next run in the same window.
+    In low memory mode ('epglowmemory') the channels are stored and released
+     one by one, and the peak allocation is logged if debug logging is on.
+
+    :param _session: requests.Session object
+    :param from_time: Start of the window in days relative to today (ie. -1)
+    :param to_time: End of the window in days relative to today
+    :param utc_offset: UTC offset
+    :param kill_event: threading.Event object to kill the thread (optional)
+    :return: None
+    """
+    trace_memory = (
+        addon.getSettingBool("epglowmemory")
+        and xbmc.getCondVisibility("System.GetBool(debug.showloginfo)")
+        and not tracemalloc.is_tracing()
+    )
+    export = EPGExport(addon, _session, from_time, to_time, utc_offset, kill_event)
+    if not trace_memory:
+        export.run()
+        return
+    tracemalloc.start()
+    try:
+        export.run()
+    finally:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        xbmc.log(
+            f"[{addon.getAddonInfo('name')}] EPG export: peak allocation {peak / 1024 / 1024:.1f} MiB",
+            xbmc.LOGDEBUG,
         )
-    addon.setSetting("lastepgupdate", str(int(time())))
 
 
 def get_utc_offset() -> int:
@@ -474,7 +949,14 @@ class EPGUpdaterThread(threading.Thread):
         self.frequency = frequency
         self.last_updated = last_updated
         self.killed = threading.Event()
-        self.failed_count = 0
+        self.woken = threading.Event()
+        self.scheduler = ExportScheduler(
+            frequency,
+            addon.getSettingInt("epgfetchtries"),
+            addon.getSetting("devicekey"),
+            last_updated,
+            time(),
+        )
 
     @property
     def now(self) -> int:
@@ -486,46 +968,73 @@ class EPGUpdaterThread(threading.Thread):
         """Returns the addon handle"""
         return f"[{self.addon.getAddonInfo('name')}]"
 
+    def wait(self, timeout: float) -> None:
+        """
+        Waits until the timeout, a wake up or a stop. Kodi's timers don't
+         run while the device is suspended, so the waits are short and the
+         wall clock is checked after every one of them.
+
+        :param timeout: The time to wait in seconds.
+        :return: None
+        """
+        wall_started, started = time(), monotonic()
+        if self.woken.wait(min(timeout, UPDATER_WAIT_STEP)):
+            self.woken.clear()
+        elif (time() - wall_started) - (monotonic() - started) < UPDATER_WAIT_STEP:
+            return
+        if self.killed.is_set():
+            return
+        xbmc.log(f"{self.handle} EPG update: woke up from suspend", xbmc.LOGINFO)
+        self.scheduler.woke_up(time())
+
     def run(self) -> None:
         """
         EPG update thread's main loop.
         """
+        logged_run = None
         while not self.killed.is_set():
-            xbmc.log(
-                f"{self.handle} EPG update: next update in {min(self.frequency, self.frequency - (self.now - self.last_updated))} seconds",
-                xbmc.LOGINFO,
-            )
-            self.killed.wait(
-                min(self.frequency, self.frequency - (self.now - self.last_updated))
-            )
-            if (
-                not self.killed.is_set()
-                and not self.failed_count > self.addon.getSettingInt("epgfetchtries")
-            ):
-                try:
-                    export_epg(
-                        self.addon,
-                        self._session,
-                        -self.from_time,
-                        self.to_time,
-                        self.utc_offset,
-                        self.killed,
-                    )
+            next_run = self.scheduler.next_run(time())
+            if next_run != logged_run:
+                logged_run = next_run
+                xbmc.log(
+                    f"{self.handle} EPG update: next update in {max(next_run - time(), 0):.0f} seconds",
+                    xbmc.LOGINFO,
+                )
+            if time() < next_run:
+                self.wait(next_run - time())
+                continue
+            try:
+                export_epg(
+                    self.addon,
+                    self._session,
+                    -self.from_time,
+                    self.to_time,
+                    self.utc_offset,
+                    self.killed,
+                )
+                if not self.killed.is_set():
                     self.last_updated = self.now
-                    self.failed_count = 0
-                except Exception as e:
-                    self.failed_count += 1
-                    xbmc.log(
-                        f"{self.handle} EPG update failed: {e}",
-                        xbmc.LOGERROR,
-                    )
-                    self.killed.wait(5)
+                    self.scheduler.record_success(self.last_updated)
+            except Exception as e:
+                delay = self.scheduler.record_failure(time())
+                xbmc.log(
+                    f"{self.handle} EPG update failed ({len(self.scheduler.failures)} failures in the last {self.frequency} seconds), retrying in {delay:.0f} seconds: {e}",
+                    xbmc.LOGERROR,
+                )
+
+    def wake(self) -> None:
+        """
+        Wakes the thread up (ie. Kodi woke up from suspend), an overdue
+         update is started soon.
+        """
+        self.woken.set()
 
     def stop(self) -> None:
         """
         Sets stop event to the thread.
         """
         self.killed.set()
+        self.woken.set()
 
 
 def main_service(addon: xbmcaddon.Addon) -> EPGUpdaterThread:
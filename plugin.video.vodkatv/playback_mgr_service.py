@@ -7,6 +7,7 @@ import xbmc
 import xbmcaddon
 from export_data import main_service as e_main_service
 from resources.lib.vodka import static
+from snapshot_service import main_service as s_main_service
 from web_service import main_service as w_main_service
 
 timeout = 5
@@ -201,11 +202,29 @@ class XBMCPlayer(xbmc.Player):
             )
 
 
+class ServiceMonitor(xbmc.Monitor):
+    def __init__(self, *args, **kwargs):
+        xbmc.Monitor.__init__(self, *args, **kwargs)
+        self.export_service = None
+
+    def onNotification(self, sender: str, method: str, data: str) -> None:
+        # catch up with the EPG updates missed while suspended
+        if (
+            method == "System.OnWake"
+            and self.export_service
+            and self.export_service.is_alive()
+        ):
+            xbmc.log(f"{handle} Playback Manager Service: woke up", xbmc.LOGINFO)
+            self.export_service.wake()
+
+
 if __name__ == "__main__":
-    monitor = xbmc.Monitor()
+    monitor = ServiceMonitor()
     player = XBMCPlayer()
     export_service = e_main_service(addon)
+    monitor.export_service = export_service
     web_service = w_main_service(addon)
+    snapshot_service = s_main_service(addon)
     while not monitor.abortRequested():
         if monitor.waitForAbort(1):
             break
@@ -225,3 +244,10 @@ if __name__ == "__main__":
         except RuntimeError:
             pass
         xbmc.log(f"{handle} Web service stopped", level=xbmc.LOGINFO)
+    if snapshot_service and snapshot_service.is_alive():
+        snapshot_service.stop()
+        try:
+            snapshot_service.join()
+        except RuntimeError:
+            pass
+        xbmc.log(f"{handle} Channel list snapshot service stopped", level=xbmc.LOGINFO)
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
+from functools import lru_cache
 from time import mktime, strptime
-from typing import Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
 def unix_to_date(unix_time: int) -> str:
@@ -15,14 +16,14 @@ def unix_to_date(unix_time: int) -> str:
     return datetime.fromtimestamp(unix_time).strftime("%Y-%m-%d %H:%M:%S")
 
 
-def voda_to_epg_time(voda_time: str) -> Tuple[str, int]:
+def _voda_to_epg_time_strptime(voda_time: str) -> Tuple[str, int]:
     """
-    Convert Voda time to EPG time format and unix timestamp.
+    Slow path of voda_to_epg_time that handles anything strptime accepts
+     (ie. non zero-padded values).
 
     :param voda_time: Voda time format
     :return: EPG time format (strftime("%Y%m%d%H%M%S %z")), unix timestamp
     """
-    # ie. 14/08/2023 21:45:00 -> 20230809144500 +0200
     try:
         voda_time = datetime.strptime(voda_time, "%d/%m/%Y %H:%M:%S")
         return voda_time.strftime("%Y%m%d%H%M%S %z"), int(
@@ -36,3 +37,127 @@ def voda_to_epg_time(voda_time: str) -> Tuple[str, int]:
         return voda_time.strftime("%Y%m%d%H%M%S %z"), int(
             voda_time.replace(tzinfo=timezone.utc).timestamp()
         )
+
+
+@lru_cache(maxsize=64)
+def _voda_date_to_unix(year: int, month: int, day: int) -> int:
+    """
+    Unix timestamp of midnight of the given day. An EPG window only
+     spans a couple of days, so this is almost always a cache hit.
+
+    :raises ValueError: If the date is invalid
+    """
+    return int(datetime(year, month, day, tzinfo=timezone.utc).timestamp())
+
+
+def epg_day_to_unix(day: str) -> int:
+    """
+    Convert an EPG day (YYYYMMDD, the first 8 digits of an EPG time) to
+     the timestamp of its midnight, in the same format as voda_to_epg_time.
+
+    :param day: EPG day
+    :return: unix timestamp
+    """
+    return _voda_date_to_unix(int(day[0:4]), int(day[4:6]), int(day[6:8]))
+
+
+def voda_to_epg_time(voda_time: str) -> Tuple[str, int]:
+    """
+    Convert Voda time to EPG time format and unix timestamp.
+
+    :param voda_time: Voda time format
+    :return: EPG time format (strftime("%Y%m%d%H%M%S %z")), unix timestamp
+    """
+    # ie. 14/08/2023 21:45:00 -> 20230814214500 +0200
+    # the API always uses the fixed dd/mm/YYYY HH:MM:SS layout,
+    # so we slice the string instead of going through strptime
+    if (
+        len(voda_time) == 19
+        and voda_time[2] == voda_time[5] == "/"
+        and voda_time[10] == " "
+        and voda_time[13] == voda_time[16] == ":"
+    ):
+        # NOTE: these digits are already in the EPG time order
+        digits = (
+            voda_time[6:10]
+            + voda_time[3:5]
+            + voda_time[0:2]
+            + voda_time[11:13]
+            + voda_time[14:16]
+            + voda_time[17:19]
+        )
+        if digits.isascii() and digits.isdigit():
+            hour = int(digits[8:10])
+            minute = int(digits[10:12])
+            second = int(digits[12:14])
+            if hour < 24 and minute < 60 and second < 60:
+                day_start = _voda_date_to_unix(
+                    int(digits[0:4]), int(digits[4:6]), int(digits[6:8])
+                )
+                # %z is empty for naive datetimes, hence the trailing space
+                return digits + " ", day_start + hour * 3600 + minute * 60 + second
+    return _voda_to_epg_time_strptime(voda_time)
+
+
+def convert_programme_times(
+    programmes: list, memo: Optional[dict] = None
+) -> List[Optional[Tuple[str, int, str, int]]]:
+    """
+    Converts the start and end dates of a list of EPG programmes in one pass.
+    The end of a programme is usually the start of the next one, so converted
+     values are memoized.
+
+    :param programmes: The list of programmes (EPGChannelProgrammeObject)
+    :param memo: Optional memo dict that can be shared between calls
+    :return: A list with a (start EPG time, start unix timestamp,
+     end EPG time, end unix timestamp) tuple for every programme,
+     or None if the programme has no start or end date
+    """
+    if memo is None:
+        memo = {}
+    converted = []
+    for programme in programmes:
+        start_date = programme.get("START_DATE")
+        end_date = programme.get("END_DATE")
+        if not all([start_date, end_date]):
+            converted.append(None)
+            continue
+        start = memo.get(start_date)
+        if start is None:
+            start = memo[start_date] = voda_to_epg_time(start_date.strip())
+        end = memo.get(end_date)
+        if end is None:
+            end = memo[end_date] = voda_to_epg_time(end_date.strip())
+        converted.append(start + end)
+    return converted
+
+
+def index_tags(tags: Optional[Iterable[dict]]) -> Dict[str, List[str]]:
+    """
+    Indexes a list of Key/Value tags (ie. EPG_TAGS or EPG_Meta) in one pass,
+     so the values of a key can be looked up without scanning the list again.
+
+    :param tags: The list of tags.
+    :return: A dict of the values of every key, in their original order.
+    """
+    index = {}
+    for tag in tags or ():
+        key = tag.get("Key")
+        values = index.get(key)
+        if values is None:
+            index[key] = [tag.get("Value")]
+        else:
+            values.append(tag.get("Value"))
+    return index
+
+
+def first_tag(index: Dict[str, List[str]], key: str) -> Optional[str]:
+    """
+    Gets the first value of a key from a tag index.
+
+    :param index: The tag index (index_tags).
+    :param key: The tag key.
+    :return: The first value or None if the key is not present.
+    """
+    values = index.get(key)
+    return values[0] if values else None
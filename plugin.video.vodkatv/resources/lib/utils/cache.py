@@ -0,0 +1,108 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from hashlib import sha1
+from json import dump, load
+from time import time
+from typing import IO, Any, Iterator, Optional
+
+
+def make_key(*parts) -> str:
+    """
+    Derive a cache key from the given parts (ie. household ID and gateway URL).
+
+    :param parts: The values the cached data depends on.
+    :return: The cache key.
+    """
+    return sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+def read_cache(path: str, key: str, ttl: int, schema_version: int) -> Optional[Any]:
+    """
+    Read a JSON cache file if it's still valid.
+
+    :param path: The path of the cache file.
+    :param key: The key the data must have been stored with.
+    :param ttl: Time to live in seconds.
+    :param schema_version: The schema version the data must have.
+    :return: The cached data or None if it's missing, expired or invalid.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict):
+        return None
+    if cached.get("schema") != schema_version or cached.get("key") != key:
+        return None
+    if not 0 <= time() - cached.get("created", 0) < ttl:
+        return None
+    return cached.get("data")
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w") -> Iterator[IO]:
+    """
+    Opens a temporary file next to a file for writing, and replaces the file
+     with it when the block finishes without an error.
+    The temporary file is unique (mkstemp), so threads and processes writing
+     the same file at the same time never share it, the last one wins.
+
+    :param path: The path of the file.
+    :param mode: The file mode, "w" (UTF-8 text) or "wb".
+    :return: The temporary file object.
+    """
+    fd, temp_path = tempfile.mkstemp(
+        prefix=f"{os.path.basename(path)}.",
+        suffix=".tmp",
+        dir=os.path.dirname(path) or None,
+    )
+    try:
+        # mkstemp creates the file readable only by the owner
+        os.chmod(temp_path, 0o644)
+        with open(fd, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+        # NOTE: os.replace is atomic, readers never see a half-written file
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_cache(path: str, key: str, data: Any, schema_version: int) -> None:
+    """
+    Atomically write data to a JSON cache file.
+
+    :param path: The path of the cache file.
+    :param key: The key to store the data with.
+    :param data: JSON serializable data.
+    :param schema_version: The schema version of the data.
+    :return: None
+    """
+    with atomic_write(path) as f:
+        dump(
+            {
+                "schema": schema_version,
+                "key": key,
+                "created": int(time()),
+                "data": data,
+            },
+            f,
+        )
+
+
+def invalidate_cache(path: str) -> None:
+    """
+    Remove a cache file if it exists.
+
+    :param path: The path of the cache file.
+    :return: None
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,95 @@
+import os
+from json import dump, load
+from typing import Dict, Iterable, Set
+
+from .cache import atomic_write
+
+CHECKPOINT_VERSION = 1
+
+
+class ExportCheckpoint:
+    """
+    Records the channel days an export has already fetched, so an
+     interrupted export can be resumed by the next run.
+
+    A checkpoint is only valid for the window (and render key) it was
+     created with, a checkpoint of another window is stale and is dropped.
+    """
+
+    def __init__(self, path: str, key: str):
+        """
+        Loads the checkpoint if it belongs to the given key.
+
+        :param path: The path of the checkpoint file.
+        :param key: Key of the window and the settings of the export.
+        """
+        self.path = path
+        self.key = key
+        self.completed: Dict[str, Set[str]] = {}
+        self.stale = False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = load(f)
+        except (OSError, ValueError):
+            return
+        if (
+            not isinstance(data, dict)
+            or data.get("version") != CHECKPOINT_VERSION
+            or data.get("key") != key
+        ):
+            self.stale = True
+            self.discard()
+            return
+        self.completed = {
+            channel: set(days) for channel, days in data.get("completed", {}).items()
+        }
+
+    def is_completed(self, channel: str, day: str) -> bool:
+        """
+        :param channel: The shard name of the channel.
+        :param day: The day (YYYYMMDD).
+        :return: Whether the day of the channel was fetched by an earlier run.
+        """
+        return day in self.completed.get(channel, ())
+
+    def add(self, completed: Dict[str, Iterable[str]]) -> None:
+        """
+        Marks days of channels as completed and saves the checkpoint.
+
+        :param completed: The days (YYYYMMDD) by the shard names of the channels.
+        :return: None
+        """
+        for channel, days in completed.items():
+            self.completed.setdefault(channel, set()).update(days)
+        self.save()
+
+    def save(self) -> None:
+        """
+        Atomically writes the checkpoint.
+
+        :return: None
+        """
+        with atomic_write(self.path) as f:
+            dump(
+                {
+                    "version": CHECKPOINT_VERSION,
+                    "key": self.key,
+                    "completed": {
+                        channel: sorted(days)
+                        for channel, days in self.completed.items()
+                    },
+                },
+                f,
+            )
+
+    def discard(self) -> None:
+        """
+        Removes the checkpoint, called when the export has finished.
+
+        :return: None
+        """
+        self.completed = {}
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
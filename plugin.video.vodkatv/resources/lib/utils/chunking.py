@@ -0,0 +1,94 @@
+from time import time
+
+# the responses are aimed at this fraction of the target latency,
+# so the normal jitter of the gateway doesn't make the size oscillate
+HEADROOM = 0.8
+# the size is at most doubled by one fast response
+MAX_GROWTH = 2.0
+
+
+class AdaptiveChunkSizer:
+    """
+    Adapts the size of the EPG requests to the response time of the gateway.
+
+    The size is measured in channel days (channels * days of a request), as
+     the response time depends on the number of programmes, so the same size
+     can be used for requests of a single day and of the whole window.
+    A response that is faster than the target latency grows the size, a slow
+     or failed one shrinks it. Sizes are derived from the size of the request
+     that was measured, as responses of earlier (smaller or larger) requests
+     may still arrive after the size was changed.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        target_latency: float,
+        min_size: int = 1,
+        max_size: int = 5000,
+    ):
+        """
+        :param size: The initial size in channel days (ie. the learned one).
+        :param target_latency: The target response time in seconds.
+        :param min_size: The minimum size in channel days.
+        :param max_size: The maximum size in channel days.
+        """
+        self.target_latency = target_latency
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = self._clamp(size)
+        self.requests = 0
+        self.failures = 0
+        self.channel_days = 0
+        self.programmes = 0
+        self.started = time()
+
+    def _clamp(self, size: float) -> int:
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def channels_per_request(self, days: int) -> int:
+        """
+        :param days: The number of days of the request.
+        :return: The number of channels to request at once.
+        """
+        return max(self.size // max(days, 1), 1)
+
+    def record(self, channel_days: int, latency: float, programmes: int) -> None:
+        """
+        Records a successful response and adapts the size to it.
+
+        :param channel_days: The size of the request in channel days.
+        :param latency: The response time in seconds.
+        :param programmes: The number of programmes in the response.
+        :return: None
+        """
+        self.requests += 1
+        self.channel_days += channel_days
+        self.programmes += programmes
+        factor = min(HEADROOM * self.target_latency / max(latency, 0.001), MAX_GROWTH)
+        if latency > self.target_latency:
+            self.size = min(self.size, self._clamp(channel_days * factor))
+        elif factor > 1:
+            self.size = max(self.size, self._clamp(channel_days * factor))
+
+    def record_failure(self, channel_days: int) -> None:
+        """
+        Records a failed request, the size is halved and it won't grow
+         to the failed size again. Requests that are larger than the
+         current size were sent before it was reduced, they are retried
+         without counting them as failures.
+
+        :param channel_days: The size of the request in channel days.
+        :return: None
+        """
+        if channel_days > self.size:
+            return
+        self.failures += 1
+        self.max_size = max(min(self.max_size, channel_days - 1), self.min_size)
+        self.size = min(self.size, self._clamp(channel_days // 2))
+
+    def throughput(self) -> float:
+        """
+        :return: The fetched channel days per second since the sizer was created.
+        """
+        return self.channel_days / max(time() - self.started, 0.001)
@@ -0,0 +1,98 @@
+from hashlib import sha1
+from json import dump, load
+from typing import Iterable, Tuple
+
+from .cache import atomic_write
+
+DIGESTS_VERSION = 1
+
+
+def digest(parts: Iterable[str]) -> str:
+    """
+    :param parts: The rendered parts of a channel.
+    :return: The digest of the parts.
+    """
+    hasher = sha1()
+    for part in parts:
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class ChannelDigests:
+    """
+    Digests of the channels of an exported file, kept until the next
+     export, so it can tell which channels have changed since then.
+
+    The digests are only compared with the ones of the same file (key),
+     ie. the path and the format of the export.
+    """
+
+    def __init__(self, path: str, key: str):
+        """
+        Loads the digests of the previous export.
+
+        :param path: The path of the digests file.
+        :param key: Key of the exported file.
+        """
+        self.path = path
+        self.key = key
+        self.previous = []
+        self.current = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = load(f)
+        except (OSError, ValueError):
+            return
+        if (
+            isinstance(data, dict)
+            and data.get("version") == DIGESTS_VERSION
+            and data.get("key") == key
+        ):
+            self.previous = [tuple(channel) for channel in data.get("channels", [])]
+
+    def add(self, channel: str, channel_digest: str) -> None:
+        """
+        Adds the digest of a channel of the current export, in file order.
+
+        :param channel: The channel ID.
+        :param channel_digest: The digest of the rendered channel.
+        :return: None
+        """
+        self.current.append((channel, channel_digest))
+
+    def changes(self) -> Tuple[int, int, int]:
+        """
+        :return: The number of changed (or new), unchanged and removed channels.
+        """
+        previous = dict(self.previous)
+        unchanged = sum(
+            1
+            for channel, channel_digest in self.current
+            if previous.get(channel) == channel_digest
+        )
+        current = {channel for channel, _ in self.current}
+        removed = sum(1 for channel in previous if channel not in current)
+        return len(self.current) - unchanged, unchanged, removed
+
+    def is_unchanged(self) -> bool:
+        """
+        :return: Whether every channel and their order is the same as before.
+        """
+        return bool(self.previous) and self.previous == self.current
+
+    def save(self) -> None:
+        """
+        Atomically writes the digests of the current export.
+
+        :return: None
+        """
+        with atomic_write(self.path) as f:
+            dump(
+                {
+                    "version": DIGESTS_VERSION,
+                    "key": self.key,
+                    "channels": self.current,
+                },
+                f,
+            )
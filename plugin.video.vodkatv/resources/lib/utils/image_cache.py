@@ -0,0 +1,237 @@
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+from hashlib import sha1
+from json import dump, load
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+IMAGE_CACHE_VERSION = 1
+META_EXTENSION = ".json"
+BODY_EXTENSION = ".img"
+
+
+class CachedImage(NamedTuple):
+    key: str
+    size: int
+    content_type: str
+    etag: str
+    last_modified: str
+
+
+class ImageCache:
+    """
+    A size-bounded LRU cache of images on disk, shared by the threads of
+     the web service. Every image is stored in two files:
+     <directory>/<sha1 of the URL>.img and the metadata in a .json file.
+
+    The order of use is kept by the modification time of the image files,
+     so the least recently used images are evicted first across restarts.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        """
+        Loads the index of the cached images and evicts the ones over
+         the size limit (ie. after the limit was lowered).
+
+        :param directory: The directory of the cache.
+        :param max_size: The maximum total size of the images in bytes.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.size = 0
+        self._lock = threading.Lock()
+        # fetches in progress, so an image is only fetched once at a time
+        self._fetching: Dict[str, threading.Lock] = {}
+        self._index: "OrderedDict[str, CachedImage]" = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            if not name.endswith(META_EXTENSION):
+                continue
+            key = name[: -len(META_EXTENSION)]
+            try:
+                with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                    meta = load(f)
+                stat = os.stat(self._body_path(key))
+            except (OSError, ValueError):
+                continue
+            if (
+                not isinstance(meta, dict)
+                or meta.get("version") != IMAGE_CACHE_VERSION
+                or meta.get("size") != stat.st_size
+            ):
+                continue
+            entries.append(
+                (
+                    stat.st_mtime,
+                    CachedImage(
+                        key,
+                        stat.st_size,
+                        meta.get("content_type") or "application/octet-stream",
+                        meta.get("etag") or "",
+                        meta.get("last_modified") or "",
+                    ),
+                )
+            )
+        for _, image in sorted(entries):
+            self._index[image.key] = image
+            self.size += image.size
+        # leftovers of interrupted writes and invalid entries
+        for name in os.listdir(directory):
+            key = name.rsplit(".", 1)[0]
+            if key not in self._index:
+                self._remove_file(os.path.join(directory, name))
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def make_key(url: str) -> str:
+        """
+        :param url: The URL of the image.
+        :return: The key of the image.
+        """
+        return sha1(url.encode("utf-8")).hexdigest()
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + BODY_EXTENSION)
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + META_EXTENSION)
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        # the lock must be held
+        while self.size > self.max_size and self._index:
+            _, image = self._index.popitem(last=False)
+            self.size -= image.size
+            self._remove_file(self._meta_path(image.key))
+            self._remove_file(self._body_path(image.key))
+
+    def get(self, url: str) -> Optional[CachedImage]:
+        """
+        Returns the metadata of a cached image and marks it as used.
+
+        :param url: The URL of the image.
+        :return: The metadata or None if the image is not cached.
+        """
+        key = self.make_key(url)
+        with self._lock:
+            image = self._index.get(key)
+            if image is None:
+                return None
+            self._index.move_to_end(key)
+        try:
+            os.utime(self._body_path(key))
+        except OSError:
+            pass
+        return image
+
+    def read(self, image: CachedImage) -> Optional[bytes]:
+        """
+        Reads a cached image.
+
+        :param image: The metadata of the image.
+        :return: The content or None if it was evicted in the meantime.
+        """
+        try:
+            with open(self._body_path(image.key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(
+        self,
+        url: str,
+        content: bytes,
+        content_type: str,
+        last_modified: Optional[str] = None,
+    ) -> CachedImage:
+        """
+        Stores an image and evicts the least recently used ones over the
+         size limit. Images larger than the whole cache are not stored.
+
+        :param url: The URL of the image.
+        :param content: The content of the image.
+        :param content_type: The content type of the image.
+        :param last_modified: The Last-Modified header of the origin
+         (default: now).
+        :return: The metadata of the image.
+        """
+        key = self.make_key(url)
+        image = CachedImage(
+            key,
+            len(content),
+            content_type,
+            f'"{sha1(content).hexdigest()}"',
+            last_modified or formatdate(usegmt=True),
+        )
+        if image.size > self.max_size:
+            return image
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        body_path = self._body_path(key)
+        meta_path = self._meta_path(key)
+        with open(body_path + suffix, "wb") as f:
+            f.write(content)
+        with open(meta_path + suffix, "w", encoding="utf-8") as f:
+            dump(
+                {
+                    "version": IMAGE_CACHE_VERSION,
+                    "url": url,
+                    "size": image.size,
+                    "content_type": image.content_type,
+                    "etag": image.etag,
+                    "last_modified": image.last_modified,
+                },
+                f,
+            )
+        with self._lock:
+            previous = self._index.pop(key, None)
+            if previous:
+                self.size -= previous.size
+            os.replace(body_path + suffix, body_path)
+            os.replace(meta_path + suffix, meta_path)
+            self._index[key] = image
+            self.size += image.size
+            self._evict()
+        return image
+
+    def fetch(
+        self,
+        url: str,
+        fetcher: Callable[[str], Tuple[bytes, str, Optional[str]]],
+    ) -> Tuple[CachedImage, Optional[bytes]]:
+        """
+        Returns a cached image, fetching it first if it's not cached yet.
+        Concurrent requests of the same image wait for a single fetch.
+
+        :param url: The URL of the image.
+        :param fetcher: Fetches an image, returns the content, the content
+         type and the Last-Modified header of the origin.
+        :return: The metadata and the content of the image. The content is
+         None if it was already cached, use read to get it.
+        """
+        image = self.get(url)
+        if image:
+            return image, None
+        key = self.make_key(url)
+        with self._lock:
+            fetch_lock = self._fetching.setdefault(key, threading.Lock())
+        try:
+            with fetch_lock:
+                # it may have been fetched while waiting for the lock
+                image = self.get(url)
+                if image:
+                    return image, None
+                content, content_type, last_modified = fetcher(url)
+                return self.put(url, content, content_type, last_modified), content
+        finally:
+            with self._lock:
+                if self._fetching.get(key) is fetch_lock:
+                    del self._fetching[key]
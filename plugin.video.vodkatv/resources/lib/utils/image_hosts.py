@@ -0,0 +1,74 @@
+import os
+import threading
+from json import dump, load
+from typing import Optional, Set
+
+from .cache import atomic_write
+
+IMAGE_HOSTS_VERSION = 1
+
+
+class ImageHosts:
+    """
+    The hosts of the images rewritten to the web service, so the service
+     only fetches images from hosts the addon has actually handed out.
+
+    The list is shared by the processes of the addon (the plugin rewrites
+     the images, the service fetches them) through a file in the profile,
+     which is reloaded when it changes.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: The path of the file of the hosts.
+        """
+        self.path = path
+        self._hosts: Set[str] = set()
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        # the lock must be held
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = load(f)
+        except (OSError, ValueError):
+            return
+        self._mtime = mtime
+        if isinstance(data, dict) and data.get("version") == IMAGE_HOSTS_VERSION:
+            self._hosts.update(
+                host for host in data.get("hosts", []) if isinstance(host, str)
+            )
+
+    def add(self, host: str) -> None:
+        """
+        Records a host, the file is only written if the host is new.
+
+        :param host: The host name.
+        :return: None
+        """
+        host = host.lower()
+        with self._lock:
+            if host in self._hosts:
+                return
+            # merge the hosts recorded by the other processes
+            self._load()
+            if host in self._hosts:
+                return
+            self._hosts.add(host)
+            with atomic_write(self.path) as f:
+                dump({"version": IMAGE_HOSTS_VERSION, "hosts": sorted(self._hosts)}, f)
+
+    def __contains__(self, host: str) -> bool:
+        """
+        :param host: The host name.
+        :return: Whether the host was recorded by any process of the addon.
+        """
+        host = host.lower()
+        with self._lock:
+            if host not in self._hosts:
+                self._load()
+            return host in self._hosts
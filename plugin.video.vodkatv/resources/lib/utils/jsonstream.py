@@ -0,0 +1,88 @@
+import codecs
+from json import JSONDecodeError, JSONDecoder
+from typing import Any, Iterable, Iterator
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+_decoder = JSONDecoder()
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Decodes a JSON array incrementally and yields its items one by one,
+     so only the current item is kept in memory, not the whole document.
+
+    Items are decoded with JSONDecoder.raw_decode as soon as enough data is
+     buffered. Decoding an incomplete item fails and is retried once the
+     buffer has grown by half, so an item is decoded about twice at most.
+
+    :param chunks: The UTF-8 encoded document in chunks (ie. iter_content).
+    :return: An iterator of the items.
+    :raises ValueError: If the document is not a JSON array or it's invalid.
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    opened = False
+    # whether an item was decoded, so a comma or the end must follow
+    after_item = False
+    # whether a comma was read, so another item must follow
+    after_comma = False
+    # decoding is attempted when this much of the item is buffered,
+    # the size of the previous item is a good first guess
+    attempt_size = 0
+    finished = False
+    while True:
+        buffer = buffer.lstrip(_WHITESPACE)
+        if not opened:
+            if buffer:
+                if buffer[0] != "[":
+                    raise ValueError("Expected a JSON array")
+                buffer = buffer[1:]
+                opened = True
+                continue
+        elif buffer[:1] == "]":
+            if after_comma:
+                raise ValueError("Unexpected ']' after ',' in the JSON array")
+            # the rest of the document may still be in the chunks
+            if buffer[1:].strip(_WHITESPACE) or any(
+                utf8.decode(chunk).strip(_WHITESPACE) for chunk in chunks
+            ):
+                raise ValueError("Extra data after the JSON array")
+            return
+        elif after_item and buffer:
+            if buffer[0] != ",":
+                raise ValueError("Expected ',' in the JSON array")
+            buffer = buffer[1:]
+            after_item = False
+            after_comma = True
+            continue
+        elif buffer and (finished or len(buffer) >= attempt_size):
+            try:
+                item, end = _decoder.raw_decode(buffer)
+            except JSONDecodeError:
+                if finished:
+                    raise
+                attempt_size = len(buffer) * 3 // 2
+            else:
+                # a scalar (ie. a number) is only complete if it's followed
+                # by a delimiter, it may continue in the next chunk
+                if (
+                    buffer[0] in "{["
+                    or finished
+                    or (end < len(buffer) and buffer[end] in _DELIMITERS)
+                ):
+                    yield item
+                    buffer = buffer[end:]
+                    attempt_size = end
+                    after_item = True
+                    after_comma = False
+                    continue
+        if finished:
+            raise ValueError("Unexpected end of the JSON array")
+        chunk = next(chunks, None)
+        if chunk is None:
+            buffer += utf8.decode(b"", final=True)
+            finished = True
+        else:
+            buffer += utf8.decode(chunk)
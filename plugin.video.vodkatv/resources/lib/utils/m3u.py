@@ -0,0 +1,67 @@
+from typing import Iterable, Iterator, Tuple
+
+from .cache import atomic_write
+
+HEADER = "#EXTM3U\n\n"
+
+# (EPG ID, name, logo URL, stream URL)
+Entry = Tuple[str, str, str, str]
+
+
+def render_entry(epg_id: str, name: str, image: str, url: str) -> str:
+    """
+    Renders the lines of a channel.
+
+    :param epg_id: The EPG ID of the channel (tvg-id).
+    :param name: The name of the channel.
+    :param image: The URL of the channel logo.
+    :param url: The URL of the stream.
+    :return: The lines of the channel.
+    """
+    return (
+        f'#EXTINF:-1 tvg-id="{epg_id}" tvg-name="{name}" tvg-logo="{image}" group-title="vodkatv" catchup="vod",{name}\n'
+        f"{url}\n\n"
+    )
+
+
+def iter_playlist(entries: Iterable[Entry]) -> Iterator[str]:
+    """
+    Renders a playlist piece by piece, so it can be streamed (ie. served
+     over HTTP) without building it in memory first.
+
+    :param entries: The channels of the playlist.
+    :return: An iterator of the parts of the playlist.
+    """
+    yield HEADER
+    for entry in entries:
+        yield render_entry(*entry)
+
+
+def render_playlist(entries: Iterable[Entry]) -> str:
+    """
+    Renders a playlist.
+
+    :param entries: The channels of the playlist.
+    :return: The playlist.
+    """
+    return "".join(iter_playlist(entries))
+
+
+def write_playlist(path: str, content: str) -> bool:
+    """
+    Replaces a playlist file if its content differs from the given one,
+     so an unchanged playlist keeps its modification time.
+
+    :param path: The path of the playlist file.
+    :param content: The rendered playlist.
+    :return: Whether the file was written.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == content:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    with atomic_write(path) as f:
+        f.write(content)
+    return True
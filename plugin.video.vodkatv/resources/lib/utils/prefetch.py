@@ -0,0 +1,88 @@
+import threading
+from queue import Empty, Full, Queue
+from time import monotonic
+from typing import Any, Iterable, Iterator
+
+# how often a blocked side checks whether the other one has given up
+POLL_INTERVAL = 0.1
+_END = object()
+
+
+class PrefetchBuffer:
+    """
+    Hands the items of an iterable over from a worker thread to a reader
+     thread, so the worker can download and decode the next items while
+     the reader processes the current one. At most 'size' items are held,
+     the worker waits for the reader when the buffer is full.
+
+    The worker calls fill and then finish (in a finally block), the reader
+     iterates the buffer and calls close when it stops reading, which makes
+     a waiting worker give up.
+    """
+
+    def __init__(self, size: int):
+        """
+        :param size: The maximum number of items held by the buffer.
+        """
+        self._queue: "Queue[Any]" = Queue(max(size, 1))
+        self._closed = threading.Event()
+
+    def _put(self, item: Any) -> bool:
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=POLL_INTERVAL)
+                return True
+            except Full:
+                continue
+        return False
+
+    def fill(self, items: Iterable[Any]) -> float:
+        """
+        Puts the items of an iterable into the buffer, used by the worker.
+
+        :param items: The items (ie. a streamed response).
+        :return: The time spent waiting for the items in seconds, without the
+         time spent waiting for the reader.
+        """
+        waited = 0.0
+        iterator = iter(items)
+        while True:
+            started = monotonic()
+            item = next(iterator, _END)
+            waited += monotonic() - started
+            if item is _END or not self._put(item):
+                return waited
+
+    def finish(self) -> None:
+        """
+        Marks the end of the items, used by the worker.
+
+        :return: None
+        """
+        self._put(_END)
+
+    def __iter__(self) -> Iterator[Any]:
+        while True:
+            try:
+                item = self._queue.get(timeout=POLL_INTERVAL)
+            except Empty:
+                if self._closed.is_set():
+                    return
+                continue
+            if item is _END:
+                return
+            yield item
+
+    def close(self) -> None:
+        """
+        Stops the buffer, a waiting worker gives up and the items it holds
+         are released.
+
+        :return: None
+        """
+        self._closed.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except Empty:
+                return
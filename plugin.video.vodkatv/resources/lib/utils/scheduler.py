@@ -0,0 +1,103 @@
+import random
+from hashlib import sha1
+from typing import List
+
+# delay of the first retry after a failure, doubled by every further failure
+RETRY_DELAY = 30
+# the regular exports of the devices are spread over this many seconds
+# (at most a tenth of the interval)
+MAX_SPREAD = 30 * 60
+# catch-up exports (at startup and after waking up) are spread over this
+CATCH_UP_SPREAD = 60
+
+
+class ExportScheduler:
+    """
+    Decides when the next periodic export should run.
+
+    - Failed exports are retried with exponential backoff and jitter.
+    - Failures are counted in a window of one interval, once 'max_failures'
+       is reached, exports are paused until the oldest failure leaves the
+       window, so the exports are never stopped for good.
+    - Every device gets a fixed offset derived from its device key, so the
+       devices of an account, started at the same time, don't hit the
+       gateway at the same moment.
+    """
+
+    def __init__(
+        self,
+        frequency: int,
+        max_failures: int,
+        device_key: str,
+        last_updated: float,
+        now: float,
+    ):
+        """
+        :param frequency: The interval of the exports in seconds.
+        :param max_failures: The number of failures allowed in a window.
+        :param device_key: The key of the device, the offset is derived from it.
+        :param last_updated: The time of the last successful export.
+        :param now: The current time.
+        """
+        self.frequency = frequency
+        self.max_failures = max(max_failures, 1)
+        self.last_updated = last_updated
+        self.failures: List[float] = []
+        self.retry_at = None
+        # the same fraction every time, so the offset of a device is fixed
+        fraction = int(sha1(device_key.encode("utf-8")).hexdigest()[:8], 16) / 2**32
+        self.offset = fraction * min(frequency / 10, MAX_SPREAD)
+        self.catch_up_delay = fraction * CATCH_UP_SPREAD
+        self.not_before = now + self.catch_up_delay
+
+    def _expire_failures(self, now: float) -> None:
+        self.failures = [
+            failed_at for failed_at in self.failures if now - failed_at < self.frequency
+        ]
+
+    def next_run(self, now: float) -> float:
+        """
+        :param now: The current time.
+        :return: The time of the next export.
+        """
+        self._expire_failures(now)
+        if len(self.failures) >= self.max_failures:
+            # paused until the oldest failure leaves the window
+            return max(self.failures[0] + self.frequency, self.not_before)
+        if self.retry_at is not None:
+            return max(self.retry_at, self.not_before)
+        return max(self.last_updated + self.frequency + self.offset, self.not_before)
+
+    def woke_up(self, now: float) -> None:
+        """
+        Called when the device woke up from suspend. An overdue export is
+         run after the catch-up delay of the device.
+
+        :param now: The current time.
+        :return: None
+        """
+        self.not_before = now + self.catch_up_delay
+
+    def record_success(self, now: float) -> None:
+        """
+        :param now: The time the export finished.
+        :return: None
+        """
+        self.last_updated = now
+        self.failures.clear()
+        self.retry_at = None
+
+    def record_failure(self, now: float) -> float:
+        """
+        Schedules a retry with exponential backoff and "equal jitter"
+         (half of the delay is fixed, the other half is random).
+
+        :param now: The time the export failed.
+        :return: The delay of the retry in seconds.
+        """
+        self._expire_failures(now)
+        self.failures.append(now)
+        delay = min(RETRY_DELAY * 2 ** (len(self.failures) - 1), self.frequency)
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self.retry_at = now + delay
+        return delay
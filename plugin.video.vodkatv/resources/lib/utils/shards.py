@@ -0,0 +1,144 @@
+import os
+import re
+import shutil
+from hashlib import sha1
+from json import dump, load
+from typing import Iterable, Optional, Set
+
+from .cache import atomic_write
+
+SHARD_VERSION = 1
+SHARD_EXTENSION = ".xml"
+
+
+class ShardStore:
+    """
+    Stores rendered EPG fragments on disk, one file per channel and day:
+     <directory>/<channel>/<YYYYMMDD>.xml
+
+    The shards are only valid as long as the settings they were rendered
+     with don't change, so the whole store is dropped when the render key
+     differs from the one it was created with.
+    """
+
+    def __init__(self, directory: str, render_key: str):
+        """
+        :param directory: The directory of the store.
+        :param render_key: Key of everything the rendered output depends on.
+        """
+        self.directory = directory
+        self.render_key = render_key
+        meta_path = os.path.join(directory, "meta.json")
+        meta = None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = load(f)
+        except (OSError, ValueError):
+            pass
+        if meta != {"version": SHARD_VERSION, "render_key": render_key}:
+            self.clear()
+            os.makedirs(directory, exist_ok=True)
+            with atomic_write(meta_path) as f:
+                dump({"version": SHARD_VERSION, "render_key": render_key}, f)
+
+    @staticmethod
+    def channel_name(*parts) -> str:
+        """
+        Returns a file system safe directory name for a channel.
+
+        :param parts: The values identifying the channel (ie. EPG ID and file ID).
+        :return: The directory name.
+        """
+        name = "_".join(str(part) for part in parts)
+        if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", name):
+            return name
+        return sha1(name.encode("utf-8")).hexdigest()
+
+    def _path(self, channel: str, day: str) -> str:
+        return os.path.join(self.directory, channel, day + SHARD_EXTENSION)
+
+    def days(self, channel: str) -> Set[str]:
+        """
+        Returns the days stored for a channel.
+
+        :param channel: The channel name.
+        :return: The set of days (YYYYMMDD).
+        """
+        try:
+            files = os.listdir(os.path.join(self.directory, channel))
+        except FileNotFoundError:
+            return set()
+        return {
+            name[: -len(SHARD_EXTENSION)]
+            for name in files
+            if name.endswith(SHARD_EXTENSION)
+        }
+
+    def read(self, channel: str, day: str) -> Optional[str]:
+        """
+        Reads a shard.
+
+        :param channel: The channel name.
+        :param day: The day (YYYYMMDD).
+        :return: The fragment or None if the shard doesn't exist.
+        """
+        try:
+            with open(self._path(channel, day), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, channel: str, day: str, fragment: str) -> bool:
+        """
+        Atomically writes a shard. An empty fragment removes the shard
+         instead, a day without programmes is treated as missing, so it's
+         requested again (ie. the provider hasn't published it yet).
+
+        :param channel: The channel name.
+        :param day: The day (YYYYMMDD).
+        :param fragment: The rendered fragment.
+        :return: Whether the shard was stored.
+        """
+        path = self._path(channel, day)
+        if not fragment:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_write(path) as f:
+            f.write(fragment)
+        return True
+
+    def prune(self, channels: Iterable[str], days: Iterable[str]) -> int:
+        """
+        Removes the channels and days that aren't needed anymore.
+
+        :param channels: The channel names to keep.
+        :param days: The days to keep.
+        :return: The number of removed shards.
+        """
+        channels = set(channels)
+        days = set(days)
+        removed = 0
+        for channel in os.listdir(self.directory):
+            channel_dir = os.path.join(self.directory, channel)
+            if not os.path.isdir(channel_dir):
+                continue
+            if channel not in channels:
+                removed += len(self.days(channel))
+                shutil.rmtree(channel_dir, ignore_errors=True)
+                continue
+            for day in self.days(channel) - days:
+                os.remove(self._path(channel, day))
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """
+        Removes every shard.
+
+        :return: None
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,69 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from ..utils import convert_programme_times
+
+# start times, end times and programmes of a single channel, sorted by start time
+ChannelEPG = Tuple[List[int], List[int], List[dict]]
+
+
+def build_epg_index(epgs: list) -> Dict[str, ChannelEPG]:
+    """
+    Builds a lookup table from the response of GetEPGMultiChannelProgram.
+    Programme times are parsed only once and programmes are sorted by
+     their start time, so the lookups below can use binary search.
+
+    :param epgs: The list of EPG channel objects
+    :return: A dict keyed by EPG channel ID
+    """
+    index = {}
+    time_memo = {}
+    for epg in epgs:
+        epg_channel_id = epg.get("EPG_CHANNEL_ID")
+        # NOTE: first occurrence wins, same as the old linear lookup
+        if epg_channel_id is None or str(epg_channel_id) in index:
+            continue
+        programmes = epg.get("EPGChannelProgrammeObject") or []
+        timed_programmes = [
+            (times[1], times[3], programme)
+            for programme, times in zip(
+                programmes, convert_programme_times(programmes, time_memo)
+            )
+            if times
+        ]
+        timed_programmes.sort(key=lambda x: x[0])
+        index[str(epg_channel_id)] = (
+            [programme[0] for programme in timed_programmes],
+            [programme[1] for programme in timed_programmes],
+            [programme[2] for programme in timed_programmes],
+        )
+    return index
+
+
+def get_current_programme(channel_epg: ChannelEPG, now: int) -> Optional[dict]:
+    """
+    Finds the programme that is on air at the given time.
+
+    :param channel_epg: The channel entry of the EPG index
+    :param now: Unix timestamp
+    :return: The programme or None
+    """
+    starts, ends, programmes = channel_epg
+    # the last programme that started before now
+    idx = bisect_left(starts, now) - 1
+    if idx >= 0 and now < ends[idx]:
+        return programmes[idx]
+    return None
+
+
+def get_next_programmes(channel_epg: ChannelEPG, now: int) -> List[Tuple[int, dict]]:
+    """
+    Returns all programmes that start after the given time.
+
+    :param channel_epg: The channel entry of the EPG index
+    :param now: Unix timestamp
+    :return: A list of (start time, programme) tuples
+    """
+    starts, _, programmes = channel_epg
+    idx = bisect_right(starts, now)
+    return list(zip(starts[idx:], programmes[idx:]))
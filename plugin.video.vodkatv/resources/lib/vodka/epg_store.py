@@ -0,0 +1,259 @@
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .epg import ChannelEPG
+
+SCHEMA_VERSION = 1
+
+
+class EPGStore:
+    """
+    SQLite backed store of EPG programmes, filled by the EPG export service
+     and read by the plugin. The database is in WAL mode, so the plugin can
+     read it while the service is writing it.
+
+    Programme times are in the same format as the ones returned by
+     voda_to_epg_time and used by the EPG index.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        """
+        Opens (and creates if needed) the database.
+
+        :param path: The path of the database file.
+        :param timeout: Seconds to wait for a lock held by the other process.
+        """
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # WAL is safe with NORMAL, a crash can only lose the last commit
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        if self.get_meta("schema") != str(SCHEMA_VERSION):
+            with self.connection:
+                self.connection.execute("DROP TABLE IF EXISTS programmes")
+                self.connection.execute("DELETE FROM meta")
+                # the primary key is the (epg_channel_id, start) index
+                self.connection.execute("""
+                    CREATE TABLE programmes (
+                        epg_channel_id TEXT NOT NULL,
+                        start INTEGER NOT NULL,
+                        end INTEGER NOT NULL,
+                        programme_id TEXT,
+                        name TEXT,
+                        description TEXT,
+                        image TEXT,
+                        PRIMARY KEY (epg_channel_id, start)
+                    ) WITHOUT ROWID
+                    """)
+                self.set_meta("schema", str(SCHEMA_VERSION), commit=False)
+
+    def __enter__(self) -> "EPGStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """
+        :param key: The key of the meta value.
+        :return: The value or None if it's not set.
+        """
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key: str, value: str, commit: bool = True) -> None:
+        """
+        :param key: The key of the meta value.
+        :param value: The value.
+        :param commit: Whether to commit right away.
+        :return: None
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+        if commit:
+            self.connection.commit()
+
+    def replace_programmes(
+        self, epg_channel_id: str, from_time: int, to_time: int, programmes: list
+    ) -> None:
+        """
+        Replaces the programmes of a channel that start in a time range.
+        Only the rows of this range are deleted, so the days of a channel
+         can be refreshed independently.
+
+        :param epg_channel_id: The EPG channel ID.
+        :param from_time: Start of the range (inclusive).
+        :param to_time: End of the range (exclusive).
+        :param programmes: (start, end, programme ID, name, description, image) tuples
+        :return: None
+        """
+        self.connection.execute(
+            "DELETE FROM programmes WHERE epg_channel_id = ? AND start >= ? AND start < ?",
+            (str(epg_channel_id), from_time, to_time),
+        )
+        self.add_programmes(epg_channel_id, from_time, to_time, programmes)
+
+    def add_programmes(
+        self, epg_channel_id: str, from_time: int, to_time: int, programmes: list
+    ) -> None:
+        """
+        Adds programmes of a channel that start in a time range, the ones
+         with the same start are replaced.
+
+        :param epg_channel_id: The EPG channel ID.
+        :param from_time: Start of the range (inclusive).
+        :param to_time: End of the range (exclusive).
+        :param programmes: (start, end, programme ID, name, description, image) tuples
+        :return: None
+        """
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO programmes VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (str(epg_channel_id), *programme)
+                for programme in programmes
+                if from_time <= programme[0] < to_time
+            ),
+        )
+
+    def delete_before(self, timestamp: int) -> int:
+        """
+        Deletes the programmes that start before a given time.
+
+        :param timestamp: The time.
+        :return: The number of deleted programmes.
+        """
+        return self.connection.execute(
+            "DELETE FROM programmes WHERE start < ?", (timestamp,)
+        ).rowcount
+
+    def commit(self) -> None:
+        self.connection.commit()
+
+    def get_current_programme(self, epg_channel_id: str, now: int) -> Optional[dict]:
+        """
+        Finds the programme that is on air at the given time.
+
+        :param epg_channel_id: The EPG channel ID.
+        :param now: The time.
+        :return: The programme or None.
+        """
+        row = self.connection.execute(
+            "SELECT * FROM programmes WHERE epg_channel_id = ? AND start < ? "
+            "ORDER BY start DESC LIMIT 1",
+            (str(epg_channel_id), now),
+        ).fetchone()
+        if row and now < row["end"]:
+            return self._to_programme(row)
+        return None
+
+    def get_next_programmes(
+        self, epg_channel_id: str, now: int, limit: int = -1
+    ) -> List[dict]:
+        """
+        Returns the programmes that start after the given time.
+
+        :param epg_channel_id: The EPG channel ID.
+        :param now: The time.
+        :param limit: The maximum number of programmes, -1 for all.
+        :return: The list of programmes.
+        """
+        rows = self.connection.execute(
+            "SELECT * FROM programmes WHERE epg_channel_id = ? AND start > ? "
+            "ORDER BY start LIMIT ?",
+            (str(epg_channel_id), now, limit),
+        )
+        return [self._to_programme(row) for row in rows]
+
+    def get_programmes_in_range(
+        self, epg_channel_id: str, from_time: int, to_time: int
+    ) -> List[dict]:
+        """
+        Returns the programmes that are on air at any time in a range.
+
+        :param epg_channel_id: The EPG channel ID.
+        :param from_time: Start of the range.
+        :param to_time: End of the range.
+        :return: The list of programmes.
+        """
+        rows = self.connection.execute(
+            "SELECT * FROM programmes WHERE epg_channel_id = ? AND start < ? "
+            "AND end > ? ORDER BY start",
+            (str(epg_channel_id), to_time, from_time),
+        )
+        return [self._to_programme(row) for row in rows]
+
+    def get_epg_index(
+        self, epg_channel_ids: Iterable[str], from_time: int, to_time: int
+    ) -> Dict[str, ChannelEPG]:
+        """
+        Builds the same lookup table as epg.build_epg_index, from the
+         programmes that are on air at any time in a range.
+
+        :param epg_channel_ids: The EPG channel IDs.
+        :param from_time: Start of the range.
+        :param to_time: End of the range.
+        :return: A dict keyed by EPG channel ID.
+        """
+        index = {}
+        for epg_channel_id in epg_channel_ids:
+            programmes = self.get_programmes_in_range(
+                epg_channel_id, from_time, to_time
+            )
+            if programmes:
+                index[str(epg_channel_id)] = (
+                    [programme["start"] for programme in programmes],
+                    [programme["end"] for programme in programmes],
+                    programmes,
+                )
+        return index
+
+    @staticmethod
+    def _to_programme(row: sqlite3.Row) -> dict:
+        # same keys as the API objects, so they can be used interchangeably
+        return {
+            "EPG_CHANNEL_ID": row["epg_channel_id"],
+            "EPG_ID": row["programme_id"],
+            "NAME": row["name"],
+            "DESCRIPTION": row["description"],
+            "image": row["image"],
+            "start": row["start"],
+            "end": row["end"],
+        }
+
+
+def programme_row(programme: dict, times: Tuple[str, int, str, int]) -> tuple:
+    """
+    Converts an API programme object to a row for EPGStore.replace_programmes.
+
+    :param programme: The programme object (EPGChannelProgrammeObject item).
+    :param times: The converted times of the programme (convert_programme_times).
+    :return: (start, end, programme ID, name, description, image) tuple
+    """
+    images = programme.get("EPG_PICTURES")
+    image = None
+    if images:
+        image = max(
+            images,
+            key=lambda x: (
+                x.get("PicWidth", 0),
+                x.get("PicHeight", 0),
+                x.get("Ratio", "") == "bg",
+            ),
+        ).get("Url")
+    return (
+        times[1],
+        times[3],
+        programme.get("EPG_ID"),
+        programme.get("NAME"),
+        programme.get("DESCRIPTION"),
+        image if isinstance(image, str) else None,
+    )
@@ -1,10 +1,20 @@
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from json import loads
+from time import monotonic
+from typing import Any, Iterator, Optional, Tuple
 
-from requests import Session
+from requests import Response, Session, Timeout
 
+from ..utils.jsonstream import iter_json_array
 from . import static
 from .misc import construct_init_obj
 
+# size of the chunks streamed responses are read in
+STREAM_CHUNK_SIZE = 64 * 1024
+# size of the chunks responses with a deadline are read in, the deadline
+# is checked after every chunk
+DEADLINE_CHUNK_SIZE = 4 * 1024
+
 
 def filter(
     _session: Session,
@@ -52,7 +62,11 @@ def filter(
 
 
 def get_channel_list(
-    _session: Session, gateway_phoenix_url: str, ks_token: str, **kwargs
+    _session: Session,
+    gateway_phoenix_url: str,
+    ks_token: str,
+    concurrency: int = 1,
+    **kwargs,
 ) -> list:
     """
     Fetches the live channel list from the API
@@ -60,6 +74,7 @@ def get_channel_list(
     :param _session: requests.Session object
     :param gateway_phoenix_url: The gateway phoenix url
     :param ks_token: The ks token
+    :param concurrency: How many pages to fetch at once after the first one
     :param kwargs: Optional arguments
     :return: A list of channels
     """
@@ -76,11 +91,9 @@ def get_channel_list(
             "objectType": f"{static.get_ott_platform_name()}AssetImagePerRatioFilter",
         },
     }
-    # request all channels in 50 per page chunks
-    objects = []
-    page_idx = 1
-    while True:
-        result, total_count = filter(
+
+    def fetch_page(page_idx: int) -> Tuple[list, int]:
+        return filter(
             _session,
             gateway_phoenix_url,
             filter_obj,
@@ -90,10 +103,30 @@ def get_channel_list(
             page_size=50,
             **kwargs,
         )
-        objects.extend(result)
-        if len(objects) >= total_count:
-            break
+
+    # request all channels in 50 per page chunks
+    objects, total_count = fetch_page(1)
+    page_idx = 1
+    if concurrency > 1 and objects and len(objects) < total_count:
+        # the first page tells us how many pages there are, so the rest
+        # can be requested together. NOTE: the length of the first page is
+        # used as page size in case the gateway caps it
+        page_count = -(-total_count // len(objects))
+        with ThreadPoolExecutor(
+            max_workers=min(concurrency, page_count - 1)
+        ) as executor:
+            # map yields the results in page order and re-raises
+            # the first failure, just like the sequential loop would
+            for result, _ in executor.map(fetch_page, range(2, page_count + 1)):
+                objects.extend(result)
+        page_idx = page_count
+    # sequential mode, also picks up channels added since the first page
+    while len(objects) < total_count:
         page_idx += 1
+        result, total_count = fetch_page(page_idx)
+        if not result:
+            break
+        objects.extend(result)
     return objects
 
 
@@ -135,10 +168,16 @@ def get_epg_by_channel_ids(
     from_offset: int,
     to_offset: int,
     utc_offset: int,
+    deadline: Optional[float] = None,
     **kwargs,
 ) -> list:
     """
     Fetches the epg for a list of channels
+    With a deadline the body is read in small chunks, and the download is
+     abandoned once the deadline has passed, so a slowly sent response
+     can't hold the caller up. Every socket read is limited by the time
+     left too, so the deadline can only be overrun by the time of reading
+     DEADLINE_CHUNK_SIZE bytes of a response that trickles in.
 
     :param _session: requests.Session object
     :param gateway_phoenix_url: The gateway phoenix url
@@ -147,8 +186,11 @@ def get_epg_by_channel_ids(
     :param from_offset: The start time offset
     :param to_offset: The end time offset
     :param utc_offset: The UTC offset
+    :param deadline: The time.monotonic() by which the whole response must
+     be downloaded (optional)
     :param kwargs: Optional arguments
     :return: A list of epg items
+    :raises Timeout: If the deadline has passed.
     """
     data = {
         "initObj": construct_init_obj(**kwargs),
@@ -159,12 +201,102 @@ def get_epg_by_channel_ids(
         "sEPGChannelID": channel_ids,
         "sPicSize": "full",
     }
+    if deadline is None:
+        response = _session.post(
+            f"{json_post_gw}?m=GetEPGMultiChannelProgram",
+            json=data,
+        )
+        response.raise_for_status()
+        return response.json()
+    remaining = deadline - monotonic()
+    if remaining <= 0:
+        raise Timeout("The EPG deadline has passed")
     response = _session.post(
         f"{json_post_gw}?m=GetEPGMultiChannelProgram",
         json=data,
+        timeout=remaining,
+        stream=True,
     )
-    response.raise_for_status()
-    return response.json()
+    try:
+        response.raise_for_status()
+        body = bytearray()
+        for chunk in response.iter_content(DEADLINE_CHUNK_SIZE):
+            body += chunk
+            if monotonic() > deadline:
+                raise Timeout("The EPG response didn't arrive by the deadline")
+    finally:
+        response.close()
+    return loads(body)
+
+
+class StreamedArray:
+    """
+    A streamed JSON array response, decoded item by item while the body
+     is downloaded, so only a single item is held in memory. The response
+     is closed when the iteration ends (or by close, if it's never iterated).
+    """
+
+    def __init__(self, response: Response):
+        """
+        :param response: The response, requested with stream=True.
+        """
+        self._response = response
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            yield from iter_json_array(self._response.iter_content(STREAM_CHUNK_SIZE))
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._response.close()
+
+
+def iter_epg_by_channel_ids(
+    _session: Session,
+    json_post_gw: str,
+    channel_ids: list,
+    from_offset: int,
+    to_offset: int,
+    utc_offset: int,
+    **kwargs,
+) -> StreamedArray:
+    """
+    Same as get_epg_by_channel_ids, but the channels are decoded one at
+     a time while the response is downloaded, so only a single channel is
+     held in memory instead of the whole response.
+    Errors of the request are raised here, transfer and decoding errors
+     while iterating.
+
+    :param _session: requests.Session object
+    :param json_post_gw: The JSON post gateway URL
+    :param channel_ids: The list of channel ids
+    :param from_offset: The start time offset
+    :param to_offset: The end time offset
+    :param utc_offset: The UTC offset
+    :param kwargs: Optional arguments
+    :return: An iterable of epg items
+    """
+    data = {
+        "initObj": construct_init_obj(**kwargs),
+        "iFromOffset": from_offset,
+        "iToOffset": to_offset,
+        "iUtcOffset": utc_offset,
+        "oUnit": "Days",
+        "sEPGChannelID": channel_ids,
+        "sPicSize": "full",
+    }
+    response = _session.post(
+        f"{json_post_gw}?m=GetEPGMultiChannelProgram",
+        json=data,
+        stream=True,
+    )
+    try:
+        response.raise_for_status()
+    except BaseException:
+        response.close()
+        raise
+    return StreamedArray(response)
 
 
 def get_recordings(
@@ -0,0 +1,80 @@
+from typing import Iterable, List, Optional, Tuple
+
+from . import static
+
+
+class Channel:
+    """
+    A live channel parsed from an asset object of the channel list.
+    Everything the listing, the exports and the recordings need is
+     computed once, in a single pass over the asset.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "number",
+        "epg_id",
+        "media_file",
+        "fallback_media_file",
+        "logo",
+    )
+
+    def __init__(self, asset: dict):
+        """
+        Parse the channel asset.
+
+        :param asset: The channel object returned by the API.
+        """
+        self.id = asset.get("id")
+        self.name = asset.get("name")
+        metas = asset.get("metas") or {}
+        # channel number, used as the sort key
+        self.number = int((metas.get("Channel number") or {}).get("value", 0))
+        # EPG_GUID_ID meta, None if the channel has no EPG
+        self.epg_id = (metas.get("EPG_GUID_ID") or {}).get("value")
+        # (file ID, file type) tuples, files that contain 'HD' first
+        media_files = sorted(
+            (
+                (media_file.get("id"), media_file.get("type"))
+                for media_file in asset.get("mediaFiles") or []
+                if media_file.get("type") in static.media_file_ids
+            ),
+            key=lambda x: x[1].lower().find("hd"),
+            reverse=True,
+        )
+        self.media_file = media_files[0] if media_files else None
+        self.fallback_media_file = media_files[1] if len(media_files) > 1 else None
+        self.logo = None
+        images = asset.get("images")
+        if images:
+            self.logo = next(
+                (image for image in images if image.get("ratio") == "16:10"),
+                images[0],
+            )["url"]
+
+    def get_playable_media_file(
+        self, available_file_ids: set
+    ) -> Optional[Tuple[int, str]]:
+        """
+        Returns the preferred media file that the user has access to.
+
+        :param available_file_ids: The set of available file IDs.
+        :return: A (file ID, file type) tuple or None.
+        """
+        for media_file in (self.media_file, self.fallback_media_file):
+            if media_file and media_file[0] in available_file_ids:
+                return media_file
+        return None
+
+
+def build_channels(assets: Iterable[dict]) -> List[Channel]:
+    """
+    Parse the channel list and sort it by channel number.
+
+    :param assets: The channel objects returned by the API.
+    :return: The list of channels.
+    """
+    channels = [Channel(asset) for asset in assets]
+    channels.sort(key=lambda channel: channel.number)
+    return channels
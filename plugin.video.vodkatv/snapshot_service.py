@@ -0,0 +1,121 @@
+import os
+import threading
+from time import time
+
+import xbmc
+import xbmcaddon
+from default import (
+    SNAPSHOT_CACHE_NAME,
+    authenticate,
+    build_channel_snapshot,
+    get_profile_path,
+    prepare_session,
+    read_channel_snapshot,
+    write_channel_snapshot,
+)
+from requests import Session
+
+
+class ChannelSnapshotThread(threading.Thread):
+    """
+    A thread that keeps the snapshot of the live channel list fresh,
+     so the plugin can render the list without any API calls.
+    """
+
+    def __init__(
+        self,
+        addon: xbmcaddon.Addon,
+        _session: Session,
+        frequency: int,
+        last_updated: int,
+    ):
+        super().__init__()
+        self.addon = addon
+        self._session = _session
+        self.frequency = frequency
+        self.last_updated = last_updated
+        self.killed = threading.Event()
+
+    @property
+    def now(self) -> int:
+        """Returns the current time in unix format"""
+        return int(time())
+
+    @property
+    def handle(self) -> str:
+        """Returns the addon handle"""
+        return f"[{self.addon.getAddonInfo('name')}]"
+
+    def run(self) -> None:
+        """
+        Snapshot update thread's main loop.
+        """
+        while not self.killed.is_set():
+            self.killed.wait(
+                max(
+                    0,
+                    min(
+                        self.frequency, self.frequency - (self.now - self.last_updated)
+                    ),
+                )
+            )
+            if self.killed.is_set():
+                break
+            try:
+                authenticate(self._session, self.addon)
+                started = time()
+                snapshot = build_channel_snapshot(self._session, self.addon)
+                write_channel_snapshot(self.addon, snapshot)
+                self.last_updated = self.now
+                xbmc.log(
+                    f"{self.handle} Channel list snapshot updated: {len(snapshot['channels'])} channels in {time() - started:.2f} seconds",
+                    xbmc.LOGDEBUG,
+                )
+            except Exception as e:
+                xbmc.log(
+                    f"{self.handle} Channel list snapshot update failed: {e}",
+                    xbmc.LOGERROR,
+                )
+                # retry sooner than the regular schedule
+                self.last_updated = self.now - self.frequency + 60
+
+    def stop(self) -> None:
+        """
+        Sets stop event to the thread.
+        """
+        self.killed.set()
+
+
+def main_service(addon: xbmcaddon.Addon) -> ChannelSnapshotThread:
+    """
+    Starts the channel list snapshot updater thread.
+    """
+    handle = f"[{addon.getAddonInfo('name')}]"
+    if not addon.getSettingBool("channelsnapshot"):
+        xbmc.log(f"{handle} Channel list snapshot disabled", level=xbmc.LOGWARNING)
+        return
+    if not all([addon.getSetting("username"), addon.getSetting("password")]):
+        xbmc.log(f"{handle} No credentials set, won't start", level=xbmc.LOGWARNING)
+        return
+    _session = prepare_session()
+    authenticate(_session, addon)
+    if not addon.getSetting("kstoken"):
+        xbmc.log(f"{handle} No KSToken set, won't start", level=xbmc.LOGWARNING)
+        return
+    frequency = addon.getSettingInt("snapshotrefresh") * 60
+    if not frequency:
+        xbmc.log(
+            f"{handle} Snapshot refresh interval not set, won't start",
+            level=xbmc.LOGWARNING,
+        )
+        return
+    # don't refresh a snapshot that's still fresh right after startup
+    last_update = 0
+    if read_channel_snapshot(addon) is not None:
+        last_update = int(
+            os.path.getmtime(get_profile_path(addon, SNAPSHOT_CACHE_NAME))
+        )
+    snapshot_updater = ChannelSnapshotThread(addon, _session, frequency, last_update)
+    snapshot_updater.start()
+    xbmc.log(f"{handle} Channel list snapshot service started", level=xbmc.LOGINFO)
+    return snapshot_updater
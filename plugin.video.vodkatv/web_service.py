@@ -1,12 +1,25 @@
 import threading
+from email.utils import parsedate_to_datetime
 from socketserver import ThreadingMixIn
+from typing import Optional, Tuple
 from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
 
 import xbmc
 import xbmcaddon
 from bottle import default_app, hook, redirect, request, response, route
+from default import IMAGE_HOSTS_NAME, get_profile_path, prepare_session
+from requests import RequestException
+from resources.lib.utils.image_cache import CachedImage, ImageCache
+from resources.lib.utils.image_hosts import ImageHosts
 from xbmcgui import NOTIFICATION_ERROR, Dialog
 
+IMAGE_CACHE_DIR = "image_cache"
+# timeout of the requests to the origin in seconds
+UPSTREAM_TIMEOUT = 15
+# images larger than this (in bytes) are not fetched
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+UPSTREAM_CHUNK_SIZE = 64 * 1024
+
 
 class SilentWSGIRequestHandler(WSGIRequestHandler):
     """Custom WSGI Request Handler with logging disabled"""
@@ -37,22 +50,161 @@ def index():
     return request.app.config["welcome_text"]
 
 
-@route("<url:path>", method=["GET"])
-def redirect_site(url):
+def get_upstream_url(url: str) -> Optional[str]:
+    """
+    Returns the original URL of an image rewritten by replace_image.
+
+    :param url: The path of the request.
+    :return: The original URL or None if the h or s query parameter is missing.
+    """
     host = request.query.get("h")
     scheme = request.query.get("s")
-    if not all([host, scheme]):
+    if not all([host, scheme]) or scheme not in ("http", "https"):
+        return None
+    return f"{scheme}://{host}{url}"
+
+
+def is_known_host() -> bool:
+    """
+    Only images of the hosts rewritten by replace_image are fetched into
+     the cache, so the service can't be used to reach other hosts (ie. on
+     the LAN). The others are redirected to, like without the cache.
+
+    :return: Whether the host in the h query parameter was recorded.
+    """
+    return request.query.get("h", "") in request.app.config["image_hosts"]
+
+
+def fetch_upstream(upstream_url: str) -> Tuple[bytes, str, Optional[str]]:
+    """
+    Fetches an image from the origin. The body is only downloaded if the
+     response is an image, and the download stops past MAX_IMAGE_SIZE.
+
+    :param upstream_url: The URL of the image.
+    :return: The content, the content type and the Last-Modified header.
+    :raises RequestException: If the request fails, it's not an image or
+     it's too large.
+    """
+    upstream = request.app.config["session"].get(
+        upstream_url, timeout=UPSTREAM_TIMEOUT, stream=True
+    )
+    try:
+        upstream.raise_for_status()
+        content_type = upstream.headers.get("Content-Type", "")
+        if not content_type.startswith("image/"):
+            raise RequestException(f"Not an image ({content_type})")
+        content_length = upstream.headers.get("Content-Length", "")
+        if content_length.isdigit() and int(content_length) > MAX_IMAGE_SIZE:
+            raise RequestException("Image too large")
+        content = bytearray()
+        for chunk in upstream.iter_content(UPSTREAM_CHUNK_SIZE):
+            content += chunk
+            if len(content) > MAX_IMAGE_SIZE:
+                raise RequestException("Image too large")
+        return bytes(content), content_type, upstream.headers.get("Last-Modified")
+    finally:
+        upstream.close()
+
+
+def get_cached_image(upstream_url: str) -> Tuple[CachedImage, Optional[bytes]]:
+    """
+    Returns a cached image, fetches it from the origin if it's not cached.
+
+    :param upstream_url: The URL of the image.
+    :return: The metadata and the content (None if it was already cached).
+    """
+    return request.app.config["image_cache"].fetch(upstream_url, fetch_upstream)
+
+
+def is_not_modified(image: CachedImage) -> bool:
+    """
+    Checks the conditional headers of the request.
+    If-Modified-Since is only checked without If-None-Match (RFC 7232).
+
+    :param image: The metadata of the cached image.
+    :return: Whether the client's copy is up to date.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        etags = [etag.strip() for etag in if_none_match.split(",")]
+        # weak comparison, the W/ prefix is ignored
+        return "*" in etags or image.etag in (
+            etag[2:] if etag.startswith("W/") else etag for etag in etags
+        )
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since and image.last_modified:
+        try:
+            return parsedate_to_datetime(image.last_modified) <= parsedate_to_datetime(
+                if_modified_since
+            )
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def set_image_headers(image: CachedImage) -> None:
+    response.content_type = image.content_type
+    response.set_header("Content-Length", str(image.size))
+    response.set_header("ETag", image.etag)
+    response.set_header("Last-Modified", image.last_modified)
+
+
+@route("<url:path>", method=["GET"])
+def proxy_image(url):
+    """
+    Serves an image from the image cache, fetching it from the origin
+     first if needed. Redirects to the origin if the cache is disabled,
+     the host is unknown or the image can't be fetched.
+    """
+    upstream_url = get_upstream_url(url)
+    if not upstream_url:
         response.content_type = "text/plain"
         response.status = 400
         return "Missing h or s query parameter"
-    redirect(f"{scheme}://{host}{url}", 302)
+    if not request.app.config["image_cache"] or not is_known_host():
+        redirect(upstream_url, 302)
+    try:
+        image, content = get_cached_image(upstream_url)
+    except (RequestException, OSError) as e:
+        xbmc.log(
+            f"[{request.app.config['name']}] Web service: failed to fetch {upstream_url}: {e}",
+            xbmc.LOGWARNING,
+        )
+        redirect(upstream_url, 302)
+    if is_not_modified(image):
+        response.status = 304
+        response.set_header("ETag", image.etag)
+        return ""
+    if content is None:
+        content = request.app.config["image_cache"].read(image)
+        if content is None:
+            # evicted since it was looked up
+            redirect(upstream_url, 302)
+    set_image_headers(image)
+    return content
 
 
 @route("<url:path>", method=["HEAD"])
-def fake_image(url):
+def image_metadata(url):
     """
-    Returns a 200 and image/png content type for any HEAD request
+    Returns the headers of a cached image (fetching it if needed).
+    If the image cache is disabled, the host is unknown or the image can't
+     be fetched, a 200 with image/png content type is returned, like for
+     any image.
     """
+    upstream_url = get_upstream_url(url)
+    if upstream_url and request.app.config["image_cache"] and is_known_host():
+        try:
+            image, _ = get_cached_image(upstream_url)
+        except (RequestException, OSError):
+            pass
+        else:
+            if is_not_modified(image):
+                response.status = 304
+                response.set_header("ETag", image.etag)
+            else:
+                set_image_headers(image)
+            return ""
     response.content_type = "image/png"
     return ""
 
@@ -81,6 +233,16 @@ def main_service(addon: xbmcaddon.Addon) -> WebServerThread:
     welcome_text = f"{name} Web Service"
     app.config["name"] = name
     app.config["welcome_text"] = welcome_text
+    app.config["image_cache"] = None
+    if addon.getSettingBool("webimagecache"):
+        app.config["session"] = prepare_session()
+        app.config["image_hosts"] = ImageHosts(
+            get_profile_path(addon, IMAGE_HOSTS_NAME)
+        )
+        app.config["image_cache"] = ImageCache(
+            get_profile_path(addon, IMAGE_CACHE_DIR),
+            addon.getSettingInt("webimagecachesize") * 1024 * 1024,
+        )
     try:
         httpd = make_server(
             addon.getSetting("webaddress"),
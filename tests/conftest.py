@@ -0,0 +1,12 @@
+"""
+The addon is imported like Kodi does (from its own directory), with the
+ stub Kodi modules and the fake API of the benchmarks.
+"""
+
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "plugin.video.vodkatv"))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "benchmarks"))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "benchmarks", "stubs"))
@@ -0,0 +1,58 @@
+"""
+Tests of the checkpoint of an interrupted EPG export.
+"""
+
+import json
+
+from resources.lib.utils.checkpoint import ExportCheckpoint
+
+
+def test_completed_days_are_kept_for_the_same_key(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = ExportCheckpoint(path, "key")
+    assert not checkpoint.completed and not checkpoint.stale
+    checkpoint.add({"1_10": ["20240101", "20240102"]})
+    checkpoint.add({"1_10": {"20240103"}, "2_20": {"20240101"}})
+    checkpoint = ExportCheckpoint(path, "key")
+    assert not checkpoint.stale
+    assert checkpoint.completed == {
+        "1_10": {"20240101", "20240102", "20240103"},
+        "2_20": {"20240101"},
+    }
+    assert checkpoint.is_completed("1_10", "20240102")
+    assert not checkpoint.is_completed("2_20", "20240102")
+    assert not checkpoint.is_completed("3_30", "20240101")
+
+
+def test_checkpoint_of_another_key_is_stale(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    ExportCheckpoint(str(path), "key").add({"1_10": ["20240101"]})
+    checkpoint = ExportCheckpoint(str(path), "other key")
+    assert checkpoint.stale
+    assert not checkpoint.completed
+    assert not path.exists()
+
+
+def test_checkpoint_of_another_version_is_stale(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text(json.dumps({"version": 0, "key": "key", "completed": {}}))
+    assert ExportCheckpoint(str(path), "key").stale
+
+
+def test_broken_checkpoint_is_ignored(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text('{"version": 1, "key": "key", "comp')
+    checkpoint = ExportCheckpoint(str(path), "key")
+    assert not checkpoint.stale
+    assert not checkpoint.completed
+
+
+def test_discard(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    checkpoint = ExportCheckpoint(str(path), "key")
+    checkpoint.add({"1_10": ["20240101"]})
+    checkpoint.discard()
+    assert not checkpoint.completed
+    assert not path.exists()
+    # already removed
+    checkpoint.discard()
@@ -0,0 +1,76 @@
+"""
+Tests of the adaptive size of the EPG export requests.
+"""
+
+from resources.lib.utils.chunking import AdaptiveChunkSizer
+
+
+def test_size_is_clamped():
+    assert AdaptiveChunkSizer(0, 2).size == 1
+    assert AdaptiveChunkSizer(10000, 2, max_size=500).size == 500
+
+
+def test_channels_per_request():
+    sizer = AdaptiveChunkSizer(100, 2)
+    assert sizer.channels_per_request(7) == 14
+    assert sizer.channels_per_request(1) == 100
+    assert sizer.channels_per_request(0) == 100
+    # at least one channel, even if a single channel is larger
+    assert sizer.channels_per_request(200) == 1
+
+
+def test_fast_response_grows_the_size_at_most_twice():
+    sizer = AdaptiveChunkSizer(100, 2)
+    sizer.record(100, 0.01, 1000)
+    assert sizer.size == 200
+    assert sizer.requests == 1
+    assert sizer.channel_days == 100
+    assert sizer.programmes == 1000
+
+
+def test_response_near_the_target_keeps_the_size():
+    sizer = AdaptiveChunkSizer(100, 2)
+    sizer.record(100, 1.8, 1000)
+    assert sizer.size == 100
+
+
+def test_slow_response_shrinks_the_size():
+    sizer = AdaptiveChunkSizer(100, 2)
+    sizer.record(100, 4, 1000)
+    assert sizer.size == 40
+
+
+def test_late_responses_are_measured_by_their_own_size():
+    sizer = AdaptiveChunkSizer(100, 2)
+    sizer.record(100, 4, 1000)
+    # a fast response of a smaller request doesn't grow the size past it
+    sizer.record(10, 0.4, 100)
+    assert sizer.size == 40
+    # a slow response of a request sent earlier doesn't grow it either
+    sizer.record(100, 2.5, 1000)
+    assert sizer.size == 40
+
+
+def test_failure_halves_the_size_and_caps_it():
+    sizer = AdaptiveChunkSizer(100, 2)
+    sizer.record_failure(100)
+    assert sizer.size == 50
+    assert sizer.failures == 1
+    assert sizer.max_size == 99
+    sizer.record(50, 0.01, 500)
+    assert sizer.size == 99
+
+
+def test_failure_of_a_larger_request_is_only_retried():
+    sizer = AdaptiveChunkSizer(100, 2)
+    sizer.record_failure(100)
+    sizer.record_failure(100)
+    assert sizer.size == 50
+    assert sizer.failures == 1
+
+
+def test_failures_never_go_below_the_minimum():
+    sizer = AdaptiveChunkSizer(1, 2)
+    sizer.record_failure(1)
+    assert sizer.size == 1
+    assert sizer.max_size == 1
@@ -0,0 +1,72 @@
+"""
+Tests of the digests of the exported channels.
+"""
+
+from resources.lib.utils.digests import ChannelDigests, digest
+
+
+def test_digest():
+    assert digest(["a", "b"]) == digest(iter(["a", "b"]))
+    # the parts are separated
+    assert digest(["a", "b"]) != digest(["ab"])
+    assert digest(["a", "b"]) != digest(["b", "a"])
+
+
+def save(path: str, key: str, channels: dict) -> None:
+    digests = ChannelDigests(path, key)
+    for channel, channel_digest in channels.items():
+        digests.add(channel, channel_digest)
+    digests.save()
+
+
+def test_first_export_has_only_changes(tmp_path):
+    digests = ChannelDigests(str(tmp_path / "digests.json"), "key")
+    digests.add("1", "a")
+    assert digests.changes() == (1, 0, 0)
+    assert not digests.is_unchanged()
+
+
+def test_changes_are_compared_with_the_previous_export(tmp_path):
+    path = str(tmp_path / "digests.json")
+    save(path, "key", {"1": "a", "2": "b", "3": "c"})
+    digests = ChannelDigests(path, "key")
+    digests.add("1", "a")
+    digests.add("2", "changed")
+    digests.add("4", "d")
+    assert digests.changes() == (2, 1, 1)
+    assert not digests.is_unchanged()
+
+
+def test_unchanged_export(tmp_path):
+    path = str(tmp_path / "digests.json")
+    save(path, "key", {"1": "a", "2": "b"})
+    digests = ChannelDigests(path, "key")
+    digests.add("1", "a")
+    digests.add("2", "b")
+    assert digests.changes() == (0, 2, 0)
+    assert digests.is_unchanged()
+
+
+def test_changed_order_is_a_change_of_the_file(tmp_path):
+    path = str(tmp_path / "digests.json")
+    save(path, "key", {"1": "a", "2": "b"})
+    digests = ChannelDigests(path, "key")
+    digests.add("2", "b")
+    digests.add("1", "a")
+    assert digests.changes() == (0, 2, 0)
+    assert not digests.is_unchanged()
+
+
+def test_digests_of_another_file_are_ignored(tmp_path):
+    path = str(tmp_path / "digests.json")
+    save(path, "key", {"1": "a"})
+    digests = ChannelDigests(path, "other key")
+    digests.add("1", "a")
+    assert digests.changes() == (1, 0, 0)
+    assert not digests.is_unchanged()
+
+
+def test_broken_digests_are_ignored(tmp_path):
+    path = tmp_path / "digests.json"
+    path.write_text('{"version": 1, "ke')
+    assert ChannelDigests(str(path), "key").previous == []
@@ -0,0 +1,140 @@
+"""
+Tests of the stages of the EPG export, run end to end against the fake
+ API of the benchmarks.
+"""
+
+import os
+import threading
+from time import time
+
+import pytest
+import xbmcaddon
+import xbmcvfs
+
+import export_data
+from default import get_profile_path
+from fake_api import FakeApi
+from resources.lib.vodka import media_list
+
+CHANNELS = 12
+DAYS = 4
+
+
+@pytest.fixture
+def api(monkeypatch) -> FakeApi:
+    api = FakeApi(CHANNELS, DAYS, pictures=1)
+    monkeypatch.setattr(export_data, "get_channels", lambda *_, **__: api.channels)
+    monkeypatch.setattr(
+        media_list, "iter_epg_by_channel_ids", api.iter_epg_by_channel_ids
+    )
+    return api
+
+
+@pytest.fixture
+def addon(monkeypatch, tmp_path) -> xbmcaddon.Addon:
+    addon = xbmcaddon.Addon()
+    monkeypatch.setattr(xbmcvfs, "_home", str(tmp_path / "home"))
+    for key, value in {
+        "username": "test",
+        "password": "test",
+        "ksexpiry": str(int(time()) + 86400),
+        "channelexportpath": str(tmp_path),
+        "epgexportname": "epg.xml",
+        "epgnotifoncompletion": "false",
+        "epgcompress": "false",
+        "epgfetchinonereq": "5",
+        "epgexportworkers": "2",
+        "epgexportqueuedepth": "2",
+        "epgrefreshdays": "1",
+        "epgadaptivechunk": "false",
+        "epglowmemory": "false",
+    }.items():
+        monkeypatch.setitem(addon._settings, key, value)
+    return addon
+
+
+def export(addon: xbmcaddon.Addon, api: FakeApi, kill_event=None) -> bytes:
+    api.reset()
+    export_data.export_epg(addon, None, api.from_offset, api.to_offset, 0, kill_event)
+    path = os.path.join(addon.getSetting("channelexportpath"), "epg.xml")
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_export_contains_every_programme(addon, api):
+    output = export(addon, api)
+    assert output.count(b"<channel ") == CHANNELS
+    assert output.count(b"<programme ") == api.total_programmes()
+    assert sum(api.requests) == CHANNELS * DAYS
+    # chunks of 5 channels
+    assert max(api.requests) == 5 * DAYS
+
+
+def test_only_the_refreshed_days_are_fetched_again(addon, api):
+    output = export(addon, api)
+    assert export(addon, api) == output
+    assert sum(api.requests) == CHANNELS
+
+
+def test_missing_shard_is_fetched_again(addon, api, monkeypatch):
+    output = export(addon, api)
+    monkeypatch.setitem(addon._settings, "epgrefreshdays", "0")
+    shard_dir = get_profile_path(addon, export_data.EPG_SHARD_DIR)
+    channel = sorted(name for name in os.listdir(shard_dir) if name != "meta.json")[0]
+    day = sorted(os.listdir(os.path.join(shard_dir, channel)))[0]
+    os.remove(os.path.join(shard_dir, channel, day))
+    assert export(addon, api) == output
+    assert api.requests == [1]
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [{"epglowmemory": "true"}, {"epgadaptivechunk": "true", "epgchunktarget": "2"}],
+)
+def test_modes_write_the_same_file(addon, api, monkeypatch, tmp_path, settings):
+    output = export(addon, api)
+    monkeypatch.setattr(xbmcvfs, "_home", str(tmp_path / "other home"))
+    for key, value in settings.items():
+        monkeypatch.setitem(addon._settings, key, value)
+    assert export(addon, api) == output
+
+
+def test_repeated_channel_is_merged(addon, api, monkeypatch, tmp_path):
+    output = export(addon, api)
+    fetch = api.iter_epg_by_channel_ids
+
+    def split_channels(*args, **kwargs):
+        # every channel is sent in two halves
+        for channel in fetch(*args, **kwargs):
+            programmes = channel["EPGChannelProgrammeObject"]
+            middle = len(programmes) // 2
+            yield dict(channel, EPGChannelProgrammeObject=programmes[:middle])
+            yield dict(channel, EPGChannelProgrammeObject=programmes[middle:])
+
+    monkeypatch.setattr(media_list, "iter_epg_by_channel_ids", split_channels)
+    for low_memory in ("false", "true"):
+        monkeypatch.setattr(xbmcvfs, "_home", str(tmp_path / low_memory))
+        monkeypatch.setitem(addon._settings, "epglowmemory", low_memory)
+        assert export(addon, api) == output
+
+
+def test_interrupted_export_is_resumed(addon, api, monkeypatch):
+    kill_event = threading.Event()
+    store_chunk = export_data.EPGExport.store_chunk
+
+    def store_and_kill(self, chunk, latency):
+        store_chunk(self, chunk, latency)
+        kill_event.set()
+
+    monkeypatch.setattr(export_data.EPGExport, "store_chunk", store_and_kill)
+    export_data.export_epg(addon, None, api.from_offset, api.to_offset, 0, kill_event)
+    assert api.requests[0] == 5 * DAYS
+    assert not os.path.exists(
+        os.path.join(addon.getSetting("channelexportpath"), "epg.xml")
+    )
+    monkeypatch.setattr(export_data.EPGExport, "store_chunk", store_chunk)
+    output = export(addon, api)
+    # the channel days of the first chunk aren't fetched again
+    assert sum(api.requests) == CHANNELS * DAYS - 5 * DAYS
+    assert output.count(b"<programme ") == api.total_programmes()
+    assert not os.path.exists(get_profile_path(addon, export_data.EPG_CHECKPOINT_NAME))
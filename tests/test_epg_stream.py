@@ -0,0 +1,108 @@
+"""
+Tests of iter_epg_by_channel_ids against a stub gateway session: the body
+ is downloaded and decoded while it's iterated.
+"""
+
+import json
+
+import pytest
+from requests import ConnectionError, HTTPError
+
+from resources.lib.vodka import media_list
+
+EPG = [
+    {
+        "EPG_CHANNEL_ID": str(channel_id),
+        "EPGChannelProgrammeObject": [
+            {"EPG_ID": f"{channel_id}{number}", "NAME": "Műsor " * 20}
+            for number in range(50)
+        ],
+    }
+    for channel_id in range(300001, 300031)
+]
+
+
+class StubResponse:
+    def __init__(self, body: bytes, status_code: int = 200, fail_after: int = None):
+        self.body = body
+        self.status_code = status_code
+        self.fail_after = fail_after
+        self.closed = False
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise HTTPError(f"{self.status_code} Error", response=self)
+
+    def iter_content(self, chunk_size: int):
+        self.streamed = 0
+        for start in range(0, len(self.body), chunk_size):
+            self.streamed = start
+            if self.fail_after is not None and start >= self.fail_after:
+                raise ConnectionError("Connection reset by peer")
+            yield self.body[start : start + chunk_size]
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class StubSession:
+    def __init__(self, response: StubResponse):
+        self.response = response
+
+    def post(self, url: str, json: dict, stream: bool = False) -> StubResponse:
+        assert stream
+        return self.response
+
+
+def fetch(response: StubResponse) -> media_list.StreamedArray:
+    return media_list.iter_epg_by_channel_ids(
+        StubSession(response), "https://gateway.example.com", [1], 0, 1, 0
+    )
+
+
+def test_decodes_the_whole_response():
+    response = StubResponse(json.dumps(EPG).encode("utf-8"))
+    channels = fetch(response)
+    assert not response.closed
+    assert list(channels) == EPG
+    assert response.closed
+
+
+def test_channels_are_yielded_while_streaming():
+    body = json.dumps(EPG).encode("utf-8")
+    response = StubResponse(body)
+    channels = iter(fetch(response))
+    assert next(channels) == EPG[0]
+    # only the beginning of the body was read for the first channel
+    assert response.streamed < len(body) // 4
+
+
+def test_response_is_closed_by_close():
+    response = StubResponse(json.dumps(EPG).encode("utf-8"))
+    fetch(response).close()
+    assert response.closed
+
+
+def test_transfer_error_is_raised_while_iterating():
+    response = StubResponse(
+        json.dumps(EPG).encode("utf-8"), fail_after=media_list.STREAM_CHUNK_SIZE
+    )
+    channels = fetch(response)
+    with pytest.raises(ConnectionError):
+        list(channels)
+    assert response.closed
+
+
+def test_error_status_is_raised_by_the_call():
+    response = StubResponse(b"", status_code=503)
+    with pytest.raises(HTTPError):
+        fetch(response)
+    assert response.closed
+
+
+def test_truncated_body_raises_while_iterating():
+    body = json.dumps(EPG).encode("utf-8")
+    response = StubResponse(body[: len(body) // 2])
+    with pytest.raises(ValueError):
+        list(fetch(response))
+    assert response.closed
@@ -0,0 +1,56 @@
+"""
+Tests of the incremental JSON array decoder: the items are the same as
+ json.loads gives, however the document is split into chunks.
+"""
+
+import json
+
+import pytest
+
+from resources.lib.utils.jsonstream import iter_json_array
+
+DOCUMENT = [
+    {"EPG_CHANNEL_ID": "1", "NAME": "Műsor", "TAGS": [1, 2.5, None, True]},
+    [],
+    "szöveg, [vesszővel]",
+    12345,
+    -0.5e3,
+    None,
+    {},
+]
+
+
+def split(body: bytes, size: int) -> list:
+    return [body[start : start + size] for start in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 10000])
+def test_items_equal_json_loads(size):
+    body = json.dumps(DOCUMENT, ensure_ascii=False, indent=1).encode("utf-8")
+    assert list(iter_json_array(split(body, size))) == DOCUMENT
+
+
+@pytest.mark.parametrize("body", [b"[]", b" [ ] ", b"[\n]\n"])
+def test_empty_array(body):
+    assert list(iter_json_array(split(body, 1))) == []
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"",
+        b"{}",
+        b"[1,]",
+        b"[1, 2 ,\n]",
+        b'[{"a": 1},]',
+        b"[,1]",
+        b"[1 2]",
+        b"[1, 2",
+        b"[1] 2",
+        b'[{"a": 1',
+    ],
+)
+@pytest.mark.parametrize("size", [1, 3, 100])
+def test_invalid_documents_raise(body, size):
+    with pytest.raises(ValueError):
+        list(iter_json_array(split(body, size)))
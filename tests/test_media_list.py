@@ -0,0 +1,91 @@
+"""
+Tests of the concurrent page fetching of get_channel_list against a stub
+ gateway session.
+"""
+
+import threading
+from time import sleep
+
+import pytest
+from requests import HTTPError
+
+from resources.lib.vodka import media_list
+
+PAGE_SIZE = 50
+
+
+class StubResponse:
+    def __init__(self, payload: dict, status_code: int = 200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise HTTPError(f"{self.status_code} Error", response=self)
+
+    def json(self) -> dict:
+        return self.payload
+
+
+class StubGateway:
+    """
+    Answers asset/action/list requests with 'total' channels.
+    Later pages are answered sooner, so they complete out of order.
+    """
+
+    def __init__(self, total: int, failing_page: int = None):
+        self.total = total
+        self.failing_page = failing_page
+        self.pages = []
+        self._lock = threading.Lock()
+
+    def post(self, url: str, json: dict) -> StubResponse:
+        assert url.endswith("/asset/action/list")
+        page_idx = json["pager"]["pageIndex"]
+        page_size = json["pager"]["pageSize"]
+        if page_idx > 1:
+            sleep(0.01 * (10 - page_idx % 10))
+        with self._lock:
+            self.pages.append(page_idx)
+        if page_idx == self.failing_page:
+            return StubResponse({}, 500)
+        start = (page_idx - 1) * page_size
+        objects = [
+            {"id": number, "name": f"Channel {number}"}
+            for number in range(start, min(start + page_size, self.total))
+        ]
+        return StubResponse({"result": {"totalCount": self.total, "objects": objects}})
+
+
+def get_channel_list(gateway: StubGateway, concurrency: int) -> list:
+    return media_list.get_channel_list(
+        gateway, "https://gateway.example.com", "ks", concurrency=concurrency
+    )
+
+
+@pytest.mark.parametrize("total", [0, 1, PAGE_SIZE, PAGE_SIZE + 1, 9 * PAGE_SIZE - 7])
+def test_concurrent_equals_sequential(total):
+    sequential = get_channel_list(StubGateway(total), 1)
+    gateway = StubGateway(total)
+    concurrent = get_channel_list(gateway, 4)
+    assert concurrent == sequential
+    assert [channel["id"] for channel in concurrent] == list(range(total))
+    # every page is requested once (the first one even if it's empty)
+    page_count = max(-(-total // PAGE_SIZE), 1)
+    assert sorted(gateway.pages) == list(range(1, page_count + 1))
+
+
+def test_pages_completing_out_of_order_keep_page_order():
+    gateway = StubGateway(9 * PAGE_SIZE)
+    channels = get_channel_list(gateway, 8)
+    # the pages were answered out of order...
+    assert gateway.pages[1:] != sorted(gateway.pages[1:])
+    # ...but the channels are in page order
+    assert [channel["id"] for channel in channels] == list(range(9 * PAGE_SIZE))
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_failing_page_raises(concurrency):
+    gateway = StubGateway(9 * PAGE_SIZE, failing_page=3)
+    with pytest.raises(HTTPError):
+        get_channel_list(gateway, concurrency)
@@ -0,0 +1,114 @@
+"""
+Tests of the buffer between the export workers and the rendering.
+"""
+
+import threading
+from time import monotonic, sleep
+
+from resources.lib.utils.prefetch import PrefetchBuffer
+
+
+def start_worker(buffer: PrefetchBuffer, items, result: list) -> threading.Thread:
+    def work():
+        try:
+            result.append(buffer.fill(items))
+        finally:
+            buffer.finish()
+
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+    return worker
+
+
+def test_items_are_read_in_order():
+    buffer = PrefetchBuffer(2)
+    result = []
+    worker = start_worker(buffer, range(100), result)
+    assert list(buffer) == list(range(100))
+    worker.join(1)
+    assert not worker.is_alive()
+
+
+def test_worker_waits_for_the_reader():
+    buffer = PrefetchBuffer(2)
+    read = []
+
+    def items():
+        for item in range(10):
+            read.append(item)
+            yield item
+
+    result = []
+    worker = start_worker(buffer, items(), result)
+    sleep(0.3)
+    # two items in the buffer and one waiting for room
+    assert read == [0, 1, 2]
+    started = monotonic()
+    for _ in buffer:
+        sleep(0.05)
+    worker.join(1)
+    # the time spent waiting for the reader isn't counted
+    assert result[0] < (monotonic() - started) / 2
+
+
+def test_waited_time_is_counted():
+    def items():
+        for item in range(3):
+            sleep(0.1)
+            yield item
+
+    buffer = PrefetchBuffer(5)
+    result = []
+    worker = start_worker(buffer, items(), result)
+    assert list(buffer) == [0, 1, 2]
+    worker.join(1)
+    assert result[0] >= 0.25
+
+
+def test_close_releases_a_waiting_worker():
+    buffer = PrefetchBuffer(1)
+    closed = []
+
+    def items():
+        try:
+            yield from range(100)
+        finally:
+            closed.append(True)
+
+    result = []
+    iterator = items()
+    worker = threading.Thread(
+        target=lambda: (result.append(buffer.fill(iterator)), buffer.finish()),
+        daemon=True,
+    )
+    worker.start()
+    assert next(iter(buffer)) == 0
+    buffer.close()
+    worker.join(1)
+    assert not worker.is_alive()
+    assert len(result) == 1
+    iterator.close()
+    assert closed
+
+
+def test_error_of_the_worker_ends_the_items():
+    def items():
+        yield 1
+        raise ValueError("truncated")
+
+    buffer = PrefetchBuffer(2)
+    errors = []
+
+    def work():
+        try:
+            buffer.fill(items())
+        except ValueError as e:
+            errors.append(e)
+        finally:
+            buffer.finish()
+
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+    assert list(buffer) == [1]
+    worker.join(1)
+    assert errors
@@ -0,0 +1,90 @@
+"""
+Tests of the scheduling of the periodic EPG exports.
+"""
+
+import pytest
+
+from resources.lib.utils import scheduler
+from resources.lib.utils.scheduler import ExportScheduler
+
+HOUR = 3600
+NOW = 1_700_000_000
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    # the random half of the delays is at its maximum
+    monkeypatch.setattr(scheduler.random, "uniform", lambda low, high: high)
+
+
+def test_offset_is_fixed_per_device():
+    first = ExportScheduler(HOUR, 3, "device", NOW, NOW)
+    assert first.offset == ExportScheduler(HOUR, 3, "device", 0, 0).offset
+    assert 0 <= first.offset < HOUR / 10
+    assert 0 <= first.catch_up_delay < scheduler.CATCH_UP_SPREAD
+    offsets = {
+        ExportScheduler(HOUR, 3, f"device {i}", NOW, NOW).offset for i in range(10)
+    }
+    assert len(offsets) == 10
+
+
+def test_offset_is_at_most_the_max_spread():
+    export_scheduler = ExportScheduler(100 * HOUR, 3, "device", NOW, NOW)
+    assert export_scheduler.offset < scheduler.MAX_SPREAD
+
+
+def test_next_run_after_a_success():
+    export_scheduler = ExportScheduler(HOUR, 3, "device", NOW, NOW)
+    assert export_scheduler.next_run(NOW) == NOW + HOUR + export_scheduler.offset
+    export_scheduler.record_success(NOW + 100)
+    assert export_scheduler.next_run(NOW + 100) == (
+        NOW + 100 + HOUR + export_scheduler.offset
+    )
+
+
+def test_overdue_export_waits_for_the_catch_up_delay():
+    export_scheduler = ExportScheduler(HOUR, 3, "device", 0, NOW)
+    assert export_scheduler.next_run(NOW) == NOW + export_scheduler.catch_up_delay
+    export_scheduler.woke_up(NOW + HOUR)
+    assert export_scheduler.next_run(NOW + HOUR) == (
+        NOW + HOUR + export_scheduler.catch_up_delay
+    )
+
+
+def test_failures_are_retried_with_backoff(no_jitter):
+    export_scheduler = ExportScheduler(HOUR, 5, "device", NOW, NOW)
+    delays = [export_scheduler.record_failure(NOW + i) for i in range(4)]
+    assert delays == [30, 60, 120, 240]
+    assert export_scheduler.next_run(NOW + 3) == NOW + 3 + 240
+
+
+def test_delay_has_jitter():
+    export_scheduler = ExportScheduler(HOUR, 5, "device", NOW, NOW)
+    delay = export_scheduler.record_failure(NOW)
+    assert scheduler.RETRY_DELAY / 2 <= delay <= scheduler.RETRY_DELAY
+
+
+def test_delay_is_at_most_the_interval(no_jitter):
+    export_scheduler = ExportScheduler(100, 20, "device", NOW, NOW)
+    delays = [export_scheduler.record_failure(NOW) for _ in range(5)]
+    assert max(delays) == 100
+
+
+def test_too_many_failures_pause_until_the_oldest_leaves_the_window(no_jitter):
+    export_scheduler = ExportScheduler(HOUR, 2, "device", NOW, NOW)
+    export_scheduler.record_failure(NOW)
+    export_scheduler.record_failure(NOW + 100)
+    assert export_scheduler.next_run(NOW + 200) == NOW + HOUR
+    # the first failure has left the window, this is the second one in it
+    assert export_scheduler.record_failure(NOW + HOUR) == 60
+    assert export_scheduler.failures == [NOW + 100, NOW + HOUR]
+
+
+def test_success_clears_the_failures(no_jitter):
+    export_scheduler = ExportScheduler(HOUR, 3, "device", NOW, NOW)
+    export_scheduler.record_failure(NOW)
+    export_scheduler.record_success(NOW + 30)
+    assert not export_scheduler.failures
+    assert export_scheduler.next_run(NOW + 30) == (
+        NOW + 30 + HOUR + export_scheduler.offset
+    )
@@ -0,0 +1,72 @@
+"""
+Tests of the per-channel, per-day shards of the EPG export.
+"""
+
+import json
+import os
+
+from resources.lib.utils.shards import SHARD_VERSION, ShardStore
+
+
+def test_shards_are_written_and_read(tmp_path):
+    store = ShardStore(str(tmp_path / "shards"), "key")
+    assert store.write("1_10", "20240101", "<programme/>")
+    assert store.write("1_10", "20240102", "<programme/>")
+    assert store.read("1_10", "20240101") == "<programme/>"
+    assert store.read("1_10", "20240103") is None
+    assert store.days("1_10") == {"20240101", "20240102"}
+    assert store.days("2_20") == set()
+
+
+def test_empty_fragment_removes_the_shard(tmp_path):
+    store = ShardStore(str(tmp_path / "shards"), "key")
+    store.write("1_10", "20240101", "<programme/>")
+    assert not store.write("1_10", "20240101", "")
+    assert store.read("1_10", "20240101") is None
+    # nothing to remove
+    assert not store.write("1_10", "20240102", "")
+
+
+def test_shards_are_kept_with_the_same_render_key(tmp_path):
+    directory = str(tmp_path / "shards")
+    ShardStore(directory, "key").write("1_10", "20240101", "<programme/>")
+    assert ShardStore(directory, "key").read("1_10", "20240101") == "<programme/>"
+
+
+def test_other_render_key_drops_the_shards(tmp_path):
+    directory = str(tmp_path / "shards")
+    ShardStore(directory, "key").write("1_10", "20240101", "<programme/>")
+    store = ShardStore(directory, "other key")
+    assert store.read("1_10", "20240101") is None
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        assert json.load(f) == {"version": SHARD_VERSION, "render_key": "other key"}
+    # only the meta file, the temporary file was renamed
+    assert os.listdir(directory) == ["meta.json"]
+
+
+def test_broken_meta_drops_the_shards(tmp_path):
+    directory = str(tmp_path / "shards")
+    ShardStore(directory, "key").write("1_10", "20240101", "<programme/>")
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        f.write('{"version": ')
+    assert ShardStore(directory, "key").days("1_10") == set()
+
+
+def test_prune(tmp_path):
+    store = ShardStore(str(tmp_path / "shards"), "key")
+    for channel in ("1_10", "2_20"):
+        for day in ("20240101", "20240102", "20240103"):
+            store.write(channel, day, "<programme/>")
+    assert store.prune(["1_10", "3_30"], ["20240102", "20240103", "20240104"]) == 4
+    assert store.days("1_10") == {"20240102", "20240103"}
+    assert store.days("2_20") == set()
+    # the meta file is kept
+    assert ShardStore(store.directory, "key").days("1_10") == {"20240102", "20240103"}
+
+
+def test_channel_name():
+    assert ShardStore.channel_name(1, 10) == "1_10"
+    name = ShardStore.channel_name("a/b", 10)
+    assert len(name) == 40 and name.isalnum()
+    assert name == ShardStore.channel_name("a/b", 10)
+    assert name != ShardStore.channel_name("a/c", 10)